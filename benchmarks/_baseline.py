@@ -0,0 +1,128 @@
+"""
+Baseline checks shared by the benchmark scripts.
+
+``benchmarks/bench_commands.py`` and ``dev/bench_importtime.py`` both store
+their measurements in a JSON baseline and report a regression when a
+measurement exceeds a multiple of its baseline by more than a minimum number
+of milliseconds. Their command line classes inherit the options from
+:class:`BaselineCLI` and end in :func:`check_baseline`.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Callable
+
+import kwconf
+
+
+class BaselineCLI(kwconf.Config):
+    """
+    Options of a benchmark script that checks a JSON baseline.
+    """
+
+    baseline = kwconf.Value(None, help='path to the baseline json file')
+    write_baseline = kwconf.Flag(
+        False, help='overwrite the baseline with the current measurements'
+    )
+    threshold = kwconf.Value(
+        1.5,
+        help='fail when a measurement exceeds this multiple of the baseline',
+    )
+    min_delta_ms = kwconf.Value(
+        5.0,
+        help='ignore regressions smaller than this many milliseconds',
+    )
+
+
+def check_baseline(
+    config: Any,
+    data: dict[str, Any],
+    section: str,
+    metric: str,
+    to_ms: float,
+    describe: Callable[[dict[str, Any], dict[str, Any]], str] | None = None,
+) -> int:
+    """
+    Write ``data`` as the new baseline or compare it against the old one.
+
+    Args:
+        config (BaselineCLI): the parsed options
+        data (Dict): everything to store, the measurements are in
+            ``data[section]``
+        section (str): key of the measurements by name
+        metric (str): key of the compared value in each measurement
+        to_ms (float): factor converting ``metric`` to milliseconds
+        describe (Callable | None): see :func:`compare_to_baseline`
+
+    Returns:
+        int: the exit code, 1 if anything regressed
+    """
+    baseline_fpath = Path(config.baseline)
+    if config.write_baseline:
+        baseline_fpath.write_text(json.dumps(data, indent=2) + '\n')
+        print(f'Wrote baseline to {baseline_fpath}')
+        return 0
+
+    if not baseline_fpath.exists():
+        print(f'No baseline at {baseline_fpath}, use --write_baseline')
+        return 0
+    baseline = json.loads(baseline_fpath.read_text())
+    failures = compare_to_baseline(
+        data[section],
+        baseline[section],
+        metric,
+        to_ms,
+        threshold=float(config.threshold),
+        min_delta_ms=float(config.min_delta_ms),
+        describe=describe,
+    )
+    for line in failures:
+        print(f'REGRESSION: {line}')
+    if failures:
+        return 1
+    print('No regressions')
+    return 0
+
+
+def compare_to_baseline(
+    results: dict[str, Any],
+    baseline: dict[str, Any],
+    metric: str,
+    to_ms: float,
+    threshold: float = 1.5,
+    min_delta_ms: float = 5.0,
+    describe: Callable[[dict[str, Any], dict[str, Any]], str] | None = None,
+) -> list[str]:
+    """
+    Describe each measurement that regressed.
+
+    Args:
+        results (Dict[str, Dict]): measurements by name
+        baseline (Dict[str, Dict]): baseline measurements by name, names
+            missing here are skipped
+        metric (str): key of the compared value in each measurement
+        to_ms (float): factor converting ``metric`` to milliseconds
+        threshold (float): a regression exceeds this multiple of the baseline
+        min_delta_ms (float): and grew by more than this many milliseconds
+        describe (Callable | None): called with the new and the baseline
+            measurement of a regression, returns text to append to it
+
+    Example:
+        >>> results = {'a': {'best_s': 0.3}, 'b': {'best_s': 0.12}}
+        >>> baseline = {'a': {'best_s': 0.1}, 'b': {'best_s': 0.1}}
+        >>> compare_to_baseline(results, baseline, 'best_s', 1000)
+        ['a: 100.0ms -> 300.0ms']
+    """
+    failures = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name][metric] * to_ms
+        new = result[metric] * to_ms
+        if new > old * threshold and new - old > min_delta_ms:
+            msg = f'{name}: {old:.1f}ms -> {new:.1f}ms'
+            if describe is not None:
+                msg += describe(result, baseline[name])
+            failures.append(msg)
+    return failures
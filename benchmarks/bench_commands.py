@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Wall-clock benchmarks of git_well workflows on generated repositories.
+
+Each fixture is a repository from
+:func:`git_well.demo.make_synthetic_git_repo` with ``dev/<version>``
+branches and a directory of IPFS sidecars added on top. Fixtures are built
+once per size in the application cache directory and reused while their
+parameters do not change. Every benchmark is run ``--repeat`` times and the
+best time is compared against a stored JSON baseline with the helpers in
+``benchmarks/_baseline.py``, which ``dev/bench_importtime.py`` also uses to
+check import costs.
+
+``find_chain`` walks first parents until the first merge, so it runs on a
+linear copy of each fixture with the same number of commits.
+
+Benchmarks that read commits through the
+:class:`git_well.commit_cache.CommitCache` are measured twice: ``cold``
+drops the shared cache and deletes its database before every run and
+``warm`` keeps it.
+
+CommandLine:
+    # Record a new baseline for this machine
+    python benchmarks/bench_commands.py --sizes small medium --write_baseline
+
+    # Compare against the baseline and exit non-zero on regressions
+    python benchmarks/bench_commands.py --sizes small medium
+
+    # Only some benchmarks, on the largest fixture, keeping the results
+    python benchmarks/bench_commands.py --sizes huge \\
+        --benchmarks 'find_*' 'archive_source*' --output results.json
+"""
+from __future__ import annotations
+
+import contextlib
+import fnmatch
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+from typing import Any, Callable
+
+import kwconf
+import ubelt as ub
+
+from _baseline import BaselineCLI, check_baseline
+
+REPO_DPATH = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE_FPATH = REPO_DPATH / 'benchmarks' / 'baseline.json'
+
+# Parameters of the generated fixtures. Changing an entry rebuilds that
+# fixture, and a new baseline should be recorded.
+FIXTURE_SIZES = {
+    'small': {
+        'num_commits': 1_000,
+        'num_submodules': 1,
+        'num_dev_branches': 10,
+        'num_sidecars': 50,
+    },
+    'medium': {
+        'num_commits': 10_000,
+        'num_submodules': 2,
+        'num_dev_branches': 50,
+        'num_sidecars': 500,
+    },
+    'huge': {
+        'num_commits': 100_000,
+        'num_submodules': 4,
+        'num_dev_branches': 200,
+        'num_sidecars': 5_000,
+    },
+}
+
+
+class BenchCommandsCLI(BaselineCLI):
+    """
+    Time git_well workflows on generated repositories.
+    """
+
+    sizes = kwconf.Value(
+        ['small', 'medium'],
+        nargs='+',
+        help=f'fixture sizes to run, any of {list(FIXTURE_SIZES)}',
+    )
+    benchmarks = kwconf.Value(
+        None, nargs='+', help='restrict to benchmarks matching these globs'
+    )
+    repeat = kwconf.Value(
+        3, help='number of timed runs per benchmark; the minimum is kept'
+    )
+    output = kwconf.Value(
+        None, help='if specified, write the measurements to this json file'
+    )
+    baseline = kwconf.Value(
+        str(DEFAULT_BASELINE_FPATH), help='path to the baseline json file'
+    )
+    min_delta_ms = kwconf.Value(
+        20.0,
+        help='ignore regressions smaller than this many milliseconds',
+    )
+    rebuild = kwconf.Flag(False, help='regenerate the fixtures')
+
+    @classmethod
+    def main(
+        cls, argv: list[str] | str | bool | None = True, **kwargs: Any
+    ) -> int:
+        config = cls.cli(argv=argv, data=kwargs, strict=True)
+        unknown = set(config.sizes) - set(FIXTURE_SIZES)
+        if unknown:
+            raise KeyError(f'Unknown fixture sizes: {sorted(unknown)}')
+
+        results = {}
+        for size in config.sizes:
+            fixture = build_fixture(size, rebuild=config.rebuild)
+            for name, factory in BENCHMARKS.items():
+                if config.benchmarks and not any(
+                    fnmatch.fnmatch(name, pat) for pat in config.benchmarks
+                ):
+                    continue
+                key = f'{size}/{name}'
+                results[key] = run_benchmark(
+                    factory, fixture, repeat=int(config.repeat)
+                )
+                _print_result(key, results[key])
+
+        data = {'machine': machine_info(), 'benchmarks': results}
+        if config.output:
+            Path(config.output).write_text(json.dumps(data, indent=2) + '\n')
+            print(f'Wrote results to {config.output}')
+        return check_baseline(
+            config, data, 'benchmarks', metric='best_s', to_ms=1000
+        )
+
+
+def build_fixture(size: str, rebuild: bool = False) -> ub.Path:
+    """
+    Generate (or reuse) the repository of one fixture size.
+
+    A stamp file records the parameters the fixture was built with, so a
+    fixture is only regenerated when :data:`FIXTURE_SIZES` changes. The
+    merge-free copy from :func:`linear_fixture` is generated along with it.
+
+    Returns:
+        ub.Path: the repository path
+    """
+    from git_well.demo import make_synthetic_git_repo
+
+    params = FIXTURE_SIZES[size]
+    dpath = ub.Path.appdir('git_well', 'benchmarks', size)
+    stamp_fpath = dpath.parent / f'{size}.stamp.json'
+    stamp = json.dumps(params, sort_keys=True)
+    exists = dpath.exists() and linear_fixture(dpath).exists()
+    if not rebuild and stamp_fpath.exists() and exists:
+        if stamp_fpath.read_text() == stamp:
+            return dpath
+
+    print(f'Generating the {size} fixture in {dpath}')
+    dpath.parent.ensuredir()
+    stamp_fpath.delete()
+    make_synthetic_git_repo(
+        dpath,
+        num_commits=params['num_commits'],
+        num_submodules=params['num_submodules'],
+    )
+    make_synthetic_git_repo(
+        linear_fixture(dpath),
+        num_commits=params['num_commits'],
+        merge_fraction=0,
+        num_branches=0,
+        checkout=False,
+    )
+    for index in range(params['num_dev_branches']):
+        subprocess.run(
+            ['git', 'branch', f'dev/0.{index}.0', f'HEAD~{index}'],
+            cwd=dpath,
+            check=True,
+        )
+    # Sidecars are left untracked, ``ipfs status`` only reads the files.
+    data_dpath = (dpath / 'data').ensuredir()
+    for index in range(params['num_sidecars']):
+        subdir = (data_dpath / f'part{index % 20}').ensuredir()
+        (subdir / f'item{index}.bin').write_text(f'payload {index}\n')
+        (subdir / f'item{index}.bin.ipfs').write_text(
+            'type: ipfs-sidecar\n'
+            f'cid: bafy-fake-{index}\n'
+            f'rel_path: item{index}.bin\n'
+        )
+    stamp_fpath.write_text(stamp)
+    return dpath
+
+
+def linear_fixture(dpath: Path) -> ub.Path:
+    """
+    The path of the copy of a fixture without merges.
+    """
+    dpath = ub.Path(dpath)
+    return dpath.parent / f'{dpath.name}-linear'
+
+
+def _fresh_repo(dpath: Path, cold: bool = False) -> Any:
+    from git_well.repo import Repo
+
+    repo = Repo(dpath)
+    if cold:
+        from git_well.commit_cache import _SHARED_CACHES
+
+        # Repo objects of the same path compare equal, so the shared cache of
+        # another live repo object would be handed out again, still reading
+        # the deleted database through its open connection.
+        cache = _SHARED_CACHES.pop(repo, None)
+        if cache is not None:
+            cache.close()
+        ub.Path(dpath, '.git', 'git-well', 'commits.sqlite3').delete()
+    return repo
+
+
+def bench_find_chain(dpath: Path) -> Callable[[], Any]:
+    from git_well.git_squash_streaks import find_chain
+
+    repo = _fresh_repo(linear_fixture(dpath))
+
+    def run() -> Any:
+        with warnings.catch_warnings():
+            # The chain ends at the root commit, which warns about a known
+            # issue with initial commits.
+            warnings.simplefilter('ignore', UserWarning)
+            return find_chain(repo.head.commit, preserve_tags=False)
+
+    return run
+
+
+def bench_find_pseudo_chain(dpath: Path) -> Callable[[], Any]:
+    from git_well.git_squash_streaks import find_pseudo_chain
+
+    repo = _fresh_repo(dpath)
+    return lambda: find_pseudo_chain(repo.head.commit, preserve_tags=False)
+
+
+def _bench_find_streaks(dpath: Path, cold: bool) -> Callable[[], Any]:
+    from git_well.git_squash_streaks import find_chain, find_streaks
+
+    repo = _fresh_repo(dpath, cold=cold)
+    chain = find_chain(repo.head.commit, preserve_tags=False)
+
+    def run() -> Any:
+        if cold:
+            # Rebind the chain to a new repo object so it gets a new cache
+            fresh = _fresh_repo(dpath, cold=True)
+            chain_ = [fresh.commit(c.hexsha) for c in chain]
+        else:
+            chain_ = chain
+        return find_streaks(chain_, timedelta='alltime')
+
+    return run
+
+
+def bench_find_streaks_cold(dpath: Path) -> Callable[[], Any]:
+    return _bench_find_streaks(dpath, cold=True)
+
+
+def bench_find_streaks_warm(dpath: Path) -> Callable[[], Any]:
+    return _bench_find_streaks(dpath, cold=False)
+
+
+def _bench_author_stats(dpath: Path, cold: bool) -> Callable[[], Any]:
+    from git_well.git_stats import author_stats
+
+    repo = _fresh_repo(dpath)
+
+    def run() -> Any:
+        repo_ = _fresh_repo(dpath, cold=True) if cold else repo
+        with contextlib.redirect_stdout(io.StringIO()):
+            return author_stats(repo_, since='20 years ago')
+
+    return run
+
+
+def bench_author_stats_cold(dpath: Path) -> Callable[[], Any]:
+    return _bench_author_stats(dpath, cold=True)
+
+
+def bench_author_stats_warm(dpath: Path) -> Callable[[], Any]:
+    return _bench_author_stats(dpath, cold=False)
+
+
+def bench_dev_branches(dpath: Path) -> Callable[[], Any]:
+    from git_well.git_branch_upgrade import dev_branches
+
+    repo = _fresh_repo(dpath)
+    return lambda: dev_branches(repo)
+
+
+def bench_find_sidecars(dpath: Path) -> Callable[[], Any]:
+    from git_well.ipfs import _find_sidecars
+
+    return lambda: _find_sidecars(Path(dpath) / 'data')
+
+
+def bench_ipfs_status(dpath: Path) -> Callable[[], Any]:
+    from git_well.ipfs import IPFSStatus
+
+    def run() -> Any:
+        with contextlib.redirect_stdout(io.StringIO()):
+            IPFSStatus.main(argv=False, path=str(Path(dpath) / 'data'))
+
+    return run
+
+
+def _bench_archive_source(
+    depth: int | str, no_submodules: bool = False, **kwargs: Any
+) -> Callable[[Path], Callable[[], Any]]:
+    def factory(dpath: Path) -> Callable[[], Any]:
+        from git_well.git_archive_source import archive_source
+
+        def run() -> Any:
+            with tempfile.TemporaryDirectory() as tmp:
+                return archive_source(
+                    dpath,
+                    output=Path(tmp) / 'archive.tar.gz',
+                    depth=depth,
+                    no_submodules=no_submodules,
+                    verbose=0,
+                    **kwargs,
+                )
+
+        return run
+
+    return factory
+
+
+BENCHMARKS: dict[str, Callable[[Path], Callable[[], Any]]] = {
+    'find_chain': bench_find_chain,
+    'find_pseudo_chain': bench_find_pseudo_chain,
+    'find_streaks[cold]': bench_find_streaks_cold,
+    'find_streaks[warm]': bench_find_streaks_warm,
+    'author_stats[cold]': bench_author_stats_cold,
+    'author_stats[warm]': bench_author_stats_warm,
+    'dev_branches': bench_dev_branches,
+    '_find_sidecars': bench_find_sidecars,
+    'ipfs_status': bench_ipfs_status,
+    'archive_source[depth=0]': _bench_archive_source(0),
+    'archive_source[depth=1]': _bench_archive_source(1),
+    'archive_source[depth=full]': _bench_archive_source('full'),
+    'archive_source[depth=full,no_submodules]': _bench_archive_source(
+        'full', no_submodules=True
+    ),
+    'archive_source[depth=full,bundle]': _bench_archive_source(
+        'full', history_format='bundle'
+    ),
+}
+
+
+def run_benchmark(
+    factory: Callable[[Path], Callable[[], Any]],
+    dpath: Path,
+    repeat: int = 3,
+) -> dict[str, Any]:
+    """
+    Time a benchmark after its untimed setup.
+
+    Example:
+        >>> result = run_benchmark(lambda dpath: lambda: None, Path('.'), 2)
+        >>> assert len(result['times_s']) == 2
+        >>> assert result['best_s'] <= result['median_s']
+    """
+    func = factory(dpath)
+    times = []
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        'best_s': min(times),
+        'median_s': statistics.median(times),
+        'times_s': times,
+    }
+
+
+def machine_info() -> dict[str, str]:
+    git_version = subprocess.run(
+        ['git', '--version'], capture_output=True, text=True
+    ).stdout.strip()
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'git': git_version,
+    }
+
+
+def _print_result(name: str, result: dict[str, Any]) -> None:
+    best = result['best_s'] * 1000
+    median = result['median_s'] * 1000
+    print(f'{name:<52} {best:10.1f}ms  (median {median:.1f}ms)')
+
+
+__cli__ = BenchCommandsCLI
+
+if __name__ == '__main__':
+    sys.exit(__cli__.main())
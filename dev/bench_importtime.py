@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Import-time regression checks for git_well entry points and subcommands.
+
+This is the structured version of ``dev/check_importtime.sh``. Each target is
+imported in a fresh interpreter with ``-X importtime`` and the cumulative time
+of the target module is recorded. Targets are every console script in
+``pyproject.toml`` plus every ``GitWellModalCLI`` subcommand (measured on top
+of ``git_well.main``, which is what ``git-well <command>`` actually pays).
+
+CommandLine:
+    # Record a new baseline for this machine
+    python dev/bench_importtime.py --write_baseline
+
+    # Compare against the baseline and exit non-zero on regressions
+    python dev/bench_importtime.py --threshold 1.5 --min_delta_ms 5
+
+The baseline options and checks are shared with the command benchmarks in
+``benchmarks/_baseline.py``.
+"""
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any
+
+import kwconf
+
+REPO_DPATH = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DPATH / 'benchmarks'))
+
+from _baseline import BaselineCLI, check_baseline  # NOQA: E402
+
+DEFAULT_BASELINE_FPATH = REPO_DPATH / 'dev' / 'importtime_baseline.json'
+
+# Third-party packages we specifically want to keep an eye on. Others are
+# still reported if they show up among the heaviest imports.
+WATCHED_PACKAGES = ['git', 'networkx', 'rich', 'packaging', 'paramiko']
+
+
+class BenchImportTimeCLI(BaselineCLI):
+    """
+    Measure and check import costs of git_well entry points.
+    """
+
+    baseline = kwconf.Value(
+        str(DEFAULT_BASELINE_FPATH), help='path to the baseline json file'
+    )
+    repeat = kwconf.Value(
+        5, help='number of fresh interpreters per target; the minimum is kept'
+    )
+    top = kwconf.Value(
+        5, help='number of heaviest third-party packages to report per target'
+    )
+    targets = kwconf.Value(
+        None, nargs='+', help='restrict to these target names'
+    )
+
+    @classmethod
+    def main(
+        cls, argv: list[str] | str | bool | None = True, **kwargs: Any
+    ) -> int:
+        config = cls.cli(argv=argv, data=kwargs, strict=True)
+        targets = discover_targets()
+        if config.targets:
+            targets = {k: v for k, v in targets.items() if k in config.targets}
+
+        results = {}
+        for name, code in targets.items():
+            results[name] = measure_target(
+                code, repeat=int(config.repeat), top=int(config.top)
+            )
+        _print_results(results)
+
+        data = {'python': sys.version.split()[0], 'targets': results}
+        return check_baseline(
+            config,
+            data,
+            'targets',
+            metric='cumulative_us',
+            to_ms=1e-3,
+            describe=_describe_new_packages,
+        )
+
+
+def discover_targets() -> dict[str, str]:
+    """
+    Map each target name to the code that imports it.
+
+    Returns:
+        Dict[str, str]: console script names and ``git-well <command>`` names
+        mapped to a ``python -c`` snippet.
+    """
+    targets = {}
+    for script, module in _entry_point_modules().items():
+        targets[script] = f'import {module}'
+    from git_well.main import SUBCOMMANDS
+
+    for spec in SUBCOMMANDS:
+        module = spec.import_path.partition(':')[0]
+        targets[f'git-well {spec.command}'] = (
+            f'import git_well.main; import {module}'
+        )
+    return targets
+
+
+def _entry_point_modules() -> dict[str, str]:
+    text = (REPO_DPATH / 'pyproject.toml').read_text()
+    try:
+        import tomllib
+    except ImportError:
+        # Python 3.10 does not ship tomllib, and the scripts table is simple
+        # enough to read directly.
+        pattern = re.compile(r'^scripts\.([\w-]+)\s*=\s*"([\w.]+):\w+"', re.M)
+        return dict(pattern.findall(text))
+    scripts = tomllib.loads(text)['project']['scripts']
+    return {k: v.partition(':')[0] for k, v in scripts.items()}
+
+
+def parse_importtime(text: str) -> list[dict[str, Any]]:
+    """
+    Parse the stderr of ``python -X importtime``.
+
+    Example:
+        >>> text = chr(10).join([
+        >>>     'import time: self [us] | cumulative | imported package',
+        >>>     'import time:       100 |        100 |   yaml.error',
+        >>>     'import time:       300 |        400 | yaml',
+        >>> ])
+        >>> rows = parse_importtime(text)
+        >>> assert rows[1] == {'name': 'yaml', 'depth': 0, 'self': 300, 'cumulative': 400}
+        >>> assert rows[0]['depth'] == 1
+    """
+    pattern = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+    rows = []
+    for line in text.splitlines():
+        match = pattern.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        rows.append(
+            {
+                'name': name,
+                'depth': (len(indent) - 1) // 2,
+                'self': int(self_us),
+                'cumulative': int(cumulative_us),
+            }
+        )
+    return rows
+
+
+def target_subtree(
+    rows: list[dict[str, Any]], module: str
+) -> list[dict[str, Any]]:
+    """
+    Return the rows imported on behalf of ``module``, ending with its own row.
+
+    ``-X importtime`` reports in post-order, so the imports triggered by a
+    module are the deeper rows immediately preceding it.
+
+    Example:
+        >>> rows = [
+        >>>     {'name': 'site', 'depth': 0, 'self': 1, 'cumulative': 1},
+        >>>     {'name': 'rich', 'depth': 1, 'self': 5, 'cumulative': 5},
+        >>>     {'name': 'mod', 'depth': 0, 'self': 1, 'cumulative': 6},
+        >>> ]
+        >>> [r['name'] for r in target_subtree(rows, 'mod')]
+        ['rich', 'mod']
+    """
+    for idx, row in enumerate(rows):
+        if row['name'] == module:
+            start = idx
+            while start > 0 and rows[start - 1]['depth'] > row['depth']:
+                start -= 1
+            return rows[start : idx + 1]
+    return []
+
+
+def measure_target(code: str, repeat: int = 5, top: int = 5) -> dict[str, Any]:
+    """
+    Import the last module in ``code`` in fresh interpreters.
+
+    Returns:
+        Dict: the best cumulative time in microseconds and the heaviest
+        third-party packages from that run.
+    """
+    module = code.rsplit('import ', 1)[-1].strip()
+    env = dict(os.environ)
+    env.pop('PYTHONIMPORTTIME', None)
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            capture_output=True,
+            text=True,
+            cwd=REPO_DPATH,
+            env=env,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f'Failed to run {code!r}:\n{proc.stderr}')
+        rows = target_subtree(parse_importtime(proc.stderr), module)
+        cumulative = rows[-1]['cumulative'] if rows else 0
+        if best is None or cumulative < best[0]:
+            best = (cumulative, rows)
+    assert best is not None
+    cumulative, rows = best
+    return {
+        'code': code,
+        'cumulative_us': cumulative,
+        'third_party': heaviest_third_party(rows, top=top),
+    }
+
+
+def heaviest_third_party(
+    rows: list[dict[str, Any]], top: int = 5
+) -> dict[str, int]:
+    """
+    Cumulative import cost of each third-party top-level package.
+
+    Watched packages are always reported when they are imported, the rest are
+    limited to the ``top`` heaviest.
+
+    Example:
+        >>> rows = [
+        >>>     {'name': 'rich.text', 'depth': 1, 'self': 5, 'cumulative': 5},
+        >>>     {'name': 'rich', 'depth': 0, 'self': 10, 'cumulative': 15},
+        >>>     {'name': 'json', 'depth': 0, 'self': 10, 'cumulative': 10},
+        >>> ]
+        >>> heaviest_third_party(rows)
+        {'rich': 15}
+    """
+    stdlib = set(sys.stdlib_module_names)
+    costs: dict[str, int] = {}
+    for row in rows:
+        root = row['name'].split('.')[0]
+        if root in stdlib or root.startswith('_') or root == 'git_well':
+            continue
+        if row['name'] == root:
+            costs[root] = costs.get(root, 0) + row['cumulative']
+    ranked = sorted(costs.items(), key=lambda kv: kv[1], reverse=True)
+    keep = {k for k, _ in ranked[:top]} | (set(WATCHED_PACKAGES) & set(costs))
+    return {k: v for k, v in ranked if k in keep}
+
+
+def _describe_new_packages(
+    result: dict[str, Any], old: dict[str, Any]
+) -> str:
+    """
+    Name the third-party packages a regressed target newly imports.
+
+    Example:
+        >>> _describe_new_packages({'third_party': {'rich': 1}}, {})
+        ' (newly imports rich)'
+    """
+    new_pkgs = set(result.get('third_party', {})) - set(
+        old.get('third_party', {})
+    )
+    if not new_pkgs:
+        return ''
+    return f' (newly imports {", ".join(sorted(new_pkgs))})'
+
+
+def _print_results(results: dict[str, Any]) -> None:
+    for name, result in sorted(
+        results.items(), key=lambda kv: kv[1]['cumulative_us'], reverse=True
+    ):
+        pkgs = ', '.join(
+            f'{k}={v / 1000:.1f}ms' for k, v in result['third_party'].items()
+        )
+        ms = result['cumulative_us'] / 1000
+        print(f'{name:<32} {ms:8.1f}ms  {pkgs}')
+
+
+__cli__ = BenchImportTimeCLI
+
+if __name__ == '__main__':
+    sys.exit(__cli__.main())
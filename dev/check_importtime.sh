@@ -1,2 +1,6 @@
 python -Ximporttime -c "import git_well"
 python -Ximporttime -c "from git_well import main"
+
+# Structured per-command measurements compared against
+# dev/importtime_baseline.json. Exits non-zero on regressions.
+python "$(dirname "$0")/bench_importtime.py" "$@"
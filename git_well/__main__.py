@@ -2,7 +2,18 @@
 # PYTHON_ARGCOMPLETE_OK
 from __future__ import annotations
 
-from .main import main
+
+def main() -> None:
+    # Answer tab completion from the cached spec before importing kwconf or
+    # any subcommand module.
+    from git_well._completion import fast_autocomplete
+
+    fast_autocomplete()
+
+    from git_well.main import main as _main
+
+    _main()
+
 
 if __name__ == '__main__':
     """
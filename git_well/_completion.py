@@ -0,0 +1,321 @@
+"""
+Precomputed shell completion for ``git-well`` and ``git-ipfs``.
+
+The normal argcomplete path builds the full kwconf parser tree on every
+keypress, which imports every subcommand module. Instead, the parser tree is
+flattened once into a JSON spec that records the subcommands, options and
+choices of each level. The spec is cached per package version and the
+completion hook answers from it without importing any subcommand module.
+
+This module is imported on every completion request, so it intentionally
+only depends on the standard library at import time.
+
+CommandLine:
+    # Rebuild the cached spec and show where it was written
+    python -m git_well._completion
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+from typing import Any
+
+SPEC_FORMAT = 1
+
+
+def _cache_dpath() -> str:
+    """
+    Per-user cache directory, following the same platform conventions as
+    ``ub.Path.appdir(type='cache')`` without importing ubelt.
+    """
+    if sys.platform.startswith('win32'):
+        base = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    elif sys.platform.startswith('darwin'):
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(
+            '~/.cache'
+        )
+    return os.path.join(base, 'git_well')
+
+
+def spec_fpath() -> str:
+    return os.path.join(_cache_dpath(), 'completion_spec.json')
+
+
+def build_spec() -> dict[str, Any]:
+    """
+    Flatten the full ``git-well`` parser into a JSON-compatible tree.
+
+    This imports every subcommand, so it should only run when the cached spec
+    is missing or stale.
+
+    Returns:
+        Dict: nested nodes with ``options``, ``commands``, ``aliases`` and
+        ``positional_choices``.
+
+    Example:
+        >>> from git_well._completion import build_spec
+        >>> spec = build_spec()
+        >>> assert 'url' in spec['commands']
+        >>> assert '--protocol' in spec['commands']['url']['options']
+        >>> assert 'add' in spec['commands']['ipfs']['commands']
+    """
+    from git_well.main import SUBCOMMANDS, GitWellModalCLI
+
+    modal = GitWellModalCLI()
+    for spec in SUBCOMMANDS:
+        modal._materialize(spec.command)
+    parser = modal.argparse()
+    return _parser_node(parser)
+
+
+def _parser_node(parser: Any) -> dict[str, Any]:
+    import argparse
+
+    node: dict[str, Any] = {
+        'options': {},
+        'commands': {},
+        'aliases': {},
+        'positional_choices': [],
+    }
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            helps = {a.dest: a.help for a in action._choices_actions}
+            primary_of: dict[int, str] = {}
+            for name, subparser in action.choices.items():
+                # argparse registers the primary name before its aliases
+                if id(subparser) not in primary_of:
+                    primary_of[id(subparser)] = name
+                    child = _parser_node(subparser)
+                    child['help'] = helps.get(name) or ''
+                    node['commands'][name] = child
+                else:
+                    node['aliases'][name] = primary_of[id(subparser)]
+        elif action.option_strings:
+            if action.help == argparse.SUPPRESS:
+                continue
+            info = {
+                'nargs': 0 if action.nargs == 0 else 1,
+                'choices': _choice_list(action.choices),
+                'help': action.help or '',
+            }
+            for option in action.option_strings:
+                node['options'][option] = info
+        elif action.choices is not None:
+            # Containers that cannot be listed offer no completions
+            node['positional_choices'].extend(
+                _choice_list(action.choices) or []
+            )
+    return node
+
+
+def _choice_list(choices: Any) -> list[str] | None:
+    if choices is None:
+        return None
+    try:
+        return [str(c) for c in choices]
+    except TypeError:
+        return None
+
+
+def load_spec(rebuild: bool = False) -> dict[str, Any]:
+    """
+    Return the cached spec, rebuilding it when the package version changed.
+    """
+    from git_well import __version__
+
+    fpath = spec_fpath()
+    if not rebuild:
+        try:
+            with open(fpath) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            data = None
+        if (
+            data is not None
+            and data.get('version') == __version__
+            and data.get('format') == SPEC_FORMAT
+        ):
+            return data['tree']
+    tree = build_spec()
+    data = {'version': __version__, 'format': SPEC_FORMAT, 'tree': tree}
+    os.makedirs(os.path.dirname(fpath), exist_ok=True)
+    tmp_fpath = f'{fpath}.{os.getpid()}.tmp'
+    with open(tmp_fpath, 'w') as file:
+        json.dump(data, file)
+    os.replace(tmp_fpath, fpath)
+    return tree
+
+
+def _dedup_spellings(names: list[str]) -> list[str]:
+    # kwconf registers both ``foo_bar`` and ``foo-bar``. Only offer the first
+    # spelling that matched so the menu is not doubled.
+    seen = set()
+    unique = []
+    for name in names:
+        key = name.replace('-', '_')
+        if key not in seen:
+            seen.add(key)
+            unique.append(name)
+    return unique
+
+
+def complete(
+    tree: dict[str, Any], words: list[str], prefix: str
+) -> list[tuple[str, str]]:
+    """
+    Compute completions for the word being typed.
+
+    Args:
+        tree (Dict): a spec tree from :func:`load_spec`
+        words (List[str]): complete words after the program name
+        prefix (str): the partial word under the cursor
+
+    Returns:
+        List[Tuple[str, str]]: candidate and its description
+
+    Example:
+        >>> from git_well._completion import complete
+        >>> tree = {
+        >>>     'options': {'--help': {'nargs': 0, 'choices': None, 'help': ''}},
+        >>>     'aliases': {'permit': 'remote_protocol'},
+        >>>     'positional_choices': [],
+        >>>     'commands': {'remote_protocol': {
+        >>>         'help': 'Change protocol', 'aliases': {}, 'commands': {},
+        >>>         'positional_choices': [],
+        >>>         'options': {'--protocol': {'nargs': 1, 'choices': ['git', 'ssh'], 'help': ''}},
+        >>>     }},
+        >>> }
+        >>> complete(tree, [], 're')
+        [('remote_protocol', 'Change protocol')]
+        >>> complete(tree, ['permit', '--protocol'], '')
+        [('git', ''), ('ssh', '')]
+        >>> complete(tree, ['remote_protocol'], '--p')
+        [('--protocol', '')]
+    """
+    node = tree
+    pending = None
+    for word in words:
+        if pending is not None:
+            pending = None
+            continue
+        if word.startswith('-'):
+            option = node['options'].get(word.split('=', 1)[0])
+            if option is not None and option['nargs'] and '=' not in word:
+                pending = option
+            continue
+        name = node['aliases'].get(word, word)
+        if name in node['commands']:
+            node = node['commands'][name]
+
+    if pending is not None and pending['choices'] is not None:
+        return [(c, '') for c in pending['choices'] if c.startswith(prefix)]
+    if pending is not None:
+        # Free-form value: defer to the shell's default (filename) completion.
+        return []
+
+    if prefix.startswith('-'):
+        names = _dedup_spellings(
+            [k for k in node['options'] if k.startswith(prefix)]
+        )
+        return [(k, node['options'][k]['help']) for k in names]
+
+    candidates = [
+        (name, sub['help'])
+        for name, sub in node['commands'].items()
+        if name.startswith(prefix)
+    ]
+    candidates += [
+        (alias, node['commands'][target]['help'])
+        for alias, target in node['aliases'].items()
+        if alias.startswith(prefix)
+    ]
+    candidates += [
+        (c, '') for c in node['positional_choices'] if c.startswith(prefix)
+    ]
+    names = _dedup_spellings([c[0] for c in candidates])
+    lut = dict(candidates)
+    return [(name, lut[name]) for name in names]
+
+
+def fast_autocomplete(
+    command_path: list[str] | None = None, exit: bool = True
+) -> bool:
+    """
+    Answer an argcomplete request from the cached spec.
+
+    Does nothing unless the ``_ARGCOMPLETE`` environment variable is set. The
+    output protocol matches argcomplete's, so the standard
+    ``register-python-argcomplete`` shell hooks work unchanged.
+
+    Args:
+        command_path (List[str] | None):
+            subcommands that the running program corresponds to, e.g.
+            ``['ipfs']`` for ``git-ipfs``.
+        exit (bool): if True, exit the process after answering.
+
+    Returns:
+        bool: True if the request was answered, False if the caller should
+        fall back to the full parser (e.g. the spec could not be built).
+    """
+    if '_ARGCOMPLETE' not in os.environ:
+        return False
+    import shlex
+
+    try:
+        tree = load_spec()
+        for name in command_path or []:
+            tree = tree['commands'][name]
+    except Exception:
+        return False
+
+    comp_line = os.environ.get('COMP_LINE', '')
+    comp_point = int(os.environ.get('COMP_POINT', len(comp_line)))
+    line = comp_line[:comp_point]
+    lexer = shlex.shlex(line, posix=True)
+    lexer.whitespace_split = True
+    words = []
+    try:
+        for word in lexer:
+            words.append(word)
+    except ValueError:
+        # An unterminated quote: complete the quoted text as the prefix.
+        words.append(lexer.token)
+    if line and not line[-1].isspace() and words:
+        prefix = words.pop()
+    else:
+        prefix = ''
+    start = int(os.environ['_ARGCOMPLETE'])
+    words = words[start:]
+
+    candidates = complete(tree, words, prefix)
+    if len(candidates) == 1 and not candidates[0][0].endswith('='):
+        candidates = [(candidates[0][0] + ' ', candidates[0][1])]
+
+    ifs = os.environ.get('_ARGCOMPLETE_IFS', '\013')
+    dfs = os.environ.get('_ARGCOMPLETE_DFS')
+    if dfs:
+        items = [dfs.join((c, d.replace(ifs, ' '))) for c, d in candidates]
+    elif os.environ.get('_ARGCOMPLETE_SHELL') == 'zsh':
+        items = [f'{c}:{d}' for c, d in candidates]
+    else:
+        items = [c for c, _ in candidates]
+
+    filename = os.environ.get('_ARGCOMPLETE_STDOUT_FILENAME')
+    if filename is not None:
+        output_stream = open(filename, 'w')
+    else:
+        output_stream = os.fdopen(8, 'w')
+    with output_stream:
+        output_stream.write(ifs.join(items))
+    if exit:
+        sys.stdout.flush()
+        os._exit(0)
+    return True
+
+
+if __name__ == '__main__':
+    load_spec(rebuild=True)
+    print(spec_fpath())
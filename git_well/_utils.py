@@ -163,29 +163,251 @@ def choice_prompt(msg: str, choices: list[str]) -> str:
 
 
 def find_git_root(dpath: str | os.PathLike[str]) -> ub.Path:
-    if 0:
-        # Old implementation
-        cwd = ub.Path(dpath).absolute()
-        parts = cwd.parts
-        found = None
-        for i in reversed(range(0, len(parts) + 1)):
-            p = ub.Path(*parts[0:i])
-            cand = p / '.git'
-            if cand.exists():
-                found = p
-                break
-        if found is None:
-            raise Exception('cannot find git root')
-    else:
-        # New implementation (should be more robust)
-        # allow running inside a subdir of a repo
-        info = ub.cmd('git rev-parse --show-toplevel', cwd=dpath, verbose=0)
-        if info['ret'] != 0:
-            raise RuntimeError(f'Not a git repo: {dpath}')
-        found = ub.Path(info['out'].strip())
+    """
+    Return the root of the worktree that contains ``dpath``.
+
+    Raises:
+        RuntimeError: if ``dpath`` is not inside a git worktree
+    """
+    found = git_toplevel(dpath)
+    if found is None:
+        raise RuntimeError(f'Not a git repo: {dpath}')
     return found
 
 
+# Maps a directory and the environment that affects discovery to the worktree
+# root it belongs to. Only positive results are kept; misses are cheap to
+# recompute and would otherwise go stale when a repo is initialized later.
+_GIT_TOPLEVEL_CACHE: dict[tuple[str, tuple[str | None, ...]], str] = {}
+
+_DISCOVERY_ENVIRON = (
+    'GIT_DIR',
+    'GIT_WORK_TREE',
+    'GIT_CEILING_DIRECTORIES',
+    'GIT_DISCOVERY_ACROSS_FILESYSTEM',
+)
+
+
+def clear_git_toplevel_cache() -> None:
+    """
+    Forget cached :func:`git_toplevel` results, e.g. after moving a repo.
+    """
+    _GIT_TOPLEVEL_CACHE.clear()
+
+
+def git_toplevel(dpath: str | os.PathLike[str]) -> ub.Path | None:
+    """
+    Pure-Python equivalent of ``git rev-parse --show-toplevel``.
+
+    Walks up from ``dpath`` (or its nearest existing parent) looking for a
+    ``.git`` directory or a ``.git`` file pointing elsewhere (worktrees and
+    submodules). ``GIT_DIR``, ``GIT_WORK_TREE``, ``GIT_CEILING_DIRECTORIES``
+    and ``GIT_DISCOVERY_ACROSS_FILESYSTEM`` are honored the same way git
+    does, and so is a ``core.worktree`` that contains ``dpath`` (as set in
+    the git dirs of submodules). Setups that need git's full config handling
+    (``GIT_DIR`` without a work tree, a ``core.worktree`` elsewhere) defer to
+    ``git rev-parse``.
+
+    Results are cached for the lifetime of the process for every directory
+    visited, see :func:`clear_git_toplevel_cache`.
+
+    Args:
+        dpath (str | PathLike): a path inside the worktree
+
+    Returns:
+        ub.Path | None: the real path of the worktree root, or None if
+        ``dpath`` is not inside a worktree (including bare repos).
+
+    Example:
+        >>> from git_well._utils import git_toplevel
+        >>> from git_well.demo import make_dummy_git_repo
+        >>> repo_dpath = make_dummy_git_repo()
+        >>> subdir = (repo_dpath / 'sub' / 'dir').ensuredir()
+        >>> assert git_toplevel(subdir) == repo_dpath.resolve()
+        >>> assert git_toplevel(subdir / 'not' / 'made' / 'yet') == repo_dpath.resolve()
+        >>> assert git_toplevel(repo_dpath / '.git' / 'refs') is None
+
+    Example:
+        >>> # Submodule git dirs set core.worktree, which needs no git process
+        >>> import ubelt as ub
+        >>> from git_well import tracing
+        >>> from git_well._utils import clear_git_toplevel_cache, git_toplevel
+        >>> from git_well.demo import make_dummy_git_repo
+        >>> sub_src = make_dummy_git_repo()
+        >>> repo_dpath = ub.Path.appdir('git_well/tests/toplevel_super')
+        >>> repo_dpath.delete().ensuredir()
+        >>> _ = ub.cmd('git init -q', cwd=repo_dpath, check=True)
+        >>> _ = ub.cmd(['git', '-c', 'protocol.file.allow=always', 'submodule',
+        >>>             'add', '-q', sub_src, 'libs/sub'], cwd=repo_dpath,
+        >>>            check=True)
+        >>> sub = repo_dpath / 'libs' / 'sub'
+        >>> subdir = (sub / 'nested').ensuredir()
+        >>> expected = ub.cmd(['git', 'rev-parse', '--show-toplevel'],
+        >>>                   cwd=subdir, check=True)['out'].strip()
+        >>> clear_git_toplevel_cache()
+        >>> with tracing.Tracer() as tracer:
+        >>>     found = git_toplevel(subdir)
+        >>> assert found == ub.Path(expected) == sub.resolve()
+        >>> assert tracer.summary() == {}
+    """
+    environ = tuple(os.environ.get(k) for k in _DISCOVERY_ENVIRON)
+    start = os.path.realpath(_existing_dir(dpath))
+    found = _GIT_TOPLEVEL_CACHE.get((start, environ))
+    if found is None:
+        found = _discover_git_toplevel(start)
+        if found is None:
+            return None
+        # Every directory between the start and the root shares the result.
+        dpath_ = start
+        while True:
+            _GIT_TOPLEVEL_CACHE[(dpath_, environ)] = found
+            if dpath_ == found or os.path.dirname(dpath_) == dpath_:
+                break
+            dpath_ = os.path.dirname(dpath_)
+    return ub.Path(found)
+
+
+def _existing_dir(path: str | os.PathLike[str]) -> str:
+    """
+    Return ``path`` if it is a directory, else its nearest existing parent.
+    """
+    path = os.path.abspath(path)
+    if not os.path.isdir(path):
+        path = os.path.dirname(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+
+def _discover_git_toplevel(start: str) -> str | None:
+    git_dir_env = os.environ.get('GIT_DIR')
+    work_tree_env = os.environ.get('GIT_WORK_TREE')
+    if git_dir_env:
+        if work_tree_env:
+            if not _is_git_dir(os.path.join(start, git_dir_env)):
+                return None
+            return os.path.realpath(os.path.join(start, work_tree_env))
+        return _rev_parse_toplevel(start)
+
+    ceilings = _ceiling_directories()
+    across_fs = _env_flag('GIT_DISCOVERY_ACROSS_FILESYSTEM')
+    start_dev = os.stat(start).st_dev
+    current = start
+    while True:
+        dot_git = os.path.join(current, '.git')
+        git_dir = None
+        if os.path.isfile(dot_git):
+            git_dir = _read_gitfile(dot_git)
+        elif _is_git_dir(dot_git):
+            git_dir = dot_git
+        if git_dir is not None:
+            core = _read_core_config(git_dir)
+            if work_tree_env:
+                return os.path.realpath(os.path.join(start, work_tree_env))
+            if 'worktree' in core:
+                # Relative to the git dir, as in submodule git dirs under
+                # ``.git/modules/<name>``.
+                work_tree = os.path.realpath(
+                    os.path.join(git_dir, core['worktree'])
+                )
+                if _is_relative_to(start, work_tree):
+                    return work_tree
+                return _rev_parse_toplevel(start)
+            if core.get('bare', 'false').lower() in {'true', 'yes', 'on', '1'}:
+                return None
+            return current
+        if _is_git_dir(current):
+            # Inside a bare repository or a .git directory: no worktree.
+            return None
+        parent = os.path.dirname(current)
+        if parent == current or parent in ceilings:
+            return None
+        if not across_fs and os.stat(parent).st_dev != start_dev:
+            return None
+        current = parent
+
+
+def _is_relative_to(path: str, parent: str) -> bool:
+    return path == parent or path.startswith(parent.rstrip(os.sep) + os.sep)
+
+
+def _is_git_dir(dpath: str) -> bool:
+    # The same minimal checks git uses in ``is_git_directory``.
+    if not os.path.isfile(os.path.join(dpath, 'HEAD')):
+        return False
+    if os.path.isfile(os.path.join(dpath, 'commondir')):
+        return True
+    return os.path.isdir(os.path.join(dpath, 'objects')) and os.path.isdir(
+        os.path.join(dpath, 'refs')
+    )
+
+
+def _read_gitfile(fpath: str) -> str | None:
+    try:
+        with open(fpath) as file:
+            text = file.read()
+    except OSError:
+        return None
+    if not text.startswith('gitdir: '):
+        return None
+    git_dir = text[len('gitdir: ') :].strip()
+    git_dir = os.path.join(os.path.dirname(fpath), git_dir)
+    return git_dir if _is_git_dir(git_dir) else None
+
+
+def _read_core_config(git_dir: str) -> dict[str, str]:
+    """
+    Read the ``[core]`` keys that change where the worktree is.
+
+    Example:
+        >>> import ubelt as ub
+        >>> from git_well._utils import _read_core_config
+        >>> dpath = ub.Path.appdir('git_well/tests/core_config').ensuredir()
+        >>> _ = (dpath / 'config').write_text(chr(10).join([
+        >>>     '[core]', '    Bare = true', '[remote "origin"]', '  worktree = x']))
+        >>> _read_core_config(dpath)
+        {'bare': 'true'}
+    """
+    config: dict[str, str] = {}
+    try:
+        with open(os.path.join(git_dir, 'config')) as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return config
+    in_core = False
+    for line in lines:
+        line = line.strip()
+        if line.startswith('['):
+            in_core = line.split(']', 1)[0][1:].strip().lower() == 'core'
+            continue
+        if in_core and '=' in line:
+            key, _, value = line.partition('=')
+            key = key.strip().lower()
+            if key in {'bare', 'worktree'}:
+                config[key] = value.strip().strip('"')
+    return config
+
+
+def _ceiling_directories() -> set[str]:
+    text = os.environ.get('GIT_CEILING_DIRECTORIES', '')
+    return {
+        os.path.realpath(p) for p in text.split(os.pathsep) if os.path.isabs(p)
+    }
+
+
+def _env_flag(name: str) -> bool:
+    value = os.environ.get(name, '').strip().lower()
+    return value in {'1', 'true', 'yes', 'on'}
+
+
+def _rev_parse_toplevel(start: str) -> str | None:
+    info = ub.cmd(['git', 'rev-parse', '--show-toplevel'], cwd=start, verbose=0)
+    if info['ret'] != 0:
+        return None
+    toplevel = cmd_output_text(info['out']).strip()
+    return toplevel or None
+
+
 class _GitURLInfoRequired(TypedDict):
     host: str | None
     port: int | None
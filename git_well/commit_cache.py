@@ -0,0 +1,486 @@
+"""
+A persistent cache of commit metadata under ``.git/git-well/``.
+
+Commits never change, yet every analysis asks git for the same authors,
+dates, parents and diff statistics again. :class:`CommitCache` keeps them in
+a small sqlite database keyed by commit id and fills it incrementally: only
+commits that were never seen are read, through the shared
+:class:`git_well.objects.GitObjectReader` for metadata and one ``git log
+--numstat`` call for diff statistics.
+
+If the database cannot be created (e.g. a read-only repository), the cache
+silently lives in memory for the lifetime of the process.
+
+Example:
+    >>> from git_well.commit_cache import commit_cache
+    >>> from git_well.repo import Repo
+    >>> repo = Repo.demo()
+    >>> cache = commit_cache(repo)
+    >>> num_new = cache.update(['HEAD'])
+    >>> assert num_new == len(cache) == len(list(repo.iter_commits()))
+    >>> assert cache.update(['HEAD']) == 0
+    >>> info, = cache.get_many([repo.head.commit.hexsha])
+    >>> assert info.message == repo.head.commit.message
+    >>> inserts, deletes, files = cache.numstat_totals([info.hexsha])[info.hexsha]
+    >>> assert files == len(repo.head.commit.stats.files)
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import subprocess
+import threading
+import weakref
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:  # pragma: no cover
+    import git
+
+    from git_well.objects import CommitInfo
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS commits (
+    sha TEXT PRIMARY KEY,
+    tree TEXT NOT NULL,
+    parents TEXT NOT NULL,
+    author TEXT NOT NULL,
+    author_time INTEGER NOT NULL,
+    author_tz TEXT NOT NULL,
+    committer TEXT NOT NULL,
+    committer_time INTEGER NOT NULL,
+    committer_tz TEXT NOT NULL,
+    message_hash TEXT NOT NULL,
+    message TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS numstat_totals (
+    sha TEXT PRIMARY KEY,
+    inserts INTEGER NOT NULL,
+    deletes INTEGER NOT NULL,
+    files INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS numstat_files (
+    sha TEXT NOT NULL,
+    path TEXT NOT NULL,
+    inserts INTEGER NOT NULL,
+    deletes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS numstat_files_sha ON numstat_files (sha);
+CREATE TABLE IF NOT EXISTS tips (
+    sha TEXT PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+_COMMIT_COLUMNS = (
+    'sha, tree, parents, author, author_time, author_tz, committer, '
+    'committer_time, committer_tz, message'
+)
+
+# sqlite limits the number of bound parameters per statement
+_CHUNKSIZE = 500
+
+
+class CommitCache:
+    """
+    Commit metadata and diff statistics of one repository, keyed by id.
+
+    The cache only holds a weak reference to ``repo``, so it does not keep the
+    repository (and its ``git cat-file`` processes) alive.
+
+    Args:
+        repo (git.Repo): the repository
+        fpath (str | PathLike | None): the database file, defaults to
+            ``<common git dir>/git-well/commits.sqlite3``. Use ``':memory:'``
+            for a cache that is not persisted.
+    """
+
+    def __init__(
+        self, repo: git.Repo, fpath: str | os.PathLike[str] | None = None
+    ) -> None:
+        self._repo_ref = weakref.ref(repo)
+        self.git_dir = repo.git_dir
+        if fpath is None:
+            fpath = os.path.join(
+                repo.common_dir, 'git-well', 'commits.sqlite3'
+            )
+        self.fpath = os.fspath(fpath)
+        self._lock = threading.Lock()
+        self.conn = self._connect(self.fpath)
+
+    @staticmethod
+    def _connect(fpath: str) -> sqlite3.Connection:
+        if fpath != ':memory:':
+            os.makedirs(os.path.dirname(fpath), exist_ok=True)
+        conn = sqlite3.connect(fpath, timeout=30, check_same_thread=False)
+        conn.executescript(_SCHEMA)
+        row = conn.execute(
+            "SELECT value FROM meta WHERE key = 'schema_version'"
+        ).fetchone()
+        if row is None:
+            with conn:
+                conn.execute(
+                    "INSERT INTO meta VALUES ('schema_version', ?)",
+                    (str(SCHEMA_VERSION),),
+                )
+        elif row[0] != str(SCHEMA_VERSION):
+            conn.close()
+            raise sqlite3.DatabaseError(
+                f'unsupported commit cache schema {row[0]} in {fpath}'
+            )
+        return conn
+
+    @property
+    def repo(self) -> git.Repo:
+        repo = self._repo_ref()
+        if repo is None:
+            raise ReferenceError(f'the repository {self.git_dir} was deleted')
+        return repo
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> CommitCache:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM commits').fetchone()[0]
+
+    def __contains__(self, hexsha: str) -> bool:
+        row = self.conn.execute(
+            'SELECT 1 FROM commits WHERE sha = ?', (hexsha,)
+        ).fetchone()
+        return row is not None
+
+    def get_many(self, hexshas: Iterable[str]) -> list[CommitInfo]:
+        """
+        Metadata of full commit ids, reading and caching the unknown ones.
+
+        Raises:
+            KeyError: if a commit does not exist
+        """
+        from git_well.objects import CommitInfo
+
+        hexshas = list(hexshas)
+        found: dict[str, CommitInfo] = {}
+        with self._lock:
+            for chunk in _chunks(hexshas):
+                rows = self.conn.execute(
+                    f'SELECT {_COMMIT_COLUMNS} FROM commits '
+                    f'WHERE sha IN ({_placeholders(chunk)})',
+                    chunk,
+                )
+                for row in rows:
+                    found[row[0]] = CommitInfo(
+                        hexsha=row[0],
+                        tree=row[1],
+                        parents=tuple(row[2].split()),
+                        author=row[3],
+                        author_time=row[4],
+                        author_tz=row[5],
+                        committer=row[6],
+                        committer_time=row[7],
+                        committer_tz=row[8],
+                        message=row[9],
+                    )
+            missing = [sha for sha in dict.fromkeys(hexshas) if sha not in found]
+            if missing:
+                for info in self._read_commits(missing):
+                    found[info.hexsha] = info
+        return [found[sha] for sha in hexshas]
+
+    def update(self, tips: Iterable[str] = ('HEAD',)) -> int:
+        """
+        Cache every ancestor of ``tips`` that is not cached yet.
+
+        Histories below the tips of earlier updates are excluded from the
+        walk, so repeated updates only cost the new commits.
+
+        Returns:
+            int: the number of newly cached commits
+        """
+        from git_well.objects import object_reader
+
+        objects = object_reader(self.repo)
+        infos = objects.info_many(f'{tip}^{{commit}}' for tip in tips)
+        tip_shas = [info.hexsha for info in infos if info is not None]
+        with self._lock:
+            known = [
+                row[0] for row in self.conn.execute('SELECT sha FROM tips')
+            ]
+            # Tips of rewritten histories may have been garbage collected
+            exists = objects.info_many(known)
+            known = [sha for sha, info in zip(known, exists) if info is not None]
+            stdin = ''.join(f'{sha}\n' for sha in tip_shas)
+            stdin += ''.join(f'^{sha}\n' for sha in known)
+            proc = subprocess.run(
+                ['git', 'rev-list', '--stdin'],
+                input=stdin.encode('ascii'),
+                capture_output=True,
+                cwd=self.git_dir,
+            )
+            if proc.returncode != 0:
+                raise RuntimeError(
+                    'git rev-list failed: '
+                    + proc.stderr.decode('utf-8', 'replace')
+                )
+            candidates = proc.stdout.decode('ascii').split()
+            new = []
+            for chunk in _chunks(candidates):
+                cached = {
+                    row[0]
+                    for row in self.conn.execute(
+                        'SELECT sha FROM commits '
+                        f'WHERE sha IN ({_placeholders(chunk)})',
+                        chunk,
+                    )
+                }
+                new.extend(sha for sha in chunk if sha not in cached)
+            for chunk in _chunks(new, 10000):
+                self._read_commits(chunk)
+            self._write(
+                [
+                    (
+                        'INSERT OR IGNORE INTO tips VALUES (?)',
+                        [(sha,) for sha in tip_shas],
+                    )
+                ]
+            )
+        return len(new)
+
+    def _read_commits(self, hexshas: list[str]) -> list[CommitInfo]:
+        from git_well.objects import object_reader
+
+        infos = object_reader(self.repo).read_commits(hexshas)
+        rows = [
+            (
+                info.hexsha,
+                info.tree,
+                ' '.join(info.parents),
+                info.author,
+                info.author_time,
+                info.author_tz,
+                info.committer,
+                info.committer_time,
+                info.committer_tz,
+                message_hash(info.message),
+                info.message,
+            )
+            for info in infos
+        ]
+        self._write(
+            [
+                (
+                    'INSERT OR REPLACE INTO commits VALUES '
+                    '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    rows,
+                )
+            ]
+        )
+        return infos
+
+    def numstat_totals(
+        self, hexshas: Iterable[str]
+    ) -> dict[str, tuple[int, int, int]]:
+        """
+        Inserted lines, deleted lines and changed files per commit.
+
+        Merge commits count as empty, like ``git log --numstat``.
+        """
+        hexshas = list(hexshas)
+        with self._lock:
+            self._fill_numstat(hexshas)
+            totals = {}
+            for chunk in _chunks(hexshas):
+                rows = self.conn.execute(
+                    'SELECT sha, inserts, deletes, files FROM numstat_totals '
+                    f'WHERE sha IN ({_placeholders(chunk)})',
+                    chunk,
+                )
+                for sha, inserts, deletes, files in rows:
+                    totals[sha] = (inserts, deletes, files)
+        return totals
+
+    def numstat_files(
+        self, hexshas: Iterable[str]
+    ) -> dict[str, list[tuple[str, int, int]]]:
+        """
+        The ``(path, inserts, deletes)`` rows of ``git log --numstat``.
+
+        Binary files count as zero inserted and deleted lines.
+        """
+        hexshas = list(hexshas)
+        with self._lock:
+            self._fill_numstat(hexshas)
+            files: dict[str, list[tuple[str, int, int]]] = {
+                sha: [] for sha in hexshas
+            }
+            for chunk in _chunks(hexshas):
+                rows = self.conn.execute(
+                    'SELECT sha, path, inserts, deletes FROM numstat_files '
+                    f'WHERE sha IN ({_placeholders(chunk)})',
+                    chunk,
+                )
+                for sha, path, inserts, deletes in rows:
+                    files[sha].append((path, inserts, deletes))
+        return files
+
+    def _fill_numstat(self, hexshas: list[str]) -> None:
+        known: set[str] = set()
+        for chunk in _chunks(hexshas):
+            known.update(
+                row[0]
+                for row in self.conn.execute(
+                    'SELECT sha FROM numstat_totals '
+                    f'WHERE sha IN ({_placeholders(chunk)})',
+                    chunk,
+                )
+            )
+        missing = [sha for sha in dict.fromkeys(hexshas) if sha not in known]
+        if not missing:
+            return
+        stdin = ''.join(f'{sha}\n' for sha in missing).encode('ascii')
+        proc = subprocess.run(
+            [
+                'git',
+                'log',
+                '--no-walk=unsorted',
+                '--stdin',
+                '--format=%x00%H',
+                '--numstat',
+            ],
+            input=stdin,
+            capture_output=True,
+            cwd=self.git_dir,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(
+                'git log --numstat failed: '
+                + proc.stderr.decode('utf-8', 'replace')
+            )
+        totals = []
+        file_rows = []
+        for sha, rows in _parse_numstat(proc.stdout.decode('utf-8', 'replace')):
+            totals.append(
+                (
+                    sha,
+                    sum(row[1] for row in rows),
+                    sum(row[2] for row in rows),
+                    len(rows),
+                )
+            )
+            file_rows.extend((sha, *row) for row in rows)
+        self._write(
+            [
+                (
+                    'INSERT OR REPLACE INTO numstat_totals VALUES (?, ?, ?, ?)',
+                    totals,
+                ),
+                # Another process may have filled the same commits meanwhile
+                (
+                    'DELETE FROM numstat_files WHERE sha = ?',
+                    [(row[0],) for row in totals],
+                ),
+                ('INSERT INTO numstat_files VALUES (?, ?, ?, ?)', file_rows),
+            ]
+        )
+
+    def _write(self, statements: list[tuple[str, list[tuple]]]) -> None:
+        """
+        Run ``executemany`` statements in one transaction.
+
+        A cache must never break the command using it, so if the database
+        became unwritable the cache continues in memory.
+        """
+        try:
+            with self.conn:
+                for sql, rows in statements:
+                    self.conn.executemany(sql, rows)
+        except sqlite3.OperationalError:
+            if self.fpath == ':memory:':
+                raise
+            self.conn.close()
+            self.fpath = ':memory:'
+            self.conn = self._connect(self.fpath)
+            with self.conn:
+                for sql, rows in statements:
+                    self.conn.executemany(sql, rows)
+
+
+def message_hash(message: str) -> str:
+    """
+    The id used to compare commit messages without loading them.
+
+    Example:
+        >>> from git_well.commit_cache import message_hash
+        >>> message_hash('wip\\n') == message_hash('wip\\n') != message_hash('wip')
+        True
+    """
+    return hashlib.sha1(message.encode('utf-8')).hexdigest()
+
+
+def _parse_numstat(text: str) -> list[tuple[str, list[tuple[str, int, int]]]]:
+    """
+    Example:
+        >>> from git_well.commit_cache import _parse_numstat
+        >>> text = '\\x00aaa\\n\\n1\\t2\\tx.py\\n-\\t-\\tbin.png\\n\\x00bbb\\n'
+        >>> _parse_numstat(text)
+        [('aaa', [('x.py', 1, 2), ('bin.png', 0, 0)]), ('bbb', [])]
+    """
+    results: list[tuple[str, list[tuple[str, int, int]]]] = []
+    for line in text.split('\n'):
+        if line.startswith('\0'):
+            results.append((line[1:], []))
+        elif line and results:
+            inserts, deletes, path = line.split('\t', 2)
+            results[-1][1].append(
+                (
+                    path,
+                    0 if inserts == '-' else int(inserts),
+                    0 if deletes == '-' else int(deletes),
+                )
+            )
+    return results
+
+
+def _placeholders(chunk: list[str]) -> str:
+    return ', '.join('?' * len(chunk))
+
+
+def _chunks(items: list[str], chunksize: int = _CHUNKSIZE) -> list[list[str]]:
+    return [
+        items[start : start + chunksize]
+        for start in range(0, len(items), chunksize)
+    ]
+
+
+_SHARED_CACHES: weakref.WeakKeyDictionary[git.Repo, CommitCache] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def commit_cache(repo: git.Repo) -> CommitCache:
+    """
+    Return the shared :class:`CommitCache` of a repository.
+
+    The cache lives as long as the repo object and its database connection is
+    closed when the repo is garbage collected. Falls back to an in-memory
+    cache if the database cannot be opened.
+    """
+    cache = _SHARED_CACHES.get(repo)
+    if cache is None:
+        try:
+            cache = CommitCache(repo)
+        except (OSError, sqlite3.Error):
+            cache = CommitCache(repo, ':memory:')
+        _SHARED_CACHES[repo] = cache
+        weakref.finalize(repo, cache.close)
+    return cache
@@ -0,0 +1,601 @@
+"""
+Compact, integer-indexed commit graphs loaded with one ``git rev-list`` call.
+
+Walking ``Commit.parents`` with GitPython reads one object per commit and
+keeps a full ``Commit`` for every node, which is too slow and too large for
+histories with hundreds of thousands of commits. :class:`CommitGraph` streams
+``git rev-list --topo-order`` instead and stores the result in flat
+:mod:`array` columns:
+
+* row ``i`` is the ``i``-th commit in topological order (children first),
+* parents are a CSR index: the parents of row ``i`` are
+  ``parent_indices[parent_indptr[i]:parent_indptr[i + 1]]``, where ``-1``
+  marks a parent outside the loaded graph,
+* authors and messages are interned, so each row only stores integer ids.
+"""
+from __future__ import annotations
+
+import subprocess
+from array import array
+from itertools import accumulate as it_accumulate
+from typing import IO, TYPE_CHECKING, Any, Iterator
+
+if TYPE_CHECKING:  # pragma: no cover
+    import git
+
+    from git_well.commit_cache import CommitCache
+    from git_well.objects import CommitInfo
+
+# Per-commit fields requested with ``--format`` when metadata is loaded
+_METADATA_FORMAT = '%H %P%x00%an%x00%ad%x00%B%x00'
+_NUM_METADATA_FIELDS = 4
+
+
+class CommitGraph:
+    """
+    Parent structure and squash-relevant metadata of a commit history.
+
+    Use :func:`CommitGraph.load` to construct one from a repository.
+
+    Example:
+        >>> from git_well.commit_graph import CommitGraph
+        >>> from git_well.repo import Repo
+        >>> repo = Repo.demo()
+        >>> graph = CommitGraph.load(repo)
+        >>> assert graph.hexsha(0) == repo.head.commit.hexsha
+        >>> assert len(graph) == len(list(repo.iter_commits()))
+        >>> parent, = graph.parents(0)
+        >>> assert graph.hexsha(parent) == repo.head.commit.parents[0].hexsha
+        >>> assert graph.message(0) == repo.head.commit.message
+        >>> assert graph.author(0) == repo.head.commit.author.name
+    """
+
+    def __init__(self) -> None:
+        self._binshas = bytearray()
+        self._index: dict[bytes, int] = {}
+        self.parent_indptr = array('q', [0])
+        self.parent_indices = array('q')
+        self.author_ids = array('i')
+        self.author_times = array('q')
+        self.author_tz_offsets = array('i')
+        self.message_ids = array('i')
+        self.authors: list[str] = []
+        self.messages: list[str] = []
+        self.has_metadata = False
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def hexsha(self, index: int) -> str:
+        return self._binshas[index * 20 : index * 20 + 20].hex()
+
+    def index(self, hexsha: str) -> int:
+        """
+        Row of a commit. Raises KeyError if it is not in the graph.
+        """
+        return self._index[bytes.fromhex(hexsha)]
+
+    def __contains__(self, hexsha: str) -> bool:
+        return bytes.fromhex(hexsha) in self._index
+
+    def parents(self, index: int) -> array:
+        return self.parent_indices[
+            self.parent_indptr[index] : self.parent_indptr[index + 1]
+        ]
+
+    def num_parents(self, index: int) -> int:
+        return self.parent_indptr[index + 1] - self.parent_indptr[index]
+
+    def author(self, index: int) -> str:
+        return self.authors[self.author_ids[index]]
+
+    def message(self, index: int) -> str:
+        return self.messages[self.message_ids[index]]
+
+    def day_buckets(self) -> array:
+        """
+        Author date of each commit as days since the epoch, in the author's
+        own timezone (the same day ``authored_datetime.date()`` reports).
+        """
+        return array(
+            'q',
+            (
+                (t + tz) // 86400
+                for t, tz in zip(self.author_times, self.author_tz_offsets)
+            ),
+        )
+
+    def edges(self) -> Iterator[tuple[int, int]]:
+        """
+        Child-to-parent edges between loaded commits.
+        """
+        for edge, _ in self._edge_positions():
+            yield edge
+
+    def _edge_positions(self) -> Iterator[tuple[tuple[int, int], int]]:
+        # Like :func:`edges`, also yielding the position in parent_indices,
+        # which serves as the edge id.
+        indptr = self.parent_indptr
+        indices = self.parent_indices
+        for child in range(len(self)):
+            for pos in range(indptr[child], indptr[child + 1]):
+                parent = indices[pos]
+                if parent >= 0:
+                    yield (child, parent), pos
+
+    @classmethod
+    def _from_parents(cls, parents: list[list[int]]) -> CommitGraph:
+        # Build a structure-only graph with fake shas, used in tests.
+        self = cls()
+        for index, row in enumerate(parents):
+            self._add_commit(f'{index:040x}')
+            self.parent_indices.extend(row)
+            self.parent_indptr.append(len(self.parent_indices))
+        return self
+
+    def commit(self, repo: git.Repo, index: int) -> Any:
+        """
+        The GitPython commit object for a row.
+        """
+        import git
+
+        binsha = bytes(self._binshas[index * 20 : index * 20 + 20])
+        return git.Commit(repo, binsha)
+
+    @classmethod
+    def load(
+        cls,
+        repo: git.Repo,
+        head: Any = 'HEAD',
+        oldest_commit: Any | None = None,
+        preserve_tags: bool | set[str] | list[str] | tuple[str, ...] = False,
+        with_metadata: bool = True,
+    ) -> CommitGraph:
+        """
+        Load the history of ``head`` with a single ``git rev-list``.
+
+        Args:
+            repo (git.Repo): the repository
+            head (str | Commit): the newest commit
+            oldest_commit (str | Commit | None): if specified, this commit is
+                included but its ancestors are not.
+            preserve_tags (bool | Set[str]): if True the history stops at
+                every tagged commit, if a set, only at tags with these names.
+                Like ``oldest_commit``, the tagged commits themselves are
+                kept and their ancestors are cut.
+            with_metadata (bool): if False, only load the parent structure.
+
+        Example:
+            >>> from git_well.commit_graph import CommitGraph
+            >>> from git_well.repo import Repo
+            >>> repo = Repo.demo()
+            >>> repo.cmd('git tag v0 HEAD~2')
+            >>> graph = CommitGraph.load(repo, preserve_tags=True)
+            >>> assert len(graph) == 3
+            >>> assert graph.hexsha(2) == repo.commit('v0').hexsha
+            >>> assert list(graph.parents(2)) == [-1]
+            >>> graph = CommitGraph.load(repo, oldest_commit='HEAD~1', with_metadata=False)
+            >>> assert len(graph) == 2 and not graph.has_metadata
+        """
+        from git_well.objects import object_reader
+
+        head_sha = getattr(head, 'hexsha', head)
+        cut_revs = []
+        if oldest_commit is not None:
+            cut_revs.append(getattr(oldest_commit, 'hexsha', oldest_commit))
+        if preserve_tags:
+            from git_well.refs import RefSnapshot
+
+            tags = RefSnapshot.from_repo(repo).select('tag')
+            if isinstance(preserve_tags, (set, list, tuple)):
+                tags = [tag for tag in tags if tag.name in preserve_tags]
+            cut_revs.extend(tag.hexsha for tag in tags)
+
+        # Resolve cut points to commits so "<sha>^@" excludes their parents.
+        objects = object_reader(repo)
+        infos = objects.info_many(f'{rev}^{{commit}}' for rev in cut_revs)
+        excludes = sorted({f'^{info.hexsha}^@' for info in infos if info})
+
+        return cls._from_rev_list(
+            repo,
+            ['--topo-order', str(head_sha), *excludes, '--'],
+            with_metadata=with_metadata,
+        )
+
+    @classmethod
+    def from_commits(
+        cls,
+        repo: git.Repo,
+        hexshas: list[str],
+        with_metadata: bool = True,
+        cache: CommitCache | None = None,
+    ) -> CommitGraph:
+        """
+        Load exactly the given commits, in the given order.
+
+        Parents that are not in ``hexshas`` are recorded as ``-1``. If a
+        :class:`git_well.commit_cache.CommitCache` is given, the metadata is
+        taken from it instead of ``git rev-list``.
+
+        Example:
+            >>> from git_well.commit_graph import CommitGraph
+            >>> from git_well.repo import Repo
+            >>> repo = Repo.demo()
+            >>> shas = [repo.commit('HEAD~2').hexsha, repo.commit('HEAD').hexsha]
+            >>> graph = CommitGraph.from_commits(repo, shas)
+            >>> assert [graph.hexsha(0), graph.hexsha(1)] == shas
+            >>> assert list(graph.parents(0)) == list(graph.parents(1)) == [-1]
+        """
+        if cache is not None:
+            return cls.from_infos(cache.get_many(hexshas))
+        stdin = ''.join(f'{hexsha}\n' for hexsha in hexshas).encode('ascii')
+        return cls._from_rev_list(
+            repo,
+            ['--no-walk=unsorted', '--stdin'],
+            with_metadata=with_metadata,
+            stdin=stdin,
+        )
+
+    @classmethod
+    def from_infos(cls, infos: list[CommitInfo]) -> CommitGraph:
+        """
+        Build a graph with metadata from parsed commits, in the given order.
+
+        Example:
+            >>> from git_well.commit_graph import CommitGraph
+            >>> from git_well.repo import Repo
+            >>> repo = Repo.demo()
+            >>> infos = repo.objects.read_commits(['HEAD', 'HEAD~1'])
+            >>> graph = CommitGraph.from_infos(infos)
+            >>> assert list(graph.parents(0)) == [1]
+            >>> assert graph.author(0) == repo.head.commit.author.name
+        """
+        self = cls()
+        self.has_metadata = True
+        author_lut: dict[str, int] = {}
+        message_lut: dict[str, int] = {}
+        for info in infos:
+            self._add_commit(info.hexsha)
+            self._add_metadata(
+                author_lut,
+                message_lut,
+                info.author_name,
+                info.message,
+                info.author_time,
+                info.author_tz,
+            )
+        self._resolve_parents([list(info.parents) for info in infos])
+        return self
+
+    @classmethod
+    def _from_rev_list(
+        cls,
+        repo: git.Repo,
+        args: list[str],
+        with_metadata: bool,
+        stdin: bytes | None = None,
+    ) -> CommitGraph:
+        import threading
+
+        command = ['git', 'rev-list']
+        if with_metadata:
+            command += [
+                '--no-commit-header',
+                '--date=raw',
+                f'--format={_METADATA_FORMAT}',
+            ]
+        else:
+            command += ['--parents']
+        command += args
+
+        self = cls()
+        self.has_metadata = with_metadata
+        proc = subprocess.Popen(
+            command,
+            cwd=repo.git_dir,
+            stdin=subprocess.DEVNULL if stdin is None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        assert proc.stdout is not None
+        writer = None
+        if stdin is not None:
+            # Feed stdin concurrently so a large request cannot deadlock
+            # against a full stdout pipe.
+            writer = threading.Thread(
+                target=_write_and_close, args=(proc.stdin, stdin)
+            )
+            writer.start()
+        try:
+            if with_metadata:
+                parent_shas = self._read_metadata(proc.stdout)
+            else:
+                parent_shas = self._read_parents(proc.stdout)
+        finally:
+            proc.stdout.close()
+            returncode = proc.wait()
+            if writer is not None:
+                writer.join()
+        if returncode != 0:
+            raise RuntimeError(f'git {" ".join(command[1:])} failed')
+        self._resolve_parents(parent_shas)
+        return self
+
+    def _add_commit(self, hexsha: str) -> None:
+        binsha = bytes.fromhex(hexsha)
+        self._index[binsha] = len(self._index)
+        self._binshas += binsha
+
+    def _read_parents(self, stream: IO[bytes]) -> list[list[str]]:
+        parent_shas = []
+        for line in stream:
+            hexsha, *parents = line.decode('ascii').split()
+            self._add_commit(hexsha)
+            parent_shas.append(parents)
+        return parent_shas
+
+    def _read_metadata(self, stream: IO[bytes]) -> list[list[str]]:
+        author_lut: dict[str, int] = {}
+        message_lut: dict[str, int] = {}
+        parent_shas = []
+        for sha_line, author, date, message in _iter_records(
+            stream, _NUM_METADATA_FIELDS
+        ):
+            hexsha, *parents = sha_line.split()
+            self._add_commit(hexsha)
+            parent_shas.append(parents)
+            timestamp, tz = date.split(' ')
+            self._add_metadata(
+                author_lut, message_lut, author, message, int(timestamp), tz
+            )
+        return parent_shas
+
+    def _add_metadata(
+        self,
+        author_lut: dict[str, int],
+        message_lut: dict[str, int],
+        author: str,
+        message: str,
+        timestamp: int,
+        tz: str,
+    ) -> None:
+        author_id = author_lut.setdefault(author, len(author_lut))
+        if author_id == len(self.authors):
+            self.authors.append(author)
+        message_id = message_lut.setdefault(message, len(message_lut))
+        if message_id == len(self.messages):
+            self.messages.append(message)
+        self.author_ids.append(author_id)
+        self.message_ids.append(message_id)
+        self.author_times.append(timestamp)
+        self.author_tz_offsets.append(_tz_offset_seconds(tz))
+
+    def _resolve_parents(self, parent_shas: list[list[str]]) -> None:
+        index = self._index
+        for parents in parent_shas:
+            for parent in parents:
+                self.parent_indices.append(index.get(bytes.fromhex(parent), -1))
+            self.parent_indptr.append(len(self.parent_indices))
+
+
+def _iter_records(
+    stream: IO[bytes], num_fields: int, chunksize: int = 1 << 20
+) -> Iterator[list[str]]:
+    """
+    Group the NUL-terminated fields of ``--format`` output into records.
+
+    Each record is followed by the newline rev-list appends, which ends up at
+    the start of the next record's first field.
+
+    Example:
+        >>> import io
+        >>> from git_well.commit_graph import _iter_records
+        >>> stream = io.BytesIO(b'a\\x00b\\n\\x00\\nc\\x00d\\x00\\n')
+        >>> list(_iter_records(stream, 2, chunksize=3))
+        [['a', 'b\\n'], ['c', 'd']]
+    """
+    pending = b''
+    fields: list[str] = []
+    while True:
+        chunk = stream.read(chunksize)
+        if not chunk:
+            break
+        parts = (pending + chunk).split(b'\0')
+        pending = parts.pop()
+        for part in parts:
+            text = part.decode('utf-8', 'replace')
+            if not fields:
+                text = text.lstrip('\n')
+            fields.append(text)
+            if len(fields) == num_fields:
+                yield fields
+                fields = []
+
+
+def _write_and_close(stream: IO[bytes] | None, data: bytes) -> None:
+    assert stream is not None
+    try:
+        stream.write(data)
+        stream.close()
+    except BrokenPipeError:
+        pass
+
+
+def _tz_offset_seconds(tz: str) -> int:
+    """
+    Example:
+        >>> from git_well.commit_graph import _tz_offset_seconds
+        >>> _tz_offset_seconds('+0130'), _tz_offset_seconds('-0500')
+        (5400, -18000)
+    """
+    sign = -1 if tz.startswith('-') else 1
+    return sign * (int(tz[1:3]) * 3600 + int(tz[3:5]) * 60)
+
+
+def find_bridges(graph: CommitGraph) -> bytearray:
+    """
+    Mark the parent edges whose removal disconnects the history.
+
+    This is Tarjan's bridge-finding algorithm on the undirected version of
+    the graph, written with an explicit stack so deep histories do not hit
+    the recursion limit.
+
+    Returns:
+        bytearray: a flag per position of ``graph.parent_indices``; edges to
+        parents outside the graph are never bridges.
+
+    Example:
+        >>> from git_well.commit_graph import CommitGraph, find_bridges
+        >>> # 0 -> 1 -> {2, 3} -> 4 -> 5 (child -> parents)
+        >>> graph = CommitGraph._from_parents([[1], [2, 3], [4], [4], [5], []])
+        >>> bridges = find_bridges(graph)
+        >>> [(u, v) for (u, v), pos in graph._edge_positions() if bridges[pos]]
+        [(0, 1), (4, 5)]
+    """
+    num = len(graph)
+    indices = graph.parent_indices
+
+    # Undirected CSR adjacency storing (neighbor, edge position) pairs
+    degree = [0] * (num + 1)
+    for (child, parent), _ in graph._edge_positions():
+        degree[child + 1] += 1
+        degree[parent + 1] += 1
+    adj_indptr = array('q', it_accumulate(degree))
+    fill = array('q', adj_indptr[:-1])
+    adj_node = array('q', bytes(8 * adj_indptr[-1]))
+    adj_edge = array('q', bytes(8 * adj_indptr[-1]))
+    for (child, parent), pos in graph._edge_positions():
+        adj_node[fill[child]] = parent
+        adj_edge[fill[child]] = pos
+        fill[child] += 1
+        adj_node[fill[parent]] = child
+        adj_edge[fill[parent]] = pos
+        fill[parent] += 1
+
+    bridges = bytearray(len(indices))
+    disc = array('q', [-1]) * num
+    low = array('q', [0]) * num
+    via_edge = array('q', [-1]) * num
+    cursor = array('q', adj_indptr[:-1])
+    timer = 0
+    for root in range(num):
+        if disc[root] != -1:
+            continue
+        disc[root] = low[root] = timer
+        timer += 1
+        stack = [root]
+        while stack:
+            node = stack[-1]
+            if cursor[node] < adj_indptr[node + 1]:
+                pos = cursor[node]
+                cursor[node] += 1
+                if adj_edge[pos] == via_edge[node]:
+                    continue
+                other = adj_node[pos]
+                if disc[other] == -1:
+                    via_edge[other] = adj_edge[pos]
+                    disc[other] = low[other] = timer
+                    timer += 1
+                    stack.append(other)
+                elif disc[other] < low[node]:
+                    low[node] = disc[other]
+            else:
+                stack.pop()
+                if stack:
+                    up = stack[-1]
+                    if low[node] < low[up]:
+                        low[up] = low[node]
+                    if low[node] > disc[up]:
+                        bridges[via_edge[node]] = 1
+    return bridges
+
+
+def pseudo_chain(graph: CommitGraph) -> list[int]:
+    """
+    Reduce a history to a chain by stepping over its merge bubbles.
+
+    Removing the bridges splits the history into 2-edge-connected components.
+    A component with more than one commit is a "branchy bunch" (commits
+    between a fork and the merge that joins it). The pseudo-chain walks from
+    the head towards the single root, keeping every commit outside of bunches
+    and only the entry and exit commit of each bunch, so the result can be
+    treated as a chain by the squash logic.
+
+    Runs in time linear in the number of commits and parent edges.
+
+    Returns:
+        List[int]: rows of ``graph``, newest first
+
+    Example:
+        >>> from git_well.commit_graph import CommitGraph, pseudo_chain
+        >>> # 0 -> 1 -> {2, 3} -> 4 -> 5 -> {6, 7} -> 8
+        >>> graph = CommitGraph._from_parents(
+        >>>     [[1], [2, 3], [4], [4], [5], [6, 7], [8], [8], []])
+        >>> pseudo_chain(graph)
+        [0, 1, 4, 5, 8]
+    """
+    num = len(graph)
+    if num <= 1:
+        return list(range(num))
+    bridges = find_bridges(graph)
+
+    # Label 2-edge-connected components by flooding over non-bridge edges.
+    adjacency: list[list[int]] = [[] for _ in range(num)]
+    for (child, parent), pos in graph._edge_positions():
+        if not bridges[pos]:
+            adjacency[child].append(parent)
+            adjacency[parent].append(child)
+    component = array('q', [-1]) * num
+    sizes = []
+    for start in range(num):
+        if component[start] != -1:
+            continue
+        label = len(sizes)
+        component[start] = label
+        size = 0
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            size += 1
+            for other in adjacency[node]:
+                if component[other] == -1:
+                    component[other] = label
+                    stack.append(other)
+        sizes.append(size)
+
+    sinks = [
+        row
+        for row in range(num)
+        if all(parent < 0 for parent in graph.parents(row))
+    ]
+    if len(sinks) != 1:
+        raise RuntimeError(
+            f'expected a history with one oldest commit, found {len(sinks)}'
+        )
+    sink = sinks[0]
+
+    # Each bunch is left through at most one bridge towards the root.
+    exits: dict[int, tuple[int, int]] = {}
+    for (child, parent), pos in graph._edge_positions():
+        if bridges[pos] and sizes[component[child]] > 1:
+            exits[component[child]] = (child, parent)
+
+    chain = []
+    node = 0
+    while True:
+        chain.append(node)
+        label = component[node]
+        if sizes[label] == 1:
+            parents = [p for p in graph.parents(node) if p >= 0]
+            if not parents:
+                break
+            node = parents[0]
+        else:
+            if label not in exits:
+                # The bunch contains the root, which always ends the chain
+                if sink != node:
+                    chain.append(sink)
+                break
+            exit_node, node = exits[label]
+            if exit_node != chain[-1]:
+                chain.append(exit_node)
+    return chain
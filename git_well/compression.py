@@ -0,0 +1,282 @@
+"""
+Multi-threaded compressed output streams for archives.
+
+:func:`open_compressed` returns a writable binary stream that compresses
+into a file with one of several codecs, using as many threads as requested.
+For each codec the fastest available backend is chosen:
+
+* ``gz``: ``pigz`` if it is installed, otherwise :class:`ParallelGzipWriter`,
+  which compresses blocks on a thread pool the way ``pigz`` does (zlib
+  releases the GIL) and writes a single ordinary gzip member.
+* ``xz``: ``xz -T<threads>`` if it is installed, otherwise :mod:`lzma`.
+* ``zst``: the ``zstandard`` module if it is installed, otherwise
+  ``zstd -T<threads>``. There is no fallback in the standard library.
+* ``bz2``: :mod:`bz2`, which is single threaded.
+
+Example:
+    >>> import gzip
+    >>> import ubelt as ub
+    >>> from git_well.compression import open_compressed
+    >>> dpath = ub.Path.appdir('git_well/tests/compression').ensuredir()
+    >>> data = b'some text ' * 100_000
+    >>> fpath = dpath / 'data.gz'
+    >>> with open_compressed(fpath, 'gz', level=6, threads=2) as file:
+    >>>     _ = file.write(data)
+    >>> assert gzip.decompress(fpath.read_bytes()) == data
+"""
+from __future__ import annotations
+
+import contextlib
+import os
+import zlib
+from collections.abc import Generator
+from typing import IO, Any, cast
+
+#: Codecs understood by :func:`open_compressed`; None writes uncompressed
+CODECS = ('gz', 'bz2', 'xz', 'zst')
+
+# Levels used when none is given. gzip and bz2 follow their command line
+# tools rather than tarfile, which defaults to the slow level 9.
+DEFAULT_LEVELS = {'gz': 6, 'bz2': 9, 'xz': 6, 'zst': 3}
+
+
+def default_threads() -> int:
+    """
+    Compression is CPU bound, so by default use every core.
+    """
+    return os.cpu_count() or 1
+
+
+@contextlib.contextmanager
+def open_compressed(
+    fpath: str | os.PathLike[str],
+    codec: str | None,
+    level: int | None = None,
+    threads: int | None = None,
+) -> Generator[IO[bytes], None, None]:
+    """
+    Open a binary stream that writes ``codec`` compressed data to ``fpath``.
+
+    Args:
+        fpath (PathLike): the output file, which is overwritten
+        codec (str | None): one of :data:`CODECS`, or None for no compression
+        level (int | None): compression level, defaults to
+            :data:`DEFAULT_LEVELS`
+        threads (int | None): number of compression threads, defaults to
+            :func:`default_threads`
+
+    Yields:
+        IO[bytes]: the stream to write to. The output is complete when the
+        context exits without an error.
+    """
+    import shutil
+
+    if codec is not None and codec not in CODECS:
+        raise ValueError(
+            f'unknown codec {codec!r}; expected one of: {", ".join(CODECS)}'
+        )
+    threads = default_threads() if threads is None else max(int(threads), 1)
+    if codec is None:
+        with open(fpath, 'wb') as raw:
+            yield raw
+        return
+    if level is None:
+        level = DEFAULT_LEVELS[codec]
+
+    with open(fpath, 'wb') as raw:
+        if codec == 'gz':
+            pigz = shutil.which('pigz')
+            if pigz is not None and threads > 1:
+                command = [pigz, f'-{level}', '-p', str(threads)]
+                with _pipe_to(command, raw) as file:
+                    yield file
+            else:
+                with ParallelGzipWriter(raw, level, threads) as writer:
+                    # Not an IO subclass, but it has the methods writers use
+                    yield cast(IO[bytes], writer)
+        elif codec == 'bz2':
+            import bz2
+
+            with bz2.BZ2File(raw, 'wb', compresslevel=level) as file:
+                yield file
+        elif codec == 'xz':
+            xz = shutil.which('xz')
+            if xz is not None:
+                command = [xz, f'-{level}', f'-T{threads}']
+                with _pipe_to(command, raw) as file:
+                    yield file
+            else:
+                import lzma
+
+                with lzma.LZMAFile(raw, 'wb', preset=level) as file:
+                    yield file
+        else:
+            try:
+                import zstandard
+            except ImportError:
+                zstd = shutil.which('zstd')
+                if zstd is None:
+                    raise RuntimeError(
+                        'zst compression needs the zstandard module '
+                        '(pip install zstandard) or the zstd program'
+                    ) from None
+                command = [zstd, f'-{level}', f'-T{threads}', '-q']
+                with _pipe_to(command, raw) as file:
+                    yield file
+            else:
+                cctx = zstandard.ZstdCompressor(
+                    level=level, threads=threads if threads > 1 else 0
+                )
+                with cctx.stream_writer(raw, closefd=False) as file:
+                    yield file
+
+
+@contextlib.contextmanager
+def _pipe_to(
+    command: list[str], raw: IO[bytes]
+) -> Generator[IO[bytes], None, None]:
+    """
+    Run a compressor that reads stdin and writes to ``raw``.
+    """
+    import subprocess
+
+    proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=raw)
+    assert proc.stdin is not None
+    try:
+        yield proc.stdin
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    proc.stdin.close()
+    if proc.wait() != 0:
+        raise RuntimeError(
+            f'{os.path.basename(command[0])} failed with exit code '
+            f'{proc.returncode}'
+        )
+
+
+class ParallelGzipWriter:
+    """
+    Write a gzip stream, compressing fixed size blocks on a thread pool.
+
+    Every block is compressed as raw deflate data ending in a sync flush,
+    primed with the last 32 KiB of the previous block, so the blocks
+    concatenate into one deflate stream, as with ``pigz``. Any gzip reader
+    can decompress the output.
+
+    Args:
+        fileobj (IO[bytes]): where the compressed stream is written
+        level (int): zlib compression level
+        threads (int): number of blocks compressed at once
+        block_size (int): uncompressed bytes per block
+
+    Example:
+        >>> import gzip, io
+        >>> from git_well.compression import ParallelGzipWriter
+        >>> out = io.BytesIO()
+        >>> data = bytes(range(256)) * 5000
+        >>> with ParallelGzipWriter(out, threads=3, block_size=4096) as file:
+        >>>     for start in range(0, len(data), 1000):
+        >>>         _ = file.write(data[start:start + 1000])
+        >>> assert gzip.decompress(out.getvalue()) == data
+        >>> # An empty stream is still a valid gzip file
+        >>> out = io.BytesIO()
+        >>> ParallelGzipWriter(out).close()
+        >>> gzip.decompress(out.getvalue())
+        b''
+    """
+
+    _WINDOW = 32 * 1024
+
+    def __init__(
+        self,
+        fileobj: IO[bytes],
+        level: int = 6,
+        threads: int = 1,
+        block_size: int = 128 * 1024,
+    ) -> None:
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.fileobj = fileobj
+        self.level = level
+        self.threads = max(threads, 1)
+        self.block_size = block_size
+        self.closed = False
+        self._buffer = bytearray()
+        self._dictionary = b''
+        self._crc = 0
+        self._size = 0
+        self._pending: Any = deque()
+        self._pool = ThreadPoolExecutor(max_workers=self.threads)
+        # Header: no file name, mtime 0 and "unknown" OS for stable output
+        self.fileobj.write(b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff')
+
+    def __enter__(self) -> ParallelGzipWriter:
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        if self.closed:
+            raise ValueError('write to closed file')
+        data = memoryview(data).cast('B')
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[: self.block_size])
+            del self._buffer[: self.block_size]
+            self._submit(block, final=False)
+        return len(data)
+
+    def flush(self) -> None:
+        self.fileobj.flush()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self._submit(bytes(self._buffer), final=True)
+        self._buffer.clear()
+        self._drain(0)
+        self._pool.shutdown(wait=True)
+        trailer = (self._crc & 0xFFFFFFFF).to_bytes(4, 'little')
+        trailer += (self._size & 0xFFFFFFFF).to_bytes(4, 'little')
+        self.fileobj.write(trailer)
+        self.fileobj.flush()
+        self.closed = True
+
+    def _submit(self, block: bytes, final: bool) -> None:
+        future = self._pool.submit(
+            _deflate_block, block, self._dictionary, self.level, final
+        )
+        self._pending.append(future)
+        self._dictionary = (self._dictionary + block)[-self._WINDOW :]
+        # Bound the memory held by blocks that are not written yet
+        self._drain(2 * self.threads)
+
+    def _drain(self, keep: int) -> None:
+        while len(self._pending) > keep:
+            self.fileobj.write(self._pending.popleft().result())
+
+
+def _deflate_block(
+    block: bytes, dictionary: bytes, level: int, final: bool
+) -> bytes:
+    if dictionary:
+        compressor = zlib.compressobj(
+            level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary
+        )
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+    return compressor.compress(block) + compressor.flush(mode)
@@ -1,5 +1,25 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:  # pragma: no cover
+    from git_well.demo.synthetic import make_synthetic_git_repo
+
+__all__ = [
+    'make_dummy_git_repo',
+    'make_dummy_git_repo_with_orphans',
+    'make_synthetic_git_repo',
+]
+
+
+def __getattr__(name: str) -> Any:
+    # The synthetic generator is only needed by benchmarks, import it lazily
+    if name == 'make_synthetic_git_repo':
+        from git_well.demo import synthetic
+
+        return synthetic.make_synthetic_git_repo
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 
 def make_dummy_git_repo():
     import ubelt as ub
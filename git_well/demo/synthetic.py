@@ -0,0 +1,381 @@
+"""
+Generate large, reproducible git histories with ``git fast-import``.
+
+The small demo repos run one git command per commit, which is far too slow
+for histories big enough to benchmark squash analysis, stats, branch
+cleanup or archiving. :func:`make_synthetic_git_repo` instead streams the
+whole history, driven by a seeded RNG, into a single ``git fast-import``
+process.
+
+The history is a main line made of streaks: runs of commits by one author
+with the message ``wip``, mixed with single commits with unique messages.
+Side branches fork from the main line and are merged back, some feature
+branches are left unmerged, and tags are spread evenly over the main line.
+"""
+from __future__ import annotations
+
+import os
+import random
+import subprocess
+from typing import IO
+
+import ubelt as ub
+
+
+def make_synthetic_git_repo(
+    dpath: str | os.PathLike[str] | None = None,
+    num_commits: int = 1000,
+    num_authors: int = 5,
+    wip_fraction: float = 0.5,
+    max_streak: int = 8,
+    merge_fraction: float = 0.02,
+    num_branches: int = 3,
+    num_tags: int = 5,
+    num_files: int = 50,
+    file_size: int = 256,
+    num_submodules: int = 0,
+    seed: int = 0,
+    checkout: bool = True,
+) -> ub.Path:
+    """
+    Create a synthetic repository with a configurable history.
+
+    Args:
+        dpath (PathLike | None): where to create the repo, it is deleted
+            first. Defaults to an application cache directory.
+        num_commits (int): approximate number of commits on the main line,
+            side branch commits and merges come on top of this
+        num_authors (int): number of distinct authors
+        wip_fraction (float): probability that a streak of ``wip`` commits
+            starts instead of a single commit with a unique message
+        max_streak (int): maximum length of a ``wip`` streak
+        merge_fraction (float): probability that a side branch of up to
+            ``max_streak`` commits is forked and merged back after a commit
+        num_branches (int): number of unmerged ``feature/<n>`` branches
+        num_tags (int): number of ``v<n>`` tags spread over the main line
+        num_files (int): number of tracked files that commits modify
+        file_size (int): approximate size of every file in bytes
+        num_submodules (int): number of submodules, each a small synthetic
+            repository in a sibling ``<name>-submodules`` directory
+        seed (int): seed of the random number generator. Without
+            submodules the same seed gives the same commit hashes; the
+            ``.gitmodules`` file records the absolute submodule paths.
+        checkout (bool): if True, check out ``main`` (and the submodules)
+            after the import
+
+    Returns:
+        ub.Path: the path of the new repository
+
+    Example:
+        >>> from git_well.demo import make_synthetic_git_repo
+        >>> import git
+        >>> dpath = make_synthetic_git_repo(num_commits=200, num_submodules=1)
+        >>> repo = git.Repo(dpath)
+        >>> num_main = len(list(repo.iter_commits('main', first_parent=True)))
+        >>> assert num_main >= 200
+        >>> assert len(repo.tags) == 5
+        >>> assert len(repo.submodules) == 1
+        >>> assert not repo.is_dirty()
+        >>> # The same seed gives the same history
+        >>> dpath1 = make_synthetic_git_repo(
+        >>>     dpath.parent / 'synthetic-a', num_commits=100, seed=3)
+        >>> dpath2 = make_synthetic_git_repo(
+        >>>     dpath.parent / 'synthetic-b', num_commits=100, seed=3)
+        >>> assert git.Repo(dpath1).head.commit == git.Repo(dpath2).head.commit
+    """
+    if dpath is None:
+        dpath = ub.Path.appdir('git_well', 'tests', 'synthetic-repo')
+    dpath = ub.Path(dpath)
+    dpath.delete().ensuredir()
+    subprocess.run(
+        ['git', 'init', '-q', '-b', 'main'], cwd=dpath, check=True
+    )
+    for key, value in [
+        ('user.name', 'Demo User'),
+        ('user.email', 'demo.user@zombo.com'),
+    ]:
+        subprocess.run(['git', 'config', key, value], cwd=dpath, check=True)
+
+    submodules = []
+    if num_submodules:
+        sub_root = dpath.parent / (dpath.name + '-submodules')
+        sub_root.delete().ensuredir()
+        for index in range(num_submodules):
+            name = f'sub{index}'
+            sub_dpath = make_synthetic_git_repo(
+                sub_root / name,
+                num_commits=max(num_commits // 10, 10),
+                num_authors=num_authors,
+                num_branches=0,
+                num_tags=0,
+                num_files=max(num_files // 5, 1),
+                file_size=file_size,
+                seed=seed + index + 1,
+                checkout=False,
+            )
+            head = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'],
+                cwd=sub_dpath,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout.strip()
+            submodules.append((name, sub_dpath, head))
+
+    proc = subprocess.Popen(
+        ['git', 'fast-import', '--quiet', '--date-format=raw', '--done'],
+        cwd=dpath,
+        stdin=subprocess.PIPE,
+    )
+    assert proc.stdin is not None
+    try:
+        stream = _HistoryStream(
+            proc.stdin,
+            rng=random.Random(seed),
+            num_authors=num_authors,
+            num_files=num_files,
+            file_size=file_size,
+        )
+        stream.write_history(
+            num_commits=num_commits,
+            wip_fraction=wip_fraction,
+            max_streak=max_streak,
+            merge_fraction=merge_fraction,
+            num_branches=num_branches,
+            num_tags=num_tags,
+            submodules=submodules,
+        )
+        proc.stdin.write(b'done\n')
+    finally:
+        proc.stdin.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise RuntimeError(
+            f'git fast-import failed with exit code {returncode}'
+        )
+
+    if checkout:
+        subprocess.run(
+            ['git', 'checkout', '-q', '-f', 'main'], cwd=dpath, check=True
+        )
+        if submodules:
+            subprocess.run(
+                [
+                    'git',
+                    '-c',
+                    'protocol.file.allow=always',
+                    'submodule',
+                    'update',
+                    '--init',
+                    '--quiet',
+                ],
+                cwd=dpath,
+                check=True,
+            )
+    return dpath
+
+
+class _HistoryStream:
+    """
+    Writes the commands of one synthetic history to a fast-import stream.
+    """
+
+    def __init__(
+        self,
+        stdin: IO[bytes],
+        rng: random.Random,
+        num_authors: int,
+        num_files: int,
+        file_size: int,
+    ) -> None:
+        self.stdin = stdin
+        self.rng = rng
+        self.idents = [
+            f'Author {index} <author{index}@example.com>'.encode('utf-8')
+            for index in range(max(num_authors, 1))
+        ]
+        self.paths = [
+            f'src/dir{index % 10}/file{index}.txt'.encode('utf-8')
+            for index in range(max(num_files, 1))
+        ]
+        # One random filler shared by all file versions keeps the stream
+        # cheap to generate and the pack small, like real text edits.
+        self.filler = rng.randbytes(max(file_size, 1) // 2).hex().encode()
+        self.num_marks = 0
+        self.time = 1_600_000_000
+
+    def _mark(self) -> bytes:
+        self.num_marks += 1
+        return b':%d' % self.num_marks
+
+    def _blob(self, path: bytes) -> bytes:
+        mark = self._mark()
+        data = b'%s rev %d\n%s\n' % (path, self.num_marks, self.filler)
+        self.stdin.write(
+            b'blob\nmark %s\ndata %d\n%s\n' % (mark, len(data), data)
+        )
+        return mark
+
+    def commit(
+        self,
+        ref: bytes,
+        parents: list[bytes],
+        author: int,
+        message: bytes,
+        changes: list[tuple[bytes, bytes, bytes]],
+        gap: int,
+    ) -> bytes:
+        """
+        Write a commit and return its mark.
+
+        ``changes`` are ``(mode, dataref, path)`` triples.
+        """
+        self.time += gap
+        mark = self._mark()
+        ident = b'%s %d +0000' % (self.idents[author], self.time)
+        lines = [
+            b'commit %s\nmark %s\n' % (ref, mark),
+            b'author %s\ncommitter %s\n' % (ident, ident),
+            b'data %d\n%s\n' % (len(message), message),
+        ]
+        if parents:
+            lines.append(b'from %s\n' % parents[0])
+        for parent in parents[1:]:
+            lines.append(b'merge %s\n' % parent)
+        for mode, dataref, path in changes:
+            lines.append(b'M %s %s %s\n' % (mode, dataref, path))
+        lines.append(b'\n')
+        self.stdin.write(b''.join(lines))
+        return mark
+
+    def edit(
+        self,
+        ref: bytes,
+        parent: bytes | None,
+        author: int,
+        message: bytes,
+        gap: int,
+        state: dict[bytes, bytes],
+        paths: list[bytes] | None = None,
+    ) -> bytes:
+        """
+        Commit a new version of one random file.
+        """
+        path = self.rng.choice(paths or self.paths)
+        blob = self._blob(path)
+        state[path] = blob
+        parents = [] if parent is None else [parent]
+        return self.commit(
+            ref, parents, author, message, [(b'100644', blob, path)], gap
+        )
+
+    def write_history(
+        self,
+        num_commits: int,
+        wip_fraction: float,
+        max_streak: int,
+        merge_fraction: float,
+        num_branches: int,
+        num_tags: int,
+        submodules: list[tuple[str, ub.Path, str]],
+    ) -> None:
+        rng = self.rng
+        main = b'refs/heads/main'
+        state: dict[bytes, bytes] = {}
+
+        # The root commit adds every file and the submodules
+        changes = []
+        for path in self.paths:
+            blob = self._blob(path)
+            state[path] = blob
+            changes.append((b'100644', blob, path))
+        if submodules:
+            gitmodules = ''.join(
+                f'[submodule "{name}"]\n\tpath = {name}\n\turl = {sub_dpath}\n'
+                for name, sub_dpath, _ in submodules
+            ).encode('utf-8')
+            blob = self._mark()
+            self.stdin.write(
+                b'blob\nmark %s\ndata %d\n%s\n'
+                % (blob, len(gitmodules), gitmodules)
+            )
+            changes.append((b'100644', blob, b'.gitmodules'))
+            for name, _, head in submodules:
+                changes.append((b'160000', head.encode(), name.encode()))
+        tip = self.commit(main, [], 0, b'initial commit\n', changes, 0)
+        main_marks = [tip]
+
+        unique = 0
+        while len(main_marks) < num_commits:
+            author = rng.randrange(len(self.idents))
+            if max_streak > 1 and rng.random() < wip_fraction:
+                length = rng.randint(2, max_streak)
+                messages = [b'wip\n'] * length
+            else:
+                unique += 1
+                messages = [b'Change %d\n' % unique]
+            for message in messages:
+                tip = self.edit(
+                    main, tip, author, message, rng.randint(60, 900), state
+                )
+                main_marks.append(tip)
+            self.time += rng.randint(3600, 86400)
+
+            if rng.random() < merge_fraction:
+                # A side branch edits its own files and is merged back. Every
+                # commit names its parent, so the side commits can be written
+                # to the main ref, which is reset to the real tip at the end.
+                side_state: dict[bytes, bytes] = {}
+                side_paths = rng.sample(self.paths, min(3, len(self.paths)))
+                side_tip = tip
+                for _ in range(rng.randint(1, max(max_streak, 1))):
+                    side_tip = self.edit(
+                        main,
+                        side_tip,
+                        rng.randrange(len(self.idents)),
+                        b'side work\n',
+                        rng.randint(60, 900),
+                        side_state,
+                        paths=side_paths,
+                    )
+                # Main moves on once so the merge is not a fast-forward
+                tip = self.edit(main, tip, author, b'main work\n', 60, state)
+                main_marks.append(tip)
+                state.update(side_state)
+                changes = [
+                    (b'100644', blob, path)
+                    for path, blob in sorted(side_state.items())
+                ]
+                tip = self.commit(
+                    main,
+                    [tip, side_tip],
+                    author,
+                    b'Merge side branch\n',
+                    changes,
+                    60,
+                )
+                main_marks.append(tip)
+
+        for index in range(num_branches):
+            fork = rng.choice(main_marks)
+            ref = b'refs/heads/feature/%d' % index
+            branch_tip = fork
+            for _ in range(rng.randint(1, max(max_streak, 1))):
+                branch_tip = self.edit(
+                    ref,
+                    branch_tip,
+                    rng.randrange(len(self.idents)),
+                    b'feature work\n',
+                    rng.randint(60, 900),
+                    {},
+                )
+
+        if num_tags:
+            step = max(len(main_marks) // num_tags, 1)
+            for index in range(num_tags):
+                mark = main_marks[min(index * step, len(main_marks) - 1)]
+                self.stdin.write(
+                    b'reset refs/tags/v%d\nfrom %s\n\n' % (index, mark)
+                )
+
+        self.stdin.write(b'reset %s\nfrom %s\n\n' % (main, tip))
@@ -6,6 +6,7 @@ Archive committed source with full Git history and initialized submodules.
 
 from __future__ import annotations
 
+import contextlib
 import fnmatch
 import os
 import textwrap
@@ -34,8 +35,12 @@ ArchiveFormatArg = Literal[
     'tbz2',
     'tar.xz',
     'txz',
+    'tar.zst',
+    'tzst',
+]
+ResolvedArchiveFormat = Literal[
+    'tar', 'tar.gz', 'zip', 'tar.bz2', 'tar.xz', 'tar.zst'
 ]
-ResolvedArchiveFormat = Literal['tar', 'tar.gz', 'zip', 'tar.bz2', 'tar.xz']
 
 _FORMAT_TO_EXTENSION = {
     'tar': '.tar',
@@ -43,22 +48,30 @@ _FORMAT_TO_EXTENSION = {
     'zip': '.zip',
     'tar.bz2': '.tar.bz2',
     'tar.xz': '.tar.xz',
+    'tar.zst': '.tar.zst',
 }
 
-_FORMAT_TO_TAR_MODE = {
-    'tar': 'w',
-    'tar.gz': 'w:gz',
-    'tar.bz2': 'w:bz2',
-    'tar.xz': 'w:xz',
+# Codecs of git_well.compression
+_FORMAT_TO_CODEC = {
+    'tar': None,
+    'tar.gz': 'gz',
+    'tar.bz2': 'bz2',
+    'tar.xz': 'xz',
+    'tar.zst': 'zst',
 }
 
 _FORMAT_ALIASES = {
     'tgz': 'tar.gz',
     'tbz2': 'tar.bz2',
     'txz': 'tar.xz',
+    'tzst': 'tar.zst',
 }
 
+# Bytes tarfile buffers before each write to the compressor
+_TAR_BUFSIZE = 1 << 20
+
 _ARCHIVE_INFO_FNAME = 'GIT_WELL_ARCHIVE_INFO.txt'
+_HISTORY_BUNDLE_FNAME = 'GIT_WELL_HISTORY.bundle'
 
 # TODO: Re-enable repo-local archive_source defaults after kwconf /
 # legacy modal dispatch preserved omitted values distinctly from
@@ -281,8 +294,28 @@ class ArchiveSourceCLI(kwconf.Config):
         help=textwrap.dedent("""
             Archive format. Defaults to "auto", which infers the format from
             --output when possible, similar to git archive. Supported values are
-            auto, tar, tar.gz, tgz, zip, tar.bz2, tbz2, tar.xz, and txz. When
-            auto cannot infer from --output, it falls back to tar.gz.
+            auto, tar, tar.gz, tgz, zip, tar.bz2, tbz2, tar.xz, txz, tar.zst,
+            and tzst. When auto cannot infer from --output, it falls back to
+            tar.gz.
+            """).strip(),
+    )
+    compression_level = kwconf.Value(
+        None,
+        alias=['compression-level'],
+        help=textwrap.dedent("""
+            Compression level of the archive format. Defaults to 6 for gzip,
+            xz and zip, 9 for bz2, and 3 for zstd.
+            """).strip(),
+    )
+    compression_threads = kwconf.Value(
+        None,
+        alias=['compression-threads'],
+        help=textwrap.dedent("""
+            Number of threads that compress tar.gz, tar.xz, and tar.zst
+            archives. Defaults to the number of CPUs. pigz, xz, and zstd
+            (or the zstandard Python module) are used when installed;
+            otherwise gzip uses a built-in block-parallel compressor and xz
+            falls back to the single threaded lzma module.
             """).strip(),
     )
     redact_local_paths = kwconf.Value(
@@ -296,6 +329,41 @@ class ArchiveSourceCLI(kwconf.Config):
             agent handoff and overlay workflows.
             """).strip(),
     )
+    history_format = kwconf.Value(
+        'git-dir',
+        choices=['git-dir', 'bundle'],
+        alias=['history-format'],
+        help=textwrap.dedent("""
+            How included history is stored. "git-dir" archives a clean
+            clone with its .git directory. "bundle" archives the plain
+            source export of each repository next to a single
+            GIT_WELL_HISTORY.bundle file made directly from the source
+            repository; the archive information file explains how to
+            restore it. Bundles require full history or depth 0.
+            """).strip(),
+    )
+    clone_mode = kwconf.Value(
+        'share',
+        choices=['share', 'copy'],
+        alias=['clone-mode'],
+        help=textwrap.dedent("""
+            How full-history checkouts get their objects. "share" clones
+            with alternates to the source repository, so no objects are
+            transferred, then copies the reachable objects into one pack
+            with a single repack that reuses the existing deltas. "copy"
+            transfers a fresh pack with git clone --no-local. Shallow
+            checkouts always use a --no-local transfer.
+            """).strip(),
+    )
+    jobs = kwconf.Value(
+        None,
+        help=textwrap.dedent("""
+            Number of submodules to export concurrently. A nested submodule
+            starts after the submodule that contains it. Defaults to the
+            global ``git-well --jobs`` limit if one was given, otherwise
+            submodules are exported one at a time.
+            """).strip(),
+    )
     # TODO: Re-enable when kwconf fixes modal default injection semantics.
     # set_config = kwconf.Value(
     #     None,
@@ -326,6 +394,11 @@ class ArchiveSourceCLI(kwconf.Config):
             no_submodules=not bool(config.submodules),
             format=config.format,
             redact_local_paths=bool(config.redact_local_paths),
+            history_format=config.history_format,
+            clone_mode=config.clone_mode,
+            compression_level=_optional_int(config.compression_level),
+            compression_threads=_optional_int(config.compression_threads),
+            jobs=None if config.jobs is None else int(config.jobs),
             verbose=config.verbose,
         )
         return archive_path
@@ -347,6 +420,11 @@ def archive_source(
     no_submodules: bool = False,
     format: ArchiveFormatArg = 'auto',
     redact_local_paths: bool = False,
+    history_format: str = 'git-dir',
+    clone_mode: str = 'share',
+    compression_level: int | None = None,
+    compression_threads: int | None = None,
+    jobs: int | None = None,
     verbose: int = 1,
 ) -> Path:
     """
@@ -394,6 +472,33 @@ def archive_source(
             archive information file and remove generated clone origins that
             point back to local working trees.
 
+        history_format:
+            ``'git-dir'`` archives a clean clone including its ``.git``
+            directory for every repository that keeps history. ``'bundle'``
+            archives a source export plus a ``GIT_WELL_HISTORY.bundle`` made
+            with ``git pack-objects`` from the source repository, which
+            needs no clone. Bundles cannot carry shallow history, so this
+            requires depths of ``'full'`` or ``0``.
+
+        clone_mode:
+            ``'share'`` clones full-history checkouts with alternates and
+            then makes them self-contained with one ``git repack -a -d``.
+            ``'copy'`` transfers objects with ``git clone --no-local``.
+            Shallow checkouts always transfer their objects.
+
+        compression_level:
+            Compression level, defaults to the usual level of the format.
+
+        compression_threads:
+            Number of compression threads for tar.gz, tar.xz, and tar.zst
+            output. Defaults to the number of CPUs. See
+            :mod:`git_well.compression` for the backends.
+
+        jobs:
+            Number of submodules to clone or export concurrently. Defaults to
+            :func:`git_well.jobs.explicit_max_jobs`, or 1 if no global limit
+            was set.
+
         verbose:
             Verbosity level.
 
@@ -408,8 +513,14 @@ def archive_source(
         pruning. Use ``redact_local_paths=True`` when those local paths should
         not be included in the artifact.
     """
+    from git_well.tracing import span
+
     repo = _coerce_repo(repo_dpath)
     _assert_has_head(repo)
+    if jobs is None:
+        from git_well.jobs import explicit_max_jobs
+
+        jobs = explicit_max_jobs() or 1
 
     repo_root = Path(cast(str, repo.working_tree_dir)).resolve()
     repo_name = repo_root.name
@@ -421,6 +532,15 @@ def archive_source(
     prefix = f'{repo_name}-source-{timestamp}-{short_sha}'
 
     normalized_depth = _normalize_depth(depth)
+    if history_format not in {'git-dir', 'bundle'}:
+        raise ValueError(
+            "history_format must be 'git-dir' or 'bundle'; "
+            f'got {history_format!r}'
+        )
+    if clone_mode not in {'share', 'copy'}:
+        raise ValueError(
+            f"clone_mode must be 'share' or 'copy'; got {clone_mode!r}"
+        )
     include_git_history = normalized_depth != 0
     clone_depth = None if normalized_depth in {0, None} else normalized_depth
     submodule_depth_policy = _parse_submodule_depth_spec(submodule_depth)
@@ -432,14 +552,15 @@ def archive_source(
     archive_path = _resolve_output(repo_root, output, prefix, archive_format)
     archive_path.parent.mkdir(parents=True, exist_ok=True)
 
-    submodule_status = _submodule_status(repo)
-    submodule_decisions = _resolve_submodule_archive_decisions(
-        submodule_status,
-        policy=submodule_depth_policy,
-        inherited_depth=normalized_depth,
-        exclude_submodule=exclude_submodule_paths,
-        no_submodules=bool(no_submodules),
-    )
+    with span('collect submodules'):
+        submodule_status = _submodule_status(repo)
+        submodule_decisions = _resolve_submodule_archive_decisions(
+            submodule_status,
+            policy=submodule_depth_policy,
+            inherited_depth=normalized_depth,
+            exclude_submodule=exclude_submodule_paths,
+            no_submodules=bool(no_submodules),
+        )
 
     log = _Logger(verbose)
     log.path('[source-archive] repo: ', repo_root)
@@ -467,119 +588,346 @@ def archive_source(
         )
     log(f'[source-archive] superproject HEAD: {short_sha}')
 
-    import shutil
-    import tempfile
-
-    tmpdir = Path(
-        tempfile.mkdtemp(
-            prefix=f'{repo_name}-source-archive.',
-            dir=os.environ.get('TMPDIR', None),
+    if history_format == 'bundle':
+        shallow = [
+            '.' if decision is None else decision.info.path
+            for decision in [None, *submodule_decisions]
+            if (decision is None and clone_depth is not None)
+            or (
+                decision is not None
+                and not decision.omitted
+                and decision.depth not in {0, None}
+            )
+        ]
+        if shallow:
+            raise ValueError(
+                'git bundles cannot carry shallow history; use depth full or '
+                '0 with --history-format bundle for: ' + ', '.join(shallow)
+            )
+        log('[source-archive] history format: bundle')
+
+    manifest_kwargs: dict[str, Any] = dict(
+        repo_root=repo_root,
+        archive_path=archive_path,
+        repo_name=repo_name,
+        prefix=prefix,
+        timestamp=timestamp,
+        head_sha=head_sha,
+        short_sha=short_sha,
+        include_git_history=include_git_history,
+        clone_depth=clone_depth,
+        submodule_decisions=submodule_decisions,
+        redact_local_paths=redact_local_paths,
+        history_format=history_format,
+    )
+    streaming = history_format == 'bundle' or (
+        not include_git_history
+        and all(
+            decision.omitted or decision.depth == 0
+            for decision in submodule_decisions
         )
     )
-    try:
-        stage = tmpdir / 'stage'
-        stage.mkdir(parents=True, exist_ok=True)
-        archive_root = stage / prefix
-
+    if streaming:
+        # Nothing needs a checkout: copy the git archive streams straight
+        # into the output instead of extracting and re-reading a stage.
+        _assert_path_uncommitted(repo, head_sha, _ARCHIVE_INFO_FNAME)
+        log('[source-archive] exporting superproject with git archive')
+        sources = [(repo, head_sha, prefix)]
+        bundles = []
         if include_git_history:
-            log('[source-archive] cloning superproject')
-            _clone_committed_checkout(
-                src=repo,
-                dst=archive_root,
-                commit=head_sha,
-                label='superproject',
-                clone_depth=clone_depth,
-                redact_local_paths=redact_local_paths,
-                log=log,
-            )
-        else:
-            log('[source-archive] exporting superproject with git archive')
-            _extract_git_archive(repo, 'HEAD', stage, prefix)
-
+            _assert_path_uncommitted(repo, head_sha, _HISTORY_BUNDLE_FNAME)
+            bundles.append((repo, head_sha, prefix))
         for decision in submodule_decisions:
-            info = decision.info
-            path = info.path
-            submodule_sha = info.sha
+            path = decision.info.path
             if decision.omitted:
                 log(
                     f'[source-archive] omitting submodule {path}: '
                     f'{decision.reason}'
                 )
                 continue
-            if info.status == '-':
-                raise RuntimeError(
-                    f"submodule '{path}' is not initialized; run: "
-                    'git submodule update --init --recursive'
-                )
-            src_dpath = repo_root / path
-            if not src_dpath.exists():
-                raise RuntimeError(
-                    f"submodule path '{path}' is missing; run: "
-                    'git submodule update --init --recursive'
-                )
-            sub_repo = _open_exact_repo(src_dpath)
-            if sub_repo is None:
-                raise RuntimeError(
-                    f"submodule path '{path}' is not an initialized Git "
-                    'working tree; run: git submodule update --init --recursive'
-                )
-            _assert_has_head(sub_repo)
+            sub_repo = _open_submodule_repo(repo_root, decision.info)
             sub_short = sub_repo.git.rev_parse('--short=12', 'HEAD').strip()
             log(
                 f'[source-archive] exporting submodule {path} HEAD {sub_short} '
                 f'depth={_depth_label(decision.depth)} mode={decision.mode}'
             )
-            sub_clone_depth = _clone_depth_from_normalized_depth(
-                decision.depth
+            source = (sub_repo, decision.info.sha, f'{prefix}/{path}')
+            sources.append(source)
+            if decision.depth is None:
+                _assert_path_uncommitted(
+                    sub_repo, decision.info.sha, _HISTORY_BUNDLE_FNAME
+                )
+                bundles.append(source)
+        with span('compress', format=archive_format, streaming=True):
+            _stream_git_archives(
+                sources,
+                bundles=bundles,
+                jobs=jobs,
+                manifest_name=f'{prefix}/{_ARCHIVE_INFO_FNAME}',
+                manifest_text=_manifest_text(**manifest_kwargs),
+                archive_path=archive_path,
+                archive_format=archive_format,
+                compression=(compression_level, compression_threads),
             )
-            if decision.depth != 0:
+    else:
+        _write_staged_archive(
+            repo=repo,
+            repo_root=repo_root,
+            prefix=prefix,
+            archive_format=archive_format,
+            submodule_decisions=submodule_decisions,
+            manifest_kwargs=manifest_kwargs,
+            clone_mode=clone_mode,
+            compression=(compression_level, compression_threads),
+            jobs=jobs,
+            log=log,
+        )
+
+    log(f'[source-archive] wrote: {archive_path}')
+    if archive_format == 'zip':
+        log(f'[source-archive] list contents: unzip -l {archive_path}')
+    elif archive_format == 'tar':
+        log(f'[source-archive] list contents: tar -tf {archive_path} | less')
+    else:
+        log(f'[source-archive] list contents: tar -tf {archive_path} | less')
+    return archive_path
+
+
+def _write_staged_archive(
+    repo: 'git.Repo',
+    repo_root: Path,
+    prefix: str,
+    archive_format: ResolvedArchiveFormat,
+    submodule_decisions: list[SubmoduleArchiveDecision],
+    manifest_kwargs: dict[str, Any],
+    clone_mode: str,
+    compression: tuple[int | None, int | None],
+    jobs: int,
+    log: '_Logger',
+) -> None:
+    """
+    Materialize clean checkouts in a stage directory, then compress it.
+
+    Used whenever the superproject or a submodule keeps Git history.
+    """
+    import shutil
+    import tempfile
+
+    from git_well.tracing import span
+
+    include_git_history = manifest_kwargs['include_git_history']
+    clone_depth = manifest_kwargs['clone_depth']
+    redact_local_paths = manifest_kwargs['redact_local_paths']
+    tmpdir = Path(
+        tempfile.mkdtemp(
+            prefix=f'{repo_root.name}-source-archive.',
+            dir=os.environ.get('TMPDIR', None),
+        )
+    )
+    try:
+        stage = tmpdir / 'stage'
+        stage.mkdir(parents=True, exist_ok=True)
+        archive_root = stage / prefix
+
+        if include_git_history:
+            log('[source-archive] cloning superproject')
+            with span('clone', path='.'):
                 _clone_committed_checkout(
-                    src=sub_repo,
-                    dst=archive_root / path,
-                    commit=submodule_sha,
-                    label=f'submodule {path}',
-                    clone_depth=sub_clone_depth,
+                    src=repo,
+                    dst=archive_root,
+                    commit=manifest_kwargs['head_sha'],
+                    label='superproject',
+                    clone_depth=clone_depth,
                     redact_local_paths=redact_local_paths,
+                    clone_mode=clone_mode,
                     log=log,
                 )
-            else:
-                (archive_root / path).mkdir(parents=True, exist_ok=True)
-                _extract_git_archive(
-                    sub_repo, submodule_sha, stage, f'{prefix}/{path}'
-                )
+        else:
+            log('[source-archive] exporting superproject with git archive')
+            with span('export', path='.'):
+                _extract_git_archive(repo, 'HEAD', stage, prefix)
+
+        _export_submodules(
+            submodule_decisions,
+            repo_root=repo_root,
+            stage=stage,
+            prefix=prefix,
+            redact_local_paths=redact_local_paths,
+            clone_mode=clone_mode,
+            jobs=jobs,
+            log=log,
+        )
 
         manifest = archive_root / _ARCHIVE_INFO_FNAME
         _assert_archive_info_path_available(manifest)
         if include_git_history:
             _append_manifest_exclude(archive_root)
 
-        _write_manifest(
-            manifest=manifest,
-            repo_root=repo_root,
-            archive_path=archive_path,
-            repo_name=repo_name,
-            prefix=prefix,
-            timestamp=timestamp,
-            head_sha=head_sha,
-            short_sha=short_sha,
-            include_git_history=include_git_history,
-            clone_depth=clone_depth,
-            submodule_decisions=submodule_decisions,
-            redact_local_paths=redact_local_paths,
-        )
+        _write_manifest(manifest=manifest, **manifest_kwargs)
 
-        _write_archive(stage, prefix, archive_path, archive_format)
+        with span('compress', format=archive_format):
+            _write_archive(
+                stage,
+                prefix,
+                manifest_kwargs['archive_path'],
+                archive_format,
+                compression=compression,
+            )
     finally:
         shutil.rmtree(tmpdir, ignore_errors=True)
 
-    log(f'[source-archive] wrote: {archive_path}')
-    if archive_format == 'zip':
-        log(f'[source-archive] list contents: unzip -l {archive_path}')
-    elif archive_format == 'tar':
-        log(f'[source-archive] list contents: tar -tf {archive_path} | less')
+
+def _export_submodules(
+    submodule_decisions: list[SubmoduleArchiveDecision],
+    repo_root: Path,
+    stage: Path,
+    prefix: str,
+    redact_local_paths: bool,
+    clone_mode: str,
+    jobs: int,
+    log: '_Logger',
+) -> None:
+    """
+    Clone or export the included submodules into the stage concurrently.
+
+    A submodule is started once its closest included ancestor is done,
+    because that checkout creates the directory it goes into. With more than
+    one job, log lines are tagged with the submodule path.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    included = []
+    for decision in submodule_decisions:
+        if decision.omitted:
+            log(
+                f'[source-archive] omitting submodule {decision.info.path}: '
+                f'{decision.reason}'
+            )
+        else:
+            included.append(decision)
+    # Fail before any work starts if a submodule is not checked out
+    sub_repos = {
+        decision.info.path: _open_submodule_repo(repo_root, decision.info)
+        for decision in included
+    }
+    parents = {
+        path: _closest_ancestor(path, sub_repos) for path in sub_repos
+    }
+
+    pending = list(included)
+    done: set[str] = set()
+    running: dict[Any, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        try:
+            while pending or running:
+                for decision in list(pending):
+                    path = decision.info.path
+                    parent = parents[path]
+                    if parent is not None and parent not in done:
+                        continue
+                    pending.remove(decision)
+                    future = pool.submit(
+                        _export_submodule,
+                        decision,
+                        sub_repo=sub_repos[path],
+                        stage=stage,
+                        prefix=prefix,
+                        redact_local_paths=redact_local_paths,
+                        clone_mode=clone_mode,
+                        log=log.tagged(path) if jobs > 1 else log,
+                    )
+                    running[future] = path
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path = running.pop(future)
+                    future.result()
+                    done.add(path)
+        except BaseException:
+            for future in running:
+                future.cancel()
+            raise
+
+
+def _closest_ancestor(path: str, paths: Any) -> str | None:
+    """
+    Example:
+        >>> _closest_ancestor('a/b/c/d', {'a', 'a/b/c', 'x'})
+        'a/b/c'
+        >>> _closest_ancestor('a/b', {'b', 'a/b'}) is None
+        True
+    """
+    for parent in PurePosixPath(path).parents:
+        if parent.as_posix() in paths:
+            return parent.as_posix()
+    return None
+
+
+def _export_submodule(
+    decision: SubmoduleArchiveDecision,
+    sub_repo: 'git.Repo',
+    stage: Path,
+    prefix: str,
+    redact_local_paths: bool,
+    clone_mode: str,
+    log: '_Logger',
+) -> None:
+    from git_well.tracing import span
+
+    path = decision.info.path
+    archive_root = stage / prefix
+    sub_short = sub_repo.git.rev_parse('--short=12', 'HEAD').strip()
+    log(
+        f'[source-archive] exporting submodule {path} HEAD {sub_short} '
+        f'depth={_depth_label(decision.depth)} mode={decision.mode}'
+    )
+    if decision.depth != 0:
+        with span('clone', path=path):
+            _clone_committed_checkout(
+                src=sub_repo,
+                dst=archive_root / path,
+                commit=decision.info.sha,
+                label=f'submodule {path}',
+                clone_depth=_clone_depth_from_normalized_depth(
+                    decision.depth
+                ),
+                redact_local_paths=redact_local_paths,
+                clone_mode=clone_mode,
+                log=log,
+            )
     else:
-        log(f'[source-archive] list contents: tar -tf {archive_path} | less')
-    return archive_path
+        (archive_root / path).mkdir(parents=True, exist_ok=True)
+        with span('export', path=path):
+            _extract_git_archive(
+                sub_repo, decision.info.sha, stage, f'{prefix}/{path}'
+            )
+
+
+def _open_submodule_repo(
+    repo_root: Path, info: SubmoduleStatus
+) -> 'git.Repo':
+    """
+    Open the initialized working tree of a submodule that will be archived.
+    """
+    path = info.path
+    if info.status == '-':
+        raise RuntimeError(
+            f"submodule '{path}' is not initialized; run: "
+            'git submodule update --init --recursive'
+        )
+    src_dpath = repo_root / path
+    if not src_dpath.exists():
+        raise RuntimeError(
+            f"submodule path '{path}' is missing; run: "
+            'git submodule update --init --recursive'
+        )
+    sub_repo = _open_exact_repo(src_dpath)
+    if sub_repo is None:
+        raise RuntimeError(
+            f"submodule path '{path}' is not an initialized Git "
+            'working tree; run: git submodule update --init --recursive'
+        )
+    _assert_has_head(sub_repo)
+    return sub_repo
 
 
 def build_source_archive(*args: Any, **kwargs: Any) -> Path:
@@ -730,6 +1078,10 @@ def _normalize_depth(depth: DepthArg) -> int | None:
     return value
 
 
+def _optional_int(value: Any) -> int | None:
+    return None if value is None else int(value)
+
+
 def _depth_label(depth: int | None) -> str:
     """
     Render an internal normalized depth for humans.
@@ -1044,6 +1396,8 @@ def _infer_format_from_output(output: PathLike) -> ResolvedArchiveFormat:
         return 'tar.bz2'
     if name.endswith(('.tar.xz', '.txz')):
         return 'tar.xz'
+    if name.endswith(('.tar.zst', '.tzst')):
+        return 'tar.zst'
     if name.endswith('.tar'):
         return 'tar'
     if name.endswith('.zip'):
@@ -1190,10 +1544,10 @@ def _committed_gitmodule_paths(repo: 'git.Repo', treeish: str) -> set[str]:
     """Read submodule path mappings from the committed ``.gitmodules``."""
     import git
 
+    from git_well.objects import object_reader
+
     blob = f'{treeish}:.gitmodules'
-    try:
-        repo.git.show(blob)
-    except git.GitCommandError:
+    if not object_reader(repo).exists(blob, 'blob'):
         return set()
 
     try:
@@ -1236,17 +1590,25 @@ def _open_exact_repo(path: Path) -> 'git.Repo | None':
 
 
 def _repo_has_commit(repo: 'git.Repo', commit: str) -> bool:
-    import git
+    from git_well.objects import object_reader
 
-    try:
-        repo.git.cat_file('-e', f'{commit}^{{commit}}')
-    except git.GitCommandError:
-        return False
-    return True
+    return object_reader(repo).exists(commit, 'commit')
 
 
-def _clone_options_for_depth(clone_depth: int | None) -> list[str]:
-    options = ['--quiet', '--no-local', '--single-branch', '--no-checkout']
+def _clone_options_for_depth(
+    clone_depth: int | None, clone_mode: str = 'copy'
+) -> list[str]:
+    """
+    Example:
+        >>> _clone_options_for_depth(None, 'share')
+        ['--quiet', '--shared', '--single-branch', '--no-checkout']
+        >>> _clone_options_for_depth(5, 'share')
+        ['--quiet', '--no-local', '--single-branch', '--no-checkout', '--depth', '5']
+    """
+    # Local clones ignore --depth, so shallow history is always transferred
+    share = clone_mode == 'share' and clone_depth is None
+    options = ['--quiet', '--shared' if share else '--no-local']
+    options += ['--single-branch', '--no-checkout']
     if clone_depth is not None:
         options += ['--depth', str(clone_depth)]
     return options
@@ -1260,6 +1622,7 @@ def _clone_committed_checkout(
     clone_depth: int | None,
     redact_local_paths: bool,
     log: '_Logger',
+    clone_mode: str = 'copy',
 ) -> None:
     import shutil
 
@@ -1271,34 +1634,35 @@ def _clone_committed_checkout(
         shutil.rmtree(dst)
 
     src_root = Path(cast(str, src.working_tree_dir)).resolve()
-    clone_command = [
-        'git',
-        'clone',
-        *_clone_options_for_depth(clone_depth),
-        str(src_root),
-        str(dst),
-    ]
+    options = _clone_options_for_depth(clone_depth, clone_mode)
+    clone_command = ['git', 'clone', *options, str(src_root), str(dst)]
     git.Git(str(src_root.parent)).execute(clone_command)
     cloned = git.Repo(dst)
-    _checkout_commit(cloned, commit, label, clone_depth, log)
+    fetched = _checkout_commit(cloned, commit, label, clone_depth, log)
 
     if redact_local_paths:
         for remote in list(cloned.remotes):
             cloned.git.remote('remove', remote.name)
 
     # The archive is for inspection, not local recovery. Expire the clone's
-    # fresh reflogs so they do not keep extra objects alive, then repack to make
-    # the archived .git directory reasonably small.
+    # fresh reflogs so they do not keep extra objects alive.
     try:
         cloned.git.reflog(
             'expire', '--expire=now', '--expire-unreachable=now', '--all'
         )
     except git.GitCommandError:
         pass
-    try:
-        cloned.git.gc('--prune=now', '--quiet')
-    except git.GitCommandError:
-        pass
+    # A --no-local clone already holds exactly one pack, built by
+    # pack-objects for the requested history, so it is not repacked unless a
+    # second fetch was needed. A shared clone copies the borrowed objects
+    # that are reachable from it into one pack, reusing the deltas of the
+    # source packs instead of searching for new ones, then stops borrowing.
+    shared = '--shared' in options
+    if shared or fetched:
+        cloned.git.repack('-a', '-d', '-q')
+    if shared:
+        alternates = Path(cloned.git_dir) / 'objects' / 'info' / 'alternates'
+        alternates.unlink()
 
 
 def _checkout_commit(
@@ -1307,12 +1671,15 @@ def _checkout_commit(
     label: str,
     clone_depth: int | None,
     log: '_Logger',
-) -> None:
+) -> bool:
+    """
+    Check out ``commit``, and return True if it had to be fetched first.
+    """
     import git
 
     try:
         repo.git.checkout('-q', '--detach', commit)
-        return
+        return False
     except git.GitCommandError:
         log(
             f'[source-archive] checkout of {label} failed after clone; fetching exact commit'
@@ -1328,6 +1695,7 @@ def _checkout_commit(
     else:
         repo.git.fetch('--quiet', 'origin', commit)
     repo.git.checkout('-q', '--detach', commit)
+    return True
 
 
 def _extract_git_archive(
@@ -1394,8 +1762,32 @@ def _assert_archive_info_path_available(manifest: Path) -> None:
         )
 
 
-def _write_manifest(
-    manifest: Path,
+def _assert_path_uncommitted(
+    repo: 'git.Repo', treeish: str, fname: str
+) -> None:
+    """
+    Like :func:`_assert_archive_info_path_available`, but for a tree.
+    """
+    stdout = repo.git.ls_tree(treeish, '--', fname)
+    if stdout.strip():
+        mode = stdout.split(' ', 1)[0]
+        kind = {
+            '120000': 'symlink',
+            '040000': 'directory',
+            '100644': 'file',
+            '100755': 'file',
+        }.get(mode, 'filesystem entry')
+        raise FileExistsError(
+            f'cannot create {fname}: the committed repository '
+            f'already contains a {kind} at that path'
+        )
+
+
+def _write_manifest(manifest: Path, **kwargs: Any) -> None:
+    manifest.write_bytes(_manifest_text(**kwargs).encode('utf8'))
+
+
+def _manifest_text(
     repo_root: Path,
     archive_path: Path,
     repo_name: str,
@@ -1407,7 +1799,8 @@ def _write_manifest(
     clone_depth: int | None,
     submodule_decisions: list[SubmoduleArchiveDecision],
     redact_local_paths: bool,
-) -> None:
+    history_format: str = 'git-dir',
+) -> str:
     from git_well import __version__
 
     source_path_text = (
@@ -1461,6 +1854,13 @@ def _write_manifest(
         f'Superproject commit: {head_sha}',
         f'Superproject short commit: {short_sha}',
         f'Superproject history: {superproject_history}',
+    ]
+    bundled = history_format == 'bundle'
+    if bundled:
+        lines.append('History format: git bundle')
+        if include_git_history:
+            lines.append(f'Superproject bundle: {_HISTORY_BUNDLE_FNAME}')
+    lines += [
         '',
         f'Content pruning: {"yes" if pruning_details else "none"}',
     ]
@@ -1488,10 +1888,26 @@ def _write_manifest(
                     f'  reason: {decision.reason}',
                 ]
             )
+            if bundled and not decision.omitted and decision.depth is None:
+                lines.append(
+                    f'  bundle: {decision.info.path}/{_HISTORY_BUNDLE_FNAME}'
+                )
     else:
         lines.append('(none)')
-    manifest_text = '\n'.join(lines).rstrip() + '\n'
-    manifest.write_bytes(manifest_text.encode('utf8'))
+    if bundled:
+        lines += [
+            '',
+            'Restoring history:',
+            f'Each directory with a {_HISTORY_BUNDLE_FNAME} becomes a Git',
+            'checkout of its archived commit when these commands are run in',
+            'it, starting with the superproject:',
+            '',
+            '    git init -q',
+            f'    git fetch -q {_HISTORY_BUNDLE_FNAME} HEAD',
+            '    git update-ref --no-deref HEAD FETCH_HEAD',
+            '    git reset -q',
+        ]
+    return '\n'.join(lines).rstrip() + '\n'
 
 
 def _write_archive(
@@ -1499,13 +1915,18 @@ def _write_archive(
     prefix: str,
     archive_path: Path,
     archive_format: ResolvedArchiveFormat,
+    compression: tuple[int | None, int | None] = (None, None),
 ) -> None:
+    level, threads = compression
     root = stage / prefix
     if archive_format == 'zip':
         import zipfile
 
         with zipfile.ZipFile(
-            archive_path, mode='w', compression=zipfile.ZIP_DEFLATED
+            archive_path,
+            mode='w',
+            compression=zipfile.ZIP_DEFLATED,
+            compresslevel=level,
         ) as zfile:
             _add_zip_entry(zfile, root, Path(prefix))
             for path in sorted(root.rglob('*')):
@@ -1515,12 +1936,256 @@ def _write_archive(
     else:
         import tarfile
 
-        mode = cast(
-            Literal['w', 'w:gz', 'w:bz2', 'w:xz'],
-            _FORMAT_TO_TAR_MODE[archive_format],
+        from git_well.compression import open_compressed
+
+        codec = _FORMAT_TO_CODEC[archive_format]
+        with open_compressed(archive_path, codec, level, threads) as file:
+            with tarfile.open(
+                fileobj=file, mode='w|', bufsize=_TAR_BUFSIZE
+            ) as tar:
+                tar.add(str(root), arcname=prefix, recursive=True)
+
+
+def _stream_git_archives(
+    sources: list[tuple['git.Repo', str, str]],
+    manifest_name: str,
+    manifest_text: str,
+    archive_path: Path,
+    archive_format: ResolvedArchiveFormat,
+    bundles: list[tuple['git.Repo', str, str]] | None = None,
+    jobs: int = 1,
+    compression: tuple[int | None, int | None] = (None, None),
+) -> None:
+    """
+    Write source exports to the archive without a stage directory.
+
+    Each source is a ``(repo, treeish, prefix)`` whose ``git archive`` tar
+    stream is read from a pipe and copied member by member into the output,
+    followed by the history bundles and the in-memory manifest. Bundles are
+    written to temporary files by worker threads while the sources are
+    copied. A partial output is removed on error.
+    """
+    import io
+    import tarfile
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    from git_well.tracing import span
+
+    bundles = bundles or []
+    with contextlib.ExitStack() as stack:
+        futures = []
+        if bundles:
+            import tempfile
+
+            tmpdir = Path(
+                stack.enter_context(
+                    tempfile.TemporaryDirectory(
+                        prefix='git-well-bundles.',
+                        dir=os.environ.get('TMPDIR', None),
+                    )
+                )
+            )
+            pool = stack.enter_context(
+                ThreadPoolExecutor(max_workers=max(1, min(jobs, len(bundles))))
+            )
+            for index, (repo, commit, prefix) in enumerate(bundles):
+                fpath = tmpdir / f'{index}.bundle'
+                arcname = f'{prefix}/{_HISTORY_BUNDLE_FNAME}'
+                future = pool.submit(_write_git_bundle, repo, commit, fpath)
+                futures.append((future, arcname, fpath))
+        try:
+            with _ArchiveStreamWriter(
+                archive_path, archive_format, *compression
+            ) as writer:
+                for repo, treeish, prefix in sources:
+                    with span('export', path=prefix):
+                        _copy_git_archive(repo, treeish, prefix, writer)
+                for future, arcname, fpath in futures:
+                    future.result()
+                    member = tarfile.TarInfo(arcname)
+                    member.size = fpath.stat().st_size
+                    member.mode = 0o644
+                    member.mtime = int(time.time())
+                    with fpath.open('rb') as file:
+                        writer.add(member, file)
+                data = manifest_text.encode('utf8')
+                member = tarfile.TarInfo(manifest_name)
+                member.size = len(data)
+                member.mode = 0o644
+                member.mtime = int(time.time())
+                writer.add(member, io.BytesIO(data))
+        except BaseException:
+            for future, _, _ in futures:
+                future.cancel()
+            archive_path.unlink(missing_ok=True)
+            raise
+
+
+def _write_git_bundle(repo: 'git.Repo', commit: str, fpath: Path) -> None:
+    """
+    Write a bundle with the full history of ``commit`` as its ``HEAD``.
+
+    This is the file ``git bundle create <file> HEAD`` writes, but it also
+    works for commits no ref points to, such as a submodule commit that is
+    not checked out. No prerequisites are listed, so the bundle can be
+    fetched into an empty repository.
+    """
+    import subprocess
+
+    from git_well.tracing import span
+
+    object_format = repo.git.rev_parse('--show-object-format').strip()
+    if object_format == 'sha1':
+        header = f'# v2 git bundle\n{commit} HEAD\n\n'
+    else:
+        header = (
+            f'# v3 git bundle\n@object-format={object_format}\n'
+            f'{commit} HEAD\n\n'
+        )
+    with span('bundle', commit=commit), fpath.open('wb') as file:
+        file.write(header.encode('ascii'))
+        file.flush()
+        subprocess.run(
+            ['git', 'pack-objects', '--stdout', '--revs', '-q',
+             '--delta-base-offset'],
+            cwd=cast(str, repo.working_tree_dir),
+            input=f'{commit}\n'.encode('ascii'),
+            stdout=file,
+            check=True,
+        )
+
+
+def _copy_git_archive(
+    repo: 'git.Repo', treeish: str, prefix: str, writer: '_ArchiveStreamWriter'
+) -> None:
+    import subprocess
+    import tarfile
+
+    command = [
+        'git',
+        'archive',
+        '--format=tar',
+        f'--prefix={prefix.rstrip("/")}/',
+        treeish,
+    ]
+    proc = subprocess.Popen(
+        command,
+        cwd=cast(str, repo.working_tree_dir),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    assert proc.stdout is not None and proc.stderr is not None
+    try:
+        with tarfile.open(fileobj=proc.stdout, mode='r|') as tar:
+            for member in tar:
+                fileobj = tar.extractfile(member) if member.isreg() else None
+                writer.add(member, fileobj)
+        # Read the end-of-archive padding so git exits cleanly
+        proc.stdout.read()
+    except BaseException:
+        proc.kill()
+        raise
+    finally:
+        proc.stdout.close()
+        stderr = proc.stderr.read()
+        proc.stderr.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise RuntimeError(
+            f'git archive of {treeish} in {repo.working_tree_dir} failed: '
+            + stderr.decode('utf8', errors='replace').strip()
+        )
+
+
+class _ArchiveStreamWriter:
+    """
+    Adds tar members, read from another tar stream, to a tar or zip archive.
+
+    Directory entries are written once, so the directory ``git archive``
+    emits for a gitlink does not repeat the root of the submodule export.
+    """
+
+    def __init__(
+        self,
+        archive_path: Path,
+        archive_format: ResolvedArchiveFormat,
+        level: int | None = None,
+        threads: int | None = None,
+    ) -> None:
+        import tarfile
+        import zipfile
+
+        from git_well.compression import open_compressed
+
+        self._dirs: set[str] = set()
+        self._tar: tarfile.TarFile | None = None
+        self._zip: zipfile.ZipFile | None = None
+        self._stack = contextlib.ExitStack()
+        if archive_format == 'zip':
+            self._zip = zipfile.ZipFile(
+                archive_path,
+                mode='w',
+                compression=zipfile.ZIP_DEFLATED,
+                compresslevel=level,
+            )
+            self._stack.enter_context(self._zip)
+        else:
+            codec = _FORMAT_TO_CODEC[archive_format]
+            file = self._stack.enter_context(
+                open_compressed(archive_path, codec, level, threads)
+            )
+            self._tar = tarfile.open(
+                fileobj=file, mode='w|', bufsize=_TAR_BUFSIZE
+            )
+            self._stack.enter_context(self._tar)
+
+    def __enter__(self) -> '_ArchiveStreamWriter':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stack.__exit__(*exc)
+
+    def add(self, member: 'tarfile.TarInfo', fileobj: Any = None) -> None:
+        if member.isdir():
+            name = member.name.rstrip('/')
+            if name in self._dirs:
+                return
+            self._dirs.add(name)
+        if self._tar is not None:
+            self._tar.addfile(member, fileobj)
+        else:
+            self._add_zip_member(member, fileobj)
+
+    def _add_zip_member(self, member: 'tarfile.TarInfo', fileobj: Any) -> None:
+        import shutil
+        import stat
+        import time
+        import zipfile
+
+        assert self._zip is not None
+        name = member.name.rstrip('/')
+        date_time = max(
+            tuple(time.localtime(member.mtime)[0:6]), (1980, 1, 1, 0, 0, 0)
         )
-        with tarfile.open(archive_path, mode) as tar:
-            tar.add(str(root), arcname=prefix, recursive=True)
+        if member.isdir():
+            name, file_type = name + '/', stat.S_IFDIR
+        elif member.issym():
+            file_type = stat.S_IFLNK
+        else:
+            file_type = stat.S_IFREG
+        zinfo = zipfile.ZipInfo(name, date_time=date_time)
+        zinfo.create_system = 3
+        zinfo.external_attr = ((file_type | member.mode) & 0xFFFF) << 16
+        if member.isdir():
+            self._zip.writestr(zinfo, b'')
+        elif member.issym():
+            self._zip.writestr(zinfo, member.linkname)
+        else:
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            zinfo.file_size = member.size
+            with self._zip.open(zinfo, mode='w') as dst:
+                shutil.copyfileobj(fileobj, dst, 1 << 20)
 
 
 def _add_zip_entry(zfile: 'zipfile.ZipFile', path: Path, arcname: Path) -> None:
@@ -1545,12 +2210,23 @@ def _add_zip_entry(zfile: 'zipfile.ZipFile', path: Path, arcname: Path) -> None:
 
 
 class _Logger:
-    def __init__(self, verbose: int) -> None:
+    def __init__(self, verbose: int, tag: str | None = None) -> None:
         self.verbose = verbose
+        self.tag = tag
 
     def __call__(self, msg: str) -> None:
         if self.verbose:
-            print(msg)
+            if self.tag is not None:
+                head, sep, rest = msg.partition('] ')
+                msg = f'{head}{sep}[{self.tag}] {rest}'
+            # One write per line so lines from worker threads do not mix
+            print(msg + '\n', end='', flush=True)
+
+    def tagged(self, tag: str) -> '_Logger':
+        """
+        A logger for one submodule, used while several export at once.
+        """
+        return _Logger(self.verbose, tag=tag)
 
     def path(self, prefix: str, path: PathLike, suffix: str = '') -> None:
         if self.verbose:
@@ -9,6 +9,10 @@ import ubelt as ub
 
 
 class GitAutoconfGpgsignCLI(kwconf.Config):
+    """
+    Configure commit signing with the GPG key that matches a remote.
+    """
+
     __command__ = 'autoconf-gpg'
 
     remote = kwconf.Value(None, help='param1')
@@ -45,18 +49,28 @@ class GitAutoconfGpgsignCLI(kwconf.Config):
         env = os.environ.copy()
         env['GIT_SSH_COMMAND'] = 'ssh -v'
 
-        infos = []
+        from git_well.jobs import Job, run_jobs, ssh_resource
+
+        # Contact every remote concurrently, but only a few at a time per
+        # ssh host.
+        jobs = []
         for remote in repo.remotes:
             for url in list(remote.urls):
                 print(f'url={url}')
-                try:
-                    info = repo.cmd(f'git ls-remote {url}', env=env)
-                except Exception:
-                    ...
-                except KeyboardInterrupt:
-                    ...
-                else:
-                    infos.append(info)
+                resource = ssh_resource(url)
+                jobs.append(
+                    Job(
+                        ['git', 'ls-remote', url],
+                        cwd=repo.dpath,
+                        env=env,
+                        resources=() if resource is None else (resource,),
+                    )
+                )
+        try:
+            results = run_jobs(jobs)
+        except KeyboardInterrupt:
+            results = []
+        infos = [info for info in results if info.returncode == 0]
 
         identify_file_cands: list[ub.Path] = []
         for info in infos:
@@ -31,9 +31,10 @@ import ubelt as ub
 
 class UpdateDevBranch(kwconf.Config):
     """
-    Upgrade to the latest "dev" branch. I.e. search for the branch
-    ``dev/<version>`` with the greatest semantic version.
+    Upgrade to the latest "dev" branch.
 
+    I.e. search for the branch ``dev/<version>`` with the greatest semantic
+    version.
     """
 
     __command__: str = 'branch_upgrade'
@@ -130,41 +131,52 @@ class UpdateDevBranch(kwconf.Config):
 
 
 def dev_branches(repo: Any) -> list[dict[str, Any]]:
+    """
+    Find local and remote ``dev/<version>`` branches sorted by version.
+
+    Example:
+        >>> from git_well.git_branch_upgrade import dev_branches
+        >>> from git_well.repo import Repo
+        >>> repo = Repo.demo()
+        >>> repo.cmd('git branch dev/1.10.0')
+        >>> repo.cmd('git branch dev/1.9.0')
+        >>> repo.cmd('git branch dev/notaversion')
+        >>> infos = dev_branches(repo)
+        >>> [d['branch_name'] for d in infos]
+        ['dev/1.9.0', 'dev/1.10.0']
+    """
+    import datetime as datetime_mod
+
+    import git
     from packaging.version import parse as Version
 
-    branch_infos = []
-    for line in repo.git.branch('-r').split('\n'):
-        line = line.strip().split('->')[-1].strip()
-        for remote in repo.remotes:
-            if line.startswith(remote.name):
-                info = {
-                    'remote': remote,
-                    'branch_name': line.lstrip(remote.name + '/'),
-                    'full_name': line,
-                }
-                branch_infos.append(info)
-
-    for branch in repo.branches:
-        info = {
-            'remote': None,
-            'branch': branch,
-            'branch_name': branch.name,
-            'datetime': branch.commit.committed_datetime,
-        }
-        branch_infos.append(info)
+    from git_well.refs import RefSnapshot
+
+    snapshot = RefSnapshot.from_repo(repo)
+    remotes = {remote.name: remote for remote in repo.remotes}
 
     dev_infos = []
-    for info in branch_infos:
-        branch_name = info.get('branch_name')
-        if isinstance(branch_name, str) and branch_name.startswith('dev/'):
-            vstr = branch_name.split('/')[-1]
-            try:
-                info['version'] = Version(vstr)
-            except Exception:
-                ...
-            else:
-                # if not isinstance(info['version'], LegacyVersion):
-                dev_infos.append(info)
+    for ref in snapshot.select():
+        if ref.kind == 'tag' or not ref.name.startswith('dev/'):
+            continue
+        vstr = ref.name.split('/')[-1]
+        try:
+            version = Version(vstr)
+        except Exception:
+            continue
+        info = {
+            'remote': remotes.get(ref.remote) if ref.remote else None,
+            'branch_name': ref.name,
+            'datetime': datetime_mod.datetime.fromtimestamp(
+                ref.committed_time, tz=datetime_mod.timezone.utc
+            ),
+            'version': version,
+        }
+        if ref.kind == 'local':
+            info['branch'] = git.Head(repo, ref.refname)
+        else:
+            info['full_name'] = ref.short_name
+        dev_infos.append(info)
 
     versioned_dev_branches = sorted(dev_infos, key=lambda x: x['version'])
     return versioned_dev_branches
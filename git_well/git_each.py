@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# PYTHON_ARGCOMPLETE_OK
+"""
+Run a ``git-well`` subcommand in every repository of a workspace.
+
+Driving ``git-well`` from a shell loop pays interpreter startup and imports
+once per repository. ``git-well each`` finds the repositories under a root
+and runs the subcommand in-process on a pool of worker processes, so each
+worker pays the imports once. Output of each run is captured and the per
+repository status, time and error are summarized at the end.
+
+CommandLine:
+    git-well each --root ~/code --jobs 16 remote_protocol git
+    git-well each --root ~/code --json results.json track_upstream
+    git-well each --root ~/code --exclude 'forks/*' -- ipfs status
+"""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any, Sequence
+
+import kwconf
+import ubelt as ub
+
+
+class GitEachCLI(kwconf.Config):
+    """
+    Run a git-well subcommand in every repository under a root directory.
+
+    Everything after the first positional argument (or after ``--``) is the
+    subcommand and its arguments. The subcommand runs with each repository
+    as its working directory.
+    """
+
+    __command__ = 'each'
+
+    root = kwconf.Value('.', help='directory to search for repositories')
+    jobs = kwconf.Value(
+        None,
+        help=(
+            'number of worker processes, defaults to the global '
+            '``git-well --jobs`` limit'
+        ),
+    )
+    max_depth = kwconf.Value(
+        4, help='how many directory levels below the root to search'
+    )
+    exclude = kwconf.Value(
+        None,
+        nargs='+',
+        help='glob patterns of repository paths, relative to root, to skip',
+    )
+    json = kwconf.Value(
+        None,
+        help="write per-repository results as JSON to this path, or '-'",
+    )
+    show_output = kwconf.Flag(
+        False, help='print the captured output of every repository'
+    )
+    command = kwconf.Value(
+        None, nargs='*', help='the subcommand and its arguments'
+    )
+
+    @classmethod
+    def main(
+        cls, argv: list[str] | str | bool | None = True, **kwargs: Any
+    ) -> int:
+        """
+        Example:
+            >>> from git_well.git_each import GitEachCLI
+            >>> import ubelt as ub
+            >>> root = ub.Path.appdir('git_well/tests/each/main')
+            >>> root.delete().ensuredir()
+            >>> for name in ['repo1', 'repo2']:
+            >>>     ub.cmd(['git', 'init', '-q', root / name], check=True)
+            >>> ret = GitEachCLI.main(
+            >>>     argv=['--root', root, '--jobs', 2, '--show_output',
+            >>>           'url', 'https://github.com/a/b.git', 'repo_name'])
+            >>> assert ret == 0
+        """
+        own_argv, command_argv = _split_argv(cls, argv)
+        if command_argv:
+            kwargs['command'] = command_argv
+        config = cls.cli(argv=own_argv, data=kwargs, strict=True)
+        command = [str(arg) for arg in (config.command or [])]
+        if not command:
+            raise ValueError('git-well each needs a subcommand to run')
+        if command[0] == cls.__command__:
+            raise ValueError('git-well each cannot run itself')
+
+        from git_well.tracing import span
+
+        root = ub.Path(config.root).expand()
+        repos = find_repos(
+            root, max_depth=int(config.max_depth), exclude=config.exclude
+        )
+        jobs = config.jobs
+        if jobs is None:
+            from git_well.jobs import get_max_jobs
+
+            jobs = get_max_jobs()
+        to_stdout = config.json == '-'
+        with span('each', num_repos=len(repos)):
+            results = run_each(
+                repos, command, jobs=int(jobs), verbose=not to_stdout
+            )
+
+        records = [
+            dict(result, repo=os.fspath(result['repo'])) for result in results
+        ]
+        if config.json is not None:
+            import json
+
+            text = json.dumps(records, indent=2)
+            if to_stdout:
+                print(text)
+            else:
+                Path(config.json).write_text(text + '\n')
+        if not to_stdout:
+            if config.show_output:
+                for record in records:
+                    print(f'==> {record["repo"]} <==')
+                    print(record['output'], end='')
+            _print_summary(records, root)
+        return int(any(record['status'] != 'ok' for record in records))
+
+
+def _split_argv(
+    cls: type[kwconf.Config], argv: list[str] | str | bool | None
+) -> tuple[list[str], list[str]]:
+    """
+    Separate the options of ``each`` from the subcommand that follows them.
+
+    Example:
+        >>> from git_well.git_each import GitEachCLI, _split_argv
+        >>> _split_argv(GitEachCLI, ['--root', 'x', 'sync', '--root', 'y'])
+        (['--root', 'x'], ['sync', '--root', 'y'])
+        >>> _split_argv(GitEachCLI, ['--show_output', '--jobs=2', '--', '-x'])
+        (['--show_output', '--jobs=2'], ['-x'])
+        >>> _split_argv(GitEachCLI, False)
+        ([], [])
+    """
+    import sys
+
+    if isinstance(argv, str):
+        import shlex
+
+        words = shlex.split(argv)
+    elif isinstance(argv, (bool, int)) or argv is None:
+        words = sys.argv[1:] if (argv is None or argv) else []
+    else:
+        words = [os.fspath(arg) if isinstance(arg, os.PathLike) else str(arg)
+                 for arg in argv]
+    defaults = cls.__default__
+    index = 0
+    while index < len(words):
+        arg = words[index]
+        if arg == '--':
+            return words[:index], words[index + 1 :]
+        if not arg.startswith('-'):
+            break
+        name = arg.partition('=')[0].lstrip('-').replace('-', '_')
+        value = defaults.get(name[3:] if name.startswith('no_') else name)
+        is_flag = getattr(value, 'isflag', False) or name in {'h', 'help'}
+        index += 1 if ('=' in arg or is_flag) else 2
+    return words[:index], words[index:]
+
+
+def find_repos(
+    root: str | os.PathLike[str],
+    max_depth: int = 4,
+    exclude: Sequence[str] | str | None = None,
+) -> list[Path]:
+    """
+    Find git working trees under a directory.
+
+    The search does not descend into a repository (its submodules belong to
+    it), into hidden directories, or through symlinks.
+
+    Example:
+        >>> from git_well.git_each import find_repos
+        >>> import ubelt as ub
+        >>> root = ub.Path.appdir('git_well/tests/each/find')
+        >>> root.delete().ensuredir()
+        >>> for name in ['a', 'b/c', 'b/d/e', '.hidden/f']:
+        >>>     (root / name / '.git').ensuredir()
+        >>> (root / 'a' / 'sub' / '.git').ensuredir()
+        >>> [p.relative_to(root).as_posix() for p in find_repos(root)]
+        ['a', 'b/c', 'b/d/e']
+        >>> [p.relative_to(root).as_posix()
+        >>>  for p in find_repos(root, max_depth=2, exclude='b/c')]
+        ['a']
+        >>> [p.name for p in find_repos(root / 'a')]
+        ['a']
+    """
+    import fnmatch
+
+    if isinstance(exclude, str):
+        exclude = [exclude]
+    patterns = list(exclude or [])
+    root = Path(root)
+    if (root / '.git').exists():
+        return [root]
+
+    found: list[Path] = []
+    level = [root]
+    for depth in range(1, max_depth + 1):
+        next_level = []
+        for dpath in level:
+            try:
+                entries = list(os.scandir(dpath))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                except OSError:
+                    continue
+                path = Path(entry.path)
+                rel = path.relative_to(root).as_posix()
+                if any(fnmatch.fnmatch(rel, pat) for pat in patterns):
+                    continue
+                if (path / '.git').exists():
+                    found.append(path)
+                elif depth < max_depth:
+                    next_level.append(path)
+        level = next_level
+    return sorted(found)
+
+
+def run_each(
+    repos: Sequence[Path],
+    command: Sequence[str],
+    jobs: int = 1,
+    verbose: bool = True,
+) -> list[dict[str, Any]]:
+    """
+    Run ``git-well <command>`` in each repository on a process pool.
+
+    Returns:
+        List[Dict]: per repository ``repo``, ``status`` (``'ok'``,
+        ``'failed'`` or ``'error'``), ``returncode``, ``seconds``, ``error``
+        and the captured ``output``, in the order of ``repos``.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    results: dict[int, dict[str, Any]] = {}
+    if not repos:
+        return []
+    with ProcessPoolExecutor(
+        max_workers=max(1, min(jobs, len(repos))),
+        initializer=_init_worker,
+    ) as pool:
+        futures = {
+            pool.submit(_run_in_repo, os.fspath(repo), list(command)): index
+            for index, repo in enumerate(repos)
+        }
+        for num_done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            result: dict[str, Any]
+            try:
+                result = future.result()
+            except Exception as ex:
+                # The worker itself died
+                result = {
+                    'status': 'error',
+                    'returncode': 1,
+                    'seconds': 0.0,
+                    'error': f'{type(ex).__name__}: {ex}',
+                    'output': '',
+                }
+            result['repo'] = repos[index]
+            results[index] = result
+            if verbose:
+                print(
+                    '[{}/{}] {:<6} {:7.2f}s {}'.format(
+                        num_done,
+                        len(repos),
+                        result['status'],
+                        result['seconds'],
+                        repos[index],
+                    )
+                )
+    return [results[index] for index in range(len(repos))]
+
+
+def _init_worker() -> None:
+    import sys
+
+    # Subcommands must not wait for answers to prompts nobody can see
+    sys.stdin = open(os.devnull)
+
+
+def _run_in_repo(repo_dpath: str, command: list[str]) -> dict[str, Any]:
+    """
+    Run one subcommand with the repository as the working directory.
+    """
+    import contextlib
+    import io
+    import time
+
+    from git_well.main import GitWellModalCLI
+
+    start = time.perf_counter()
+    output = io.StringIO()
+    status, returncode, error = 'ok', 0, None
+    try:
+        os.chdir(repo_dpath)
+        with contextlib.redirect_stdout(output), \
+                contextlib.redirect_stderr(output):
+            ret = GitWellModalCLI().main(argv=command)
+        if isinstance(ret, int) and not isinstance(ret, bool) and ret:
+            status, returncode = 'failed', ret
+    except SystemExit as ex:
+        code = ex.code
+        if code not in {None, 0}:
+            returncode = code if isinstance(code, int) else 1
+            status, error = 'failed', None if isinstance(code, int) else code
+    except Exception as ex:
+        status, returncode = 'error', 1
+        error = f'{type(ex).__name__}: {ex}'
+    return {
+        'status': status,
+        'returncode': returncode,
+        'seconds': time.perf_counter() - start,
+        'error': error,
+        'output': output.getvalue(),
+    }
+
+
+def _print_summary(records: list[dict[str, Any]], root: Path) -> None:
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title='git-well each')
+    table.add_column('repo', overflow='fold')
+    table.add_column('status', no_wrap=True)
+    table.add_column('seconds', justify='right')
+    table.add_column('error', overflow='fold')
+    for record in records:
+        try:
+            name = Path(record['repo']).relative_to(root).as_posix()
+        except ValueError:
+            name = record['repo']
+        table.add_row(
+            name,
+            record['status'],
+            f'{record["seconds"]:.2f}',
+            record['error'] or '',
+        )
+    Console().print(table)
+    counts = ub.dict_hist(record['status'] for record in records)
+    total = sum(record['seconds'] for record in records)
+    print(
+        '{} repositories, {}, {:.2f}s of work'.format(
+            len(records), ub.urepr(counts, nl=0), total
+        )
+    )
+
+
+__cli__ = GitEachCLI
+main = __cli__.main
+
+if __name__ == '__main__':
+    """
+    CommandLine:
+        python -m git_well.git_each --root ~/code url --help
+    """
+    main()
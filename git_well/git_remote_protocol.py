@@ -67,15 +67,25 @@ class GitRemoteProtocol(kwconf.Config):
     )
 
 
-def _config_values(repo: Any, key: str) -> list[str]:
-    info = ub.cmd(
-        ['git', 'config', '--get-all', key], cwd=repo.dpath, verbose=0
+def _config_values_many(repo: Any, keys: list[str]) -> dict[str, list[str]]:
+    """
+    Read every value of several multi-valued config keys concurrently.
+    """
+    from git_well.jobs import Job, run_jobs
+
+    results = run_jobs(
+        [Job(['git', 'config', '--get-all', key], cwd=repo.dpath)
+         for key in keys]
     )
-    if info.returncode == 1:
-        return []
-    if info.returncode:
-        raise RuntimeError(f'Unable to read git config key: {key}')
-    return cmd_output_text(info.stdout).splitlines()
+    values = {}
+    for key, info in zip(keys, results):
+        if info.returncode == 1:
+            values[key] = []
+        elif info.returncode:
+            raise RuntimeError(f'Unable to read git config key: {key}')
+        else:
+            values[key] = cmd_output_text(info.stdout).splitlines()
+    return values
 
 
 def _replace_config_values(repo: Any, key: str, values: list[str]) -> None:
@@ -128,28 +138,33 @@ def main(argv: list[str] | str | bool | None = True, **kwargs: Any) -> None:
     if new_protocol not in VALID_PROTOCOLS:
         raise KeyError(new_protocol)
 
+    remote_keys = [
+        (remote.name, f'remote.{remote.name}.{value_name}')
+        for remote in repo.remotes
+        for value_name in ['url', 'pushurl']
+    ]
+    key_values = _config_values_many(repo, [key for _, key in remote_keys])
+
     remote_entries: list[RemoteEntry] = []
-    for remote in repo.remotes:
-        for value_name in ['url', 'pushurl']:
-            key = f'remote.{remote.name}.{value_name}'
-            for index, raw_url in enumerate(_config_values(repo, key)):
-                url = GitURL(raw_url)
-                try:
-                    info = url.info
-                except ValueError as ex:
-                    print(f'Skipping unsupported remote URL {raw_url!r}: {ex}')
-                    continue
-                if info['protocol'] in {'local', 'file'}:
-                    print(f'Skipping local remote URL: {raw_url}')
-                    continue
-                remote_entries.append(
-                    {
-                        'remote': remote.name,
-                        'key': key,
-                        'index': index,
-                        'url': url,
-                    }
-                )
+    for remote_name, key in remote_keys:
+        for index, raw_url in enumerate(key_values[key]):
+            url = GitURL(raw_url)
+            try:
+                info = url.info
+            except ValueError as ex:
+                print(f'Skipping unsupported remote URL {raw_url!r}: {ex}')
+                continue
+            if info['protocol'] in {'local', 'file'}:
+                print(f'Skipping local remote URL: {raw_url}')
+                continue
+            remote_entries.append(
+                {
+                    'remote': remote_name,
+                    'key': key,
+                    'index': index,
+                    'url': url,
+                }
+            )
 
     print(
         'remote_urls = {}'.format(
@@ -188,8 +203,10 @@ def main(argv: list[str] | str | bool | None = True, **kwargs: Any) -> None:
 
     num_changes = sum(map(len, changes_by_key.values()))
     print(f'Making {num_changes} changes')
+    current = _config_values_many(repo, list(changes_by_key))
     for key, changes in changes_by_key.items():
-        values = _config_values(repo, key)
+        # Writes take the config lock, so they stay sequential
+        values = current[key]
         for index, new_url in changes:
             values[index] = str(new_url)
         _replace_config_values(repo, key, values)
@@ -8,10 +8,7 @@ from typing import Any
 import kwconf
 import ubelt as ub
 
-from git_well.git_squash_streaks import (
-    _squash_between,
-    checkout_temporary_branch,
-)
+from git_well.git_squash_streaks import _finish_rewrite, _squash_between
 
 
 class GitSquashCLI(kwconf.Config):
@@ -48,8 +45,8 @@ class GitSquashCLI(kwconf.Config):
         isflag=True,
         help=ub.paragraph(
             """
-            if True the repo will be reset to a clean state if any
-            errors occur. (Default: True)
+            Deprecated and ignored. The branch is only moved after
+            the squash succeeded.
             """
         ),
     )
@@ -104,38 +101,34 @@ def squash_commits(config: Any) -> None:
     if repo.is_ancestor(ancestor_rev=newest, rev=oldest):
         raise ValueError(f'Commit {oldest} is not an ancestor of {newest}')
 
-    if not config.dry:
-        temp_branch = checkout_temporary_branch(repo, '-squash-temp')
-    else:
-        temp_branch = None
-
+    orig_head = repo.head.commit.hexsha
+    temp_branch = None
     try:
-        _squash_between(
+        new_head = _squash_between(
             repo,
             start=oldest,
             stop=newest,
             dry=config.dry,
             verbose=config.verbose,
             start_inclusive=False,
+            head=orig_head,
         )
+        if not config.dry:
+            assert new_head is not None
+            temp_branch = _finish_rewrite(
+                repo, orig_branch_name, orig_head, new_head, config.inplace
+            )
     except Exception:
         print(
             'Squash failed. Consider running with --dry or checking your range.'
         )
-        if not config.dry and config.auto_rollback:
-            print('ROLLING BACK')
-            repo.git.checkout(orig_branch_name)
         raise
 
     if config['dry']:
         print('Dry run finished. No changes made.')
     elif config['inplace']:
-        repo.git.checkout(orig_branch_name)
-        repo.git.reset(temp_branch, hard=True)
-        repo.git.branch('-D', temp_branch)
         print('Squash applied. You should now push with --force if needed.')
     else:
-        repo.git.checkout(orig_branch_name)
         print(f'Squashed branch is: {temp_branch}')
         print('Review the changes with:')
         print(f'    gitk {orig_branch_name} {temp_branch}')
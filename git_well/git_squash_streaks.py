@@ -11,7 +11,6 @@ Requirements:
 
 from __future__ import annotations
 
-import itertools as it
 import os
 import sys
 import warnings
@@ -21,7 +20,6 @@ import kwconf
 import ubelt as ub
 
 EXPERIMENTAL_PSEUDO_CHAIN: int = 0
-EXPERIMENTAL_REBASE: int = 0
 
 __docstubs__: str = """
 from git.objects.commit import Commit
@@ -70,6 +68,52 @@ class SquashStreakCLI(kwconf.Config):
     )
     tags: bool = kwconf.Value(False, isflag=True, help='experimental')
 
+    watermark: bool = kwconf.Value(
+        True,
+        isflag=True,
+        help=ub.paragraph(
+            """
+            record the squashed head in
+            refs/git-well/squash-watermark/<branch> and, unless
+            --oldest-commit is given, only analyze commits after the
+            last watermark of the branch. Use --no-watermark to rescan
+            the full history.
+            """
+        ),
+    )
+    plan_out: str | None = kwconf.Value(
+        None,
+        help=ub.paragraph(
+            """
+            write the resolved streaks (start/stop commits, commit
+            counts, new messages and expected trees) to this JSON file.
+            Combine with a dry run to review a plan before applying it.
+            """
+        ),
+    )
+    apply_plan: str | None = kwconf.Value(
+        None,
+        help=ub.paragraph(
+            """
+            squash the streaks from a JSON file written by --plan-out
+            instead of searching for them again. Fails if the branch
+            moved since the plan was written.
+            """
+        ),
+    )
+
+    pseudo_chain: bool = kwconf.Value(
+        False,
+        isflag=True,
+        help=ub.paragraph(
+            """
+            experimental: let the chain step over merge bubbles that
+            have no other connection to the rest of the history. Merges
+            above squashed streaks are preserved.
+            """
+        ),
+    )
+
     preserve_tags: bool | set[str] | list[str] | tuple[str, ...] = kwconf.Value(
         True,
         isflag=True,
@@ -107,8 +151,9 @@ class SquashStreakCLI(kwconf.Config):
         isflag=True,
         help=ub.paragraph(
             """
-            if True the repo will be reset to a clean state if any
-            errors occur. (Default: True)
+            Deprecated and ignored. Branches are only moved after
+            every streak was squashed, so a failure leaves the repo
+            untouched.
             """
         ),
     )
@@ -286,87 +331,17 @@ def find_pseudo_chain(
         >>> pseudo_chain = find_pseudo_chain(head)
         >>> print('pseudo_chain = {}'.format(ub.urepr(pseudo_chain, nl=1)))
     """
-    import networkx as nx
-
-    graph = git_nx_graph(head, oldest_commit, preserve_tags=preserve_tags)
-
-    sinks = {node for node in graph.nodes if len(graph.succ[node]) == 0}
-    sources = {node for node in graph.nodes if len(graph.pred[node]) == 0}
-    assert len(sources) == 1
-    assert len(sinks) == 1
-
-    source = ub.peek(sources)
-    sink = ub.peek(sinks)
-
-    ugraph = nx.to_undirected(graph)
-
-    # These are all the commits that break chains
-
-    branchy_bunches = [
-        cc
-        for cc in nx.algorithms.connectivity.k_edge_components(ugraph, 2)
-        if len(cc) > 1
-    ]
-
-    collapsed = nx.algorithms.connectivity.edge_augmentation.collapse(
-        graph, branchy_bunches
-    )
-    uncollapsed = ub.invert_dict(collapsed.graph['mapping'], unique_vals=False)
-    collapsed_nodes = [k for k, v in uncollapsed.items() if len(v) > 1]
-
-    # Having a start and endpoint for each branchy section will let us treat
-    # the rest of the git history as a chain and operate within it
-    bunch_terminals = []
-    for node in collapsed_nodes:
-        terminals = []
-        collapsed_group = uncollapsed[node]
-        children = collapsed.pred[node]
-        parents = collapsed.succ[node]
-
-        assert len(children) <= 1
-        assert len(parents) <= 1
-
-        for child in children:
-            candidate_s = uncollapsed[child]
-            found = []
-            for u, v in it.product(collapsed_group, candidate_s):
-                if ugraph.has_edge(u, v):
-                    found.append(u)
-            assert len(found) == 1
-            terminals.append(found[0])
-
-        for parent in parents:
-            candidate_t = uncollapsed[parent]
-            found = []
-            for u, v in it.product(collapsed_group, candidate_t):
-                if ugraph.has_edge(u, v):
-                    found.append(u)
-            assert len(found) == 1
-            terminals.append(found[0])
-        bunch_terminals.append(terminals)
-
-    # There should be exactly one path between the start and the first terminal
-    # Likewise, if we skip all nodes between terminals a and b, there should
-    # only be one path "our pseudo-chain" between them
-    src = source
-    pseudo_chain_parts = []
-    for terminal_a, terminal_b in bunch_terminals:
-        dst = terminal_a
-        all_paths = list(nx.all_simple_paths(graph, src, dst))
-        assert len(all_paths) == 1
-        path = all_paths[0]
-        pseudo_chain_parts.append(path)
-        src = terminal_b
-    # Finally link to the sink
-    dst = sink
-    all_paths = list(nx.all_simple_paths(graph, src, dst))
-    assert len(all_paths) == 1
-    path = all_paths[0]
-    pseudo_chain_parts.append(path)
+    from git_well.commit_graph import CommitGraph, pseudo_chain
 
     repo = head.repo
-    pseudo_chain = [repo.commit(sha) for sha in ub.flatten(pseudo_chain_parts)]
-    return pseudo_chain
+    graph = CommitGraph.load(
+        repo,
+        head,
+        oldest_commit=oldest_commit or None,
+        preserve_tags=preserve_tags,
+        with_metadata=False,
+    )
+    return [graph.commit(repo, index) for index in pseudo_chain(graph)]
 
 
 def git_nx_graph(
@@ -389,68 +364,24 @@ def git_nx_graph(
         from xdev.util_networkx import write_network_text
         write_network_text(graph)
     """
-    repo = head.repo
-
-    if oldest_commit:
-        stop_object = repo.commit(oldest_commit)
-    else:
-        stop_object = None
+    from git_well.commit_graph import CommitGraph
 
-    if preserve_tags:
-        tags = head.repo.tags
-        if isinstance(preserve_tags, (set, list, tuple)):
-            tags = {tag for tag in tags if tag.name in preserve_tags}
-        tagged_hexshas = {tag.commit.hexsha for tag in tags}
-    else:
-        tagged_hexshas = set()
-
-    def neighbors(s: Any) -> Any:
-        return iter(s.parents)
-
-    def git_dfs_edges(source: Any, depth_limit: int | None = None) -> Any:
-        nodes = [source]
-        visited = set()
-        if depth_limit is None:
-            depth_limit = sys.maxsize
-        for start in nodes:
-            if start.hexsha in visited:
-                continue
-            visited.add(start.hexsha)
-            stack = [(start, depth_limit, neighbors(start))]
-            while stack:
-                parent, depth_now, children = stack[-1]
-                try:
-                    child = next(children)
-                    if (
-                        stop_object is not None
-                        and stop_object.hexsha == parent.hexsha
-                    ):
-                        continue
-
-                    if preserve_tags:
-                        # If we are preserving tags, break the chain once we find one
-                        if parent.hexsha in tagged_hexshas:
-                            break
-                    yield parent, child
-                    if child.hexsha not in visited:
-                        visited.add(child.hexsha)
-                        if depth_now > 1:
-                            stack.append(
-                                (child, depth_now - 1, neighbors(child))
-                            )
-                except StopIteration:
-                    stack.pop()
-
-    source = head
-    edges = list(git_dfs_edges(source))
+    repo = head.repo
+    commit_graph = CommitGraph.load(
+        repo,
+        head,
+        oldest_commit=oldest_commit or None,
+        preserve_tags=preserve_tags,
+        with_metadata=False,
+    )
 
     import networkx as nx
 
     graph = nx.DiGraph()
-    for e1, e2 in edges:
-        graph.add_node(e1.hexsha, commit=e1)
-        graph.add_node(e2.hexsha, commit=e2)
-        graph.add_edge(e1.hexsha, e2.hexsha)
+    graph.add_edges_from(
+        (commit_graph.hexsha(u), commit_graph.hexsha(v))
+        for u, v in commit_graph.edges()
+    )
 
     if 0:
         nx.set_node_attributes(graph, values='', name='label')
@@ -533,10 +464,14 @@ def find_chain(
         >>> repo = git.Repo(repo_dpath)
         >>> chain = find_chain(repo.head.commit)
     """
-    chain = []
-    commit = head
+    import git
+    from git.objects.util import utctz_to_altz
 
+    from git_well.objects import CommitInfo, object_reader
+
+    chain = []
     repo = head.repo
+    objects = object_reader(repo)
 
     if oldest_commit is not None:
         stop_object = repo.commit(oldest_commit)
@@ -546,15 +481,25 @@ def find_chain(
     if preserve_tags:
         tags = head.repo.tags
         if isinstance(preserve_tags, (set, list, tuple)):
-            tags = {tag for tag in tags if tag.name in preserve_tags}
-        tagged_hexshas = {tag.commit.hexsha for tag in tags}
+            tags = [tag for tag in tags if tag.name in preserve_tags]
+        # Peel every tag in one pipelined request
+        tag_infos = objects.info_many(f'{tag.path}^{{commit}}' for tag in tags)
+        tagged_hexshas = {info.hexsha for info in tag_infos if info is not None}
     else:
         tagged_hexshas = set()
 
-    while len(commit.parents) <= 1:
-        if authors is not None and commit.author.name not in authors:
+    hexsha = head.hexsha
+    while True:
+        result = objects.read(hexsha)
+        if result is None:
+            raise KeyError(f'no commit named {hexsha!r}')
+        data = result[1]
+        info = CommitInfo.from_bytes(hexsha, data)
+        if len(info.parents) > 1:
+            break
+        if authors is not None and info.author_name not in authors:
             break
-        if len(commit.parents) == 0:
+        if len(info.parents) == 0:
             # Hmm it seems that including the initial commit in a chain causes
             # problems, issue a warning
             warnings.warn(
@@ -574,20 +519,32 @@ def find_chain(
             break
 
         if stop_object is not None:
-            if stop_object == commit:
+            if stop_object.hexsha == hexsha:
                 print('Stop chain at stop_object = {!r}'.format(stop_object))
                 break
 
         if preserve_tags:
             # If we are preserving tags, break the chain once we find one
-            if commit.hexsha in tagged_hexshas:
+            if hexsha in tagged_hexshas:
                 break
 
+        # Populate the GitPython commit from the data we already read so later
+        # attribute access does not go back to the object database.
+        commit = git.Commit(
+            repo,
+            bytes.fromhex(hexsha),
+            tree=git.Tree(repo, bytes.fromhex(info.tree)),
+            author=git.Actor(info.author_name, info.author_email),
+            authored_date=info.author_time,
+            author_tz_offset=utctz_to_altz(info.author_tz),
+            committer=git.Actor(info.committer_name, info.committer_email),
+            committed_date=info.committer_time,
+            committer_tz_offset=utctz_to_altz(info.committer_tz),
+            message=info.message,
+            parents=[git.Commit(repo, bytes.fromhex(p)) for p in info.parents],
+        )
         chain.append(commit)
-        if len(commit.parents) > 0:
-            commit = commit.parents[0]
-        else:
-            break
+        hexsha = info.parents[0]
 
     return chain
 
@@ -597,11 +554,18 @@ def find_streaks(
     authors: set[str] | None = None,
     timedelta: float | str = 'sameday',
     pattern: str | None = None,
+    verbose: bool = False,
+    cache: bool = True,
 ) -> list[Streak]:
     """
     Given a chain, finds subchains (called streaks) that have the same author
     and are within a timedelta threshold of each other.
 
+    The metadata of the chain comes from the repository's
+    :class:`git_well.commit_cache.CommitCache`, which only reads commits it
+    has not seen before, and the streak boundaries are computed on those
+    columns by :func:`streak_spans`.
+
     Args:
         chain (List[Commit]): from `find_chain`
         authors (set): valid authors
@@ -610,130 +574,159 @@ def find_streaks(
         pattern (str): instead of squashing messages with the same name, squash
             only if they match this pattern Defaults to None, None means
             the consecutive messages should match.
+        verbose (bool): if True, print a line for every commit
+        cache (bool): if False, read the metadata with ``git rev-list``
+            instead of the commit cache, which writes to the ``.git``
+            directory. Dry runs use this.
+
+    Example:
+        >>> from git_well.git_squash_streaks import *  # NOQA
+        >>> from git_well.repo import Repo
+        >>> repo = Repo.demo()
+        >>> for idx in range(3):
+        >>>     repo.cmd(f'git commit --allow-empty -m wip')
+        >>> chain = find_chain(repo.head.commit, preserve_tags=False)
+        >>> streaks = find_streaks(chain, timedelta='alltime')
+        >>> streak = streaks[0]
+        >>> assert len(streak) >= 3 and streak.child is None
+        >>> assert streak.stop == repo.head.commit
     """
-    import re
+    from git_well.commit_cache import commit_cache
+    from git_well.commit_graph import CommitGraph
 
     if len(chain) == 0:
         raise ValueError('No continuous commits exist')
 
-    if timedelta is None:
-        timedelta = 'none'
+    repo = chain[0].repo
+    graph = CommitGraph.from_commits(
+        repo,
+        [c.hexsha for c in chain],
+        cache=commit_cache(repo) if cache else None,
+    )
+    spans = streak_spans(
+        graph, authors=authors, timedelta=timedelta, pattern=pattern
+    )
 
-    def matches_time(streak: Streak, commit: Any) -> bool:
-        if timedelta == 'alltime' or str(timedelta).lower() == 'none':
-            return True
-        elif timedelta is not None:
-            # only continue on streaks within the timedelta
-            datetime1 = streak.stop.authored_datetime
-            datetime2 = commit.authored_datetime
-            if timedelta == 'sameday':
-                date1 = datetime1.date()
-                date2 = datetime2.date()
-                if date1 == date2:
-                    return True
-            elif isinstance(timedelta, (int, float)):
-                if abs(datetime2 - datetime1).total_seconds() < float(
-                    timedelta
-                ):
-                    return True
-            else:
-                raise ValueError('timedelta = {!r}'.format(timedelta))
-        else:
-            raise ValueError('timedelta = {!r}'.format(timedelta))
-        return False
+    if verbose:
+        status = ['no streak'] * len(chain)
+        for start, stop in spans:
+            for index in range(start, stop):
+                status[index] = f'in streak {chain[start].hexsha[:8]}'
+        for commit, text in zip(chain, status):
+            print(f'CHECK commit.message = {commit.message!r}, {commit!r}')
+            color = 'red' if text == 'no streak' else 'green'
+            print(ub.color_text(f'... {text}', color))
 
-    def matches_message(streak: Streak, commit: Any) -> bool:
-        if pattern is None:
-            flag = streak.start.message == commit.message
-            # flag |= streak.start.message.strip() == commit.message.strip()
-        else:
-            flag = re.match(pattern, commit.message) is not None
-        return flag
+    streaks = []
+    for start, stop in spans:
+        child = chain[start - 1] if start > 0 else None
+        streaks.append(Streak(child, list(chain[start:stop])))
+    return streaks
 
-    def continues_streak(streak: Streak, commit: Any) -> bool:
-        if authors is not None:
-            if commit.author.name not in authors:
-                return False
 
-        if len(commit.parents) > 1:
-            return False
+def streak_spans(
+    graph: Any,
+    authors: set[str] | None = None,
+    timedelta: float | str = 'sameday',
+    pattern: str | None = None,
+) -> list[tuple[int, int]]:
+    """
+    Find streaks on the metadata columns of a chain.
 
-        if len(streak) == 0:
-            return True
+    Row ``i + 1`` of ``graph`` must be the parent of row ``i`` (the chain is
+    newest first). A streak starts at any commit and is continued by the next
+    older commit if that commit is by a valid author, is not a merge, has a
+    matching message (the same message as its child, or one matching
+    ``pattern``) and is close enough in time to the newest commit of the
+    streak. Only streaks of at least two commits are returned.
 
-        if matches_message(streak, commit):
-            if matches_time(streak, commit):
-                return True
-        return False
+    The per-commit conditions are evaluated once per author / message id,
+    which makes this linear in the chain length with a small constant.
 
-    LEN_THRESH = 2
-    # Find contiguous streaks
-    streaks = []
+    Args:
+        graph (CommitGraph): chain metadata, e.g. from
+            :func:`CommitGraph.from_commits`
 
-    # New fixed logic, with lookahead, much easier to follow.
-    prev = None
-    streak = None
+    Returns:
+        List[Tuple[int, int]]: half-open ``[start, stop)`` row ranges
 
-    # Look at each commit and its successor
-    for commit, next_commit in ub.iter_window(it.chain(chain, [None]), size=2):
-        if commit is None:
-            continue
-        print(
-            'CHECK commit.message = {!r}, {!r}'.format(commit.message, commit)
-        )
-        if streak is None:
-            streak = Streak(prev, [])
-            streak.append(commit)
-            if next_commit is not None and continues_streak(
-                streak, next_commit
-            ):
-                # If the next commit will start a streak, then initialize
-                print(
-                    ub.color_text(
-                        '... new candidate streak, len={}'.format(len(streak)),
-                        'yellow',
-                    )
-                )
-            else:
-                # Don't even bother unless we will start a streak
-                print(ub.color_text('... no streak', 'red'))
-                streak = None
-        else:
-            # If we have started a streak, then this commit MUST continue
-            # the current streak because we already checked it last
-            # iteration when it was the next commit.
-            streak.append(commit)
-            print(
-                ub.color_text(
-                    '... add to streak, len={}'.format(len(streak)), 'blue'
-                )
-            )
+    Example:
+        >>> from git_well.git_squash_streaks import streak_spans
+        >>> from git_well.commit_graph import CommitGraph
+        >>> graph = CommitGraph._from_parents([[1], [2], [3], [4], []])
+        >>> graph.messages = ['wip', 'release']
+        >>> graph.message_ids.extend([0, 0, 1, 0, 0])
+        >>> graph.authors = ['joe']
+        >>> graph.author_ids.extend([0] * 5)
+        >>> graph.author_times.extend([0, 100, 200, 300, 400])
+        >>> graph.author_tz_offsets.extend([0] * 5)
+        >>> streak_spans(graph, timedelta='alltime')
+        [(0, 2), (3, 5)]
+        >>> streak_spans(graph, timedelta=50)
+        []
+        >>> streak_spans(graph, timedelta='none', pattern='w')
+        [(0, 2), (2, 5)]
+    """
+    import re
 
-            # Check if the next commit will break the streak, and either
-            # accept or reject the current streak
-            if next_commit is None or not continues_streak(streak, next_commit):
-                if len(streak) < LEN_THRESH:
-                    print(
-                        ub.color_text(
-                            '... Next commit breaks streak of len {}, reject'.format(
-                                len(streak)
-                            ),
-                            'red',
-                        )
-                    )
-                else:
-                    print(
-                        ub.color_text(
-                            '... Next commit breaks streak of len {}, accept'.format(
-                                len(streak)
-                            ),
-                            'green',
-                        )
-                    )
-                    streaks.append(streak)
-                streak = None
-        prev = commit
-    return streaks
+    num = len(graph)
+    if timedelta is None:
+        timedelta = 'none'
+    if timedelta == 'alltime' or str(timedelta).lower() == 'none':
+        max_seconds = None
+        days = None
+    elif timedelta == 'sameday':
+        max_seconds = None
+        days = graph.day_buckets()
+    elif isinstance(timedelta, (int, float)):
+        max_seconds = float(timedelta)
+        days = None
+    else:
+        raise ValueError('timedelta = {!r}'.format(timedelta))
+
+    # Per-id lookup tables of the conditions on the older commit of a link
+    if authors is None:
+        author_ok = [True] * len(graph.authors)
+    else:
+        author_ok = [name in authors for name in graph.authors]
+    if pattern is not None:
+        message_ok = [re.match(pattern, m) is not None for m in graph.messages]
+
+    author_ids = graph.author_ids
+    message_ids = graph.message_ids
+    indptr = graph.parent_indptr
+
+    # links[i] is True if commit i + 1 can continue a streak containing i,
+    # ignoring the time condition relative to the streak start.
+    links = bytearray(max(num - 1, 0))
+    for i in range(num - 1):
+        j = i + 1
+        if not author_ok[author_ids[j]] or indptr[j + 1] - indptr[j] > 1:
+            continue
+        if pattern is None:
+            if message_ids[i] != message_ids[j]:
+                continue
+        elif not message_ok[message_ids[j]]:
+            continue
+        if days is not None and days[i] != days[j]:
+            continue
+        links[i] = 1
+
+    author_times = graph.author_times
+    spans = []
+    start = None
+    for i in range(num):
+        if start is None:
+            start = i
+        continues = i + 1 < num and links[i]
+        if continues and max_seconds is not None:
+            delta = abs(author_times[i + 1] - author_times[start])
+            continues = delta < max_seconds
+        if not continues:
+            if i + 1 - start >= 2:
+                spans.append((start, i + 1))
+            start = None
+    return spans
 
 
 def checkout_temporary_branch(
@@ -847,14 +840,21 @@ def _squash_between(
     dry: bool = False,
     verbose: bool = True,
     start_inclusive: bool = True,
-) -> None:
+    head: str | None = None,
+) -> str | None:
     """
-    inplace squash between, use external function that sets up temp branches to
-    use this directly from the commandline.
-    """
-    import email.utils
+    Squash the commits between ``start`` and ``stop`` in the history of
+    ``head``.
 
-    import git
+    The new commits are written with :func:`git_well.rewrite.squash_between`,
+    so the working tree and index are never touched. If ``head`` is given,
+    no ref is moved and the caller is responsible for pointing a branch at
+    the returned commit. Otherwise the current ``HEAD`` is rewritten inplace.
+
+    Returns:
+        str | None: the rewritten head, or None for a dry run
+    """
+    from git_well.rewrite import move_ref, squash_between, squash_message
 
     if len(start.parents) > 1:
         raise AssertionError('cannot squash from a merge commit')
@@ -875,47 +875,17 @@ def _squash_between(
     if not repo.is_ancestor(ancestor_rev=start, rev=stop):
         raise AssertionError('cant handle')
 
-    # Do RFC2822
-    # ISO_8601 = '%Y-%m-%d %H:%M:%S %z'  # NOQA
-    # ts_start = start.authored_datetime.strftime(ISO_8601)
-    # ts_stop = stop.authored_datetime.strftime(ISO_8601)
-    ts_start = email.utils.format_datetime(start.authored_datetime)
-    ts_stop = email.utils.format_datetime(stop.authored_datetime)
-
-    # if ts_start.split()[0:4] == ts_stop.split()[0:4]:
-    if start.authored_datetime.date() == stop.authored_datetime.date():
-        ts_stop_short = ' '.join(ts_stop.split()[4:])
-    else:
-        ts_stop_short = ts_stop
-
     # Construct a new message
     commits = commits_between(
         repo, start, stop, start_inclusive=start_inclusive
     )
-    print(len(commits))
-    print(f'commits={commits}')
-    messages = [commit.message for commit in commits]
-    # messages = [commit.message for commit in streak._streak]
-    unique_messages = ub.unique(messages)
-    summary = '\n'.join(unique_messages)
-    if summary == 'wip\n':
-        summary = summary.strip('\n')
-
-    if False:
-        new_msg = '{} - Squashed {} commits from <{}> to <{}>\n'.format(
-            summary, len(commits), ts_start, ts_stop_short
-        )
-    else:
-        # TODO: need more options for messages
-        new_msg = '{} - Squashed {} commits'.format(
-            summary.strip(), len(commits)
-        )
+    new_msg = squash_message([commit.message for commit in commits])
 
     if verbose:
         print(' * Creating new commit with message:')
         print(new_msg)
 
-    old_head = repo.commit('HEAD')
+    old_head = repo.commit('HEAD' if head is None else head)
     if stop != old_head and not repo.is_ancestor(
         ancestor_rev=stop, rev=old_head
     ):
@@ -923,60 +893,105 @@ def _squash_between(
             'stop={} is not an ancestor of old_head={}'.format(stop, old_head)
         )
 
-    if not dry:
-        # ------------------
-        # MODIFICATION LOGIC
-        # ------------------
-        # Go back in time to the sequence stopping point
-        repo.git.reset(stop.hexsha, hard=True)
-
-        # Undo commits from the first included commit after start to stop by
-        # softly reseting to just before the that included start commit.
-        start_included = commits[-1]
-        before_start = start_included.parents[0]
-        if verbose:
+    if dry:
+        return None
+
+    # ------------------
+    # MODIFICATION LOGIC
+    # ------------------
+    if verbose:
+        print(' * creating one commit with all modifications up to <stop>')
+        if stop != old_head:
+            print(' * re-parenting the commits above <stop>')
+    new_head = squash_between(
+        repo,
+        start.hexsha,
+        stop.hexsha,
+        head=old_head.hexsha,
+        message=new_msg,
+        start_inclusive=start_inclusive,
+    )
+    if head is None:
+        # The tree of the head is unchanged, so the index and working tree
+        # are still consistent with the moved branch.
+        move_ref(repo, 'HEAD', new_head, old_head.hexsha)
+    return new_head
+
+
+def _plan_streaks(
+    repo: Any, streaks: list[Streak], start_inclusive: bool = True
+) -> list[Any]:
+    """
+    Resolve streaks into :class:`git_well.rewrite.PlannedSquash` items.
+    """
+    from git_well.rewrite import Squash, plan_squashes
+    from git_well.tracing import span
+
+    squashes = [
+        # Start is the commit further back in time
+        Squash(streak.start.hexsha, streak.stop.hexsha, None, start_inclusive)
+        for streak in streaks
+    ]
+    with span('plan_squashes', num_squashes=len(squashes)):
+        return plan_squashes(repo, squashes)
+
+
+def _rewrite_streaks(
+    repo: Any,
+    plan: list[Any],
+    head: str,
+    dry: bool = False,
+    verbose: bool = True,
+) -> str | None:
+    """
+    Apply every planned squash to the history of ``head`` in a single pass.
+
+    Returns:
+        str | None: the rewritten head, or None for a dry run
+    """
+    from git_well.rewrite import rewrite_squashes
+    from git_well.tracing import span
+
+    if verbose:
+        for item in plan:
             print(
-                ' * reseting to before <start>: {}'.format(before_start.hexsha)
+                'Squashing {} commits {}..{}'.format(
+                    len(item.members), item.start[:8], item.stop[:8]
+                )
             )
-        repo.git.reset(before_start.hexsha, soft=True)
+            print(' * Creating new commit with message:')
+            print(item.message)
+    if dry:
+        return None
+    if verbose:
+        print(' * writing {} squashed commits'.format(len(plan)))
+    with span('rewrite', num_squashes=len(plan)):
+        return rewrite_squashes(repo, plan, head=head)
 
-        # Commit the changes in a new squashed commit and presever authored date
-        if verbose:
-            print(' * creating one commit with all modifications up to <stop>')
-        repo.index.commit(new_msg, author_date=ts_stop)
 
-        # If <stop> was not the most recent commit, we need to take those back on
-        if stop != old_head:
-            # Copy commits following the end of the streak in front of our new commit
-            if verbose:
-                print(' * fixing up the head')
-            try:
-                above = stop.hexsha + '..' + old_head.hexsha
-                if 0:
-                    above_commits = commits_between(repo, stop, old_head)
-                    print(
-                        'above_commits = {}'.format(
-                            ub.urepr(above_commits, si=True)
-                        )
-                    )
-                    print('above = {!r}'.format(above))
-
-                if EXPERIMENTAL_REBASE:
-                    # above = streak.child.hexsha + '..' + old_head
-                    # git rebase --onto master topicA topicB
-                    # git rebase --onto <current> <stop> <old_head>
-                    repo.git.rebase(
-                        stop, old_head, preserve_merges=True, onto='HEAD'
-                    )
-                else:
-                    # Fixme, do this with rebase to preserve merges?
-                    repo.git.cherry_pick(above, allow_empty=True)
-            except git.GitCommandError:
-                print('ERROR: need to roll back')
-                raise
-        else:
-            if verbose:
-                print(' * already at the head, no need to fix')
+def _finish_rewrite(
+    repo: Any,
+    orig_branch_name: str,
+    orig_head: str,
+    new_head: str,
+    inplace: bool,
+    suffix: str = '-squash-temp',
+) -> str | None:
+    """
+    Point the original branch (inplace) or a temporary branch at
+    ``new_head``.
+
+    Returns:
+        str | None: the name of the temporary branch if one was created
+    """
+    from git_well.rewrite import move_ref, temporary_branch_name
+
+    if inplace:
+        move_ref(repo, f'refs/heads/{orig_branch_name}', new_head, orig_head)
+        return None
+    temp_branchname = temporary_branch_name(orig_branch_name, suffix)
+    move_ref(repo, f'refs/heads/{temp_branchname}', new_head)
+    return temp_branchname
 
 
 def do_tags(
@@ -1046,46 +1061,38 @@ def do_tags(
     if verbose:
         print('Found {!r} streaks'.format(len(streaks)))
 
-    # Switch to a temp branch before we start working
-    if not dry:
-        temp_branchname = checkout_temporary_branch(repo, '-squash-temp')
-    else:
-        temp_branchname = None
+    # The history is rewritten in one pass without a checkout, and the branch
+    # is only moved once all streaks are written.
+    orig_head = repo.head.commit.hexsha
+    temp_branchname = None
 
     try:
-        for streak in ub.ProgIter(streaks, 'squashing', verbose=3 * verbose):
-            if verbose:
-                print('Squashing streak = %r' % (str(streak),))
-            # Start is the commit further back in time
-            _squash_between(
-                repo, streak.start, streak.stop, dry=dry, verbose=verbose
+        plan = _plan_streaks(repo, streaks, start_inclusive=False)
+        new_head = _rewrite_streaks(
+            repo, plan, orig_head, dry=dry, verbose=verbose
+        )
+        if new_head is not None:
+            temp_branchname = _finish_rewrite(
+                repo, orig_branch_name, orig_head, new_head, inplace
             )
     except Exception:
         print_exc(sys.exc_info())
         print('ERROR: squash_streaks failed.')
-        if not dry and auto_rollback:
-            print('ROLLING BACK')
-            repo.git.checkout(orig_branch_name)
-            # repo.git.branch(D=temp_branchname)
-        print('You can debug the difference with:')
-        print('    gitk {} {}'.format(orig_branch_name, temp_branchname))
+        if not dry:
+            # Branches are only moved after every streak is written, so there
+            # is nothing to roll back.
+            print('The branch {} was not modified'.format(orig_branch_name))
         return
 
     if dry:
         if verbose:
             print('Finished. did nothing')
     elif inplace:
-        # Copy temp branch back over original
-        repo.git.checkout(orig_branch_name)
-        repo.git.reset(temp_branchname, hard=True)
-        repo.git.branch(D=temp_branchname)
         if verbose:
             print(
                 'Finished. Now you should force push the branch back to the server'
             )
     else:
-        # Go back to the original branch
-        repo.git.checkout(orig_branch_name)
         if verbose:
             print('Finished')
             print('The squashed branch is: {}'.format(temp_branchname))
@@ -1095,6 +1102,101 @@ def do_tags(
             print('Or, to automatically accept changes run with --inplace')
 
 
+WATERMARK_PREFIX = 'refs/git-well/squash-watermark/'
+
+
+def _watermark_cut(
+    repo: Any, branch_name: str, head: str, verbose: bool = True
+) -> str | None:
+    """
+    The ``oldest_commit`` for an incremental run, or None for a full scan.
+
+    The watermark commit itself is kept in the analyzed range, so new
+    commits can still join a streak that ends at the watermark.
+    """
+    from git_well.objects import object_reader
+
+    objects = object_reader(repo)
+    info = objects.info(f'{WATERMARK_PREFIX}{branch_name}^{{commit}}')
+    if info is None:
+        return None
+    mark = info.hexsha
+    if mark != head and not repo.is_ancestor(ancestor_rev=mark, rev=head):
+        if verbose:
+            print('Ignoring the squash watermark, the branch was rewritten')
+        return None
+    parents = objects.read_commit(mark).parents
+    if not parents:
+        return None
+    if verbose:
+        print('Only analyzing commits after the squash watermark', mark)
+    return parents[0]
+
+
+def _write_watermark(repo: Any, branch_name: str, hexsha: str) -> None:
+    ref = WATERMARK_PREFIX + branch_name
+    repo.git.update_ref('-m', 'git-well: squash watermark', ref, hexsha)
+
+
+def _find_squash_streaks(
+    repo: Any,
+    authors: set[str] | None,
+    timedelta: str | int | float,
+    pattern: str | None,
+    verbose: bool,
+    custom_streak: tuple[Any, Any] | None,
+    preserve_tags: bool,
+    oldest_commit: str | None,
+    pseudo_chain: bool,
+    dry: bool = False,
+) -> list[Streak]:
+    """
+    The analysis part of :func:`squash_streaks`.
+    """
+    head = repo.commit('HEAD')
+
+    if custom_streak:
+        print('custom_streak = {!r}'.format(custom_streak))
+        print('Forcing hacked steak')
+
+        assert len(custom_streak) == 2
+        a = repo.commit(custom_streak[0])
+        b = repo.commit(custom_streak[1])
+        if repo.is_ancestor(ancestor_rev=a, rev=b):
+            a, b = b, a
+        # assert repo.is_ancestor(ancestor_rev=b, rev=a)
+        return [Streak(a, _streak=[a, b])]
+
+    from git_well.tracing import span
+
+    if pseudo_chain or EXPERIMENTAL_PSEUDO_CHAIN:
+        with span('find_pseudo_chain'):
+            chain = find_pseudo_chain(
+                head, preserve_tags=preserve_tags, oldest_commit=oldest_commit
+            )
+    else:
+        with span('find_chain'):
+            chain = find_chain(
+                head,
+                authors=authors,
+                preserve_tags=preserve_tags,
+                oldest_commit=oldest_commit,
+            )
+
+    if verbose:
+        print('Found chain of length {!r}'.format(len(chain)))
+
+    with span('find_streaks', chain_length=len(chain)):
+        return find_streaks(
+            chain,
+            authors=authors,
+            timedelta=timedelta,
+            pattern=pattern,
+            verbose=verbose,
+            cache=not dry,
+        )
+
+
 def squash_streaks(
     authors: set[str],
     timedelta: str | int | float = 'sameday',
@@ -1106,6 +1208,10 @@ def squash_streaks(
     custom_streak: tuple[Any, Any] | None = None,
     preserve_tags: bool = True,
     oldest_commit: str | None = None,
+    pseudo_chain: bool = False,
+    plan_out: str | os.PathLike[str] | None = None,
+    apply_plan: str | os.PathLike[str] | None = None,
+    watermark: bool = True,
 ) -> None:
     """
     Squashes consecutive commits that meet a specified criteiron.
@@ -1128,8 +1234,8 @@ def squash_streaks(
             manually reset the current branch to this branch and delete the
             temp branch. (Default: False)
 
-        auto_rollback (bool): if True the repo will be reset to a clean state
-            if any errors occur. (Default: True)
+        auto_rollback (bool): ignored. Branches are only moved after every
+            streak was squashed, so a failure leaves the repo untouched.
 
         dry (bool): if True this only executes a dry run, that prints the
             chains that would be squashed (Default: False)
@@ -1145,9 +1251,31 @@ def squash_streaks(
 
         oldest_commit (str | None): if specified we will only squash
             commits toplogically after this commit in the graph.
+
+        pseudo_chain (bool): experimental, search for streaks along
+            :func:`find_pseudo_chain`, which steps over merge bubbles. The
+            history is rewritten as a graph, so merges are kept.
+
+        plan_out (PathLike | None): write the resolved streaks to this JSON
+            file, so they can be reviewed and applied with ``apply_plan``
+            without repeating the analysis. Usually combined with ``dry``.
+
+        apply_plan (PathLike | None): skip the analysis and squash the
+            streaks of a plan written with ``plan_out``. Fails with
+            :class:`git_well.rewrite.StalePlanError` if the branch moved or
+            a streak no longer resolves to the same commits and tree.
+
+        watermark (bool): after a successful squash, record the new head in
+            ``refs/git-well/squash-watermark/<branch>``. Later runs without
+            ``oldest_commit`` only analyze the commits after the watermark
+            (and the watermark commit itself, so a streak that continues it
+            is still found). Without ``inplace`` the watermark takes effect
+            once the branch is moved to the squashed history.
     """
     import git
 
+    from git_well.rewrite import RewritePlan, StalePlanError
+
     if verbose:
         if dry:
             print('squashing streaks (DRY RUN)')
@@ -1168,81 +1296,86 @@ def squash_streaks(
 
     repo = git.Repo(repodir)
     orig_branch_name = repo.active_branch.name
-
-    head = repo.commit('HEAD')
-
-    if custom_streak:
-        print('custom_streak = {!r}'.format(custom_streak))
-        print('Forcing hacked steak')
-
-        assert len(custom_streak) == 2
-        a = repo.commit(custom_streak[0])
-        b = repo.commit(custom_streak[1])
-        if repo.is_ancestor(ancestor_rev=a, rev=b):
-            a, b = b, a
-        # assert repo.is_ancestor(ancestor_rev=b, rev=a)
-        streaks = [Streak(a, _streak=[a, b])]
-    else:
-        if EXPERIMENTAL_PSEUDO_CHAIN:
-            chain = find_pseudo_chain(
-                head, preserve_tags=preserve_tags, oldest_commit=oldest_commit
-            )
-        else:
-            chain = find_chain(
-                head,
-                authors=authors,
-                preserve_tags=preserve_tags,
-                oldest_commit=oldest_commit,
+    orig_head = repo.head.commit.hexsha
+
+    if apply_plan is not None:
+        # The analysis was done and reviewed already, only check that the
+        # plan still matches the repository.
+        rewrite_plan = RewritePlan.load(apply_plan)
+        if rewrite_plan.branch != orig_branch_name:
+            raise StalePlanError(
+                'the plan is for branch {!r}, but {!r} is checked out'.format(
+                    rewrite_plan.branch, orig_branch_name
+                )
             )
-
+        plan = rewrite_plan.resolve(repo)
         if verbose:
-            print('Found chain of length {!r}'.format(len(chain)))
-
-        streaks = find_streaks(
-            chain, authors=authors, timedelta=timedelta, pattern=pattern
+            print('Loaded a plan with %r streaks' % (len(plan)))
+    else:
+        if watermark and oldest_commit is None and not custom_streak:
+            oldest_commit = _watermark_cut(
+                repo, orig_branch_name, orig_head, verbose=verbose
+            )
+        streaks = _find_squash_streaks(
+            repo,
+            authors=authors,
+            timedelta=timedelta,
+            pattern=pattern,
+            verbose=verbose,
+            custom_streak=custom_streak,
+            preserve_tags=preserve_tags,
+            oldest_commit=oldest_commit,
+            pseudo_chain=pseudo_chain,
+            dry=dry,
         )
-    if verbose:
-        print('Found %r streaks' % (len(streaks)))
+        if verbose:
+            print('Found %r streaks' % (len(streaks)))
+        plan = _plan_streaks(repo, streaks)
+        if plan_out is not None:
+            RewritePlan(orig_head, orig_branch_name, tuple(plan)).dump(plan_out)
+            if verbose:
+                print('Wrote the squash plan to {}'.format(plan_out))
 
-    # Switch to a temp branch before we start working
-    if not dry:
-        temp_branchname = checkout_temporary_branch(repo, '-squash-temp')
-    else:
-        temp_branchname = None
+    # The history is rewritten in one pass without a checkout, and the branch
+    # is only moved once all streaks are written.
+    temp_branchname = None
 
     try:
-        for streak in ub.ProgIter(streaks, 'squashing', verbose=3 * verbose):
-            if verbose:
-                print('Squashing streak = %r' % (str(streak),))
-            # Start is the commit further back in time
-            _squash_between(
-                repo, streak.start, streak.stop, dry=dry, verbose=verbose
+        new_head = _rewrite_streaks(
+            repo, plan, orig_head, dry=dry, verbose=verbose
+        )
+        if new_head is not None:
+            temp_branchname = _finish_rewrite(
+                repo, orig_branch_name, orig_head, new_head, inplace
             )
     except Exception:
         print_exc(sys.exc_info())
         print('ERROR: squash_streaks failed.')
-        if not dry and auto_rollback:
-            print('ROLLING BACK')
-            repo.git.checkout(orig_branch_name)
-        print('You can debug the difference with:')
-        print('    gitk {} {}'.format(orig_branch_name, temp_branchname))
+        if not dry:
+            # Branches are only moved after every streak is written, so there
+            # is nothing to roll back.
+            print('The branch {} was not modified'.format(orig_branch_name))
         return
 
+    if watermark and new_head is not None:
+        # The watermark belongs to the original branch even when the result
+        # is on a temporary branch. It is only used once the original branch
+        # contains it, i.e. after the squashed history has been accepted.
+        try:
+            _write_watermark(repo, orig_branch_name, new_head)
+        except Exception:
+            print_exc(sys.exc_info())
+            print('WARNING: the squash watermark could not be recorded')
+
     if dry:
         if verbose:
             print('Finished. did nothing')
     elif inplace:
-        # Copy temp branch back over original
-        repo.git.checkout(orig_branch_name)
-        repo.git.reset(temp_branchname, hard=True)
-        repo.git.branch(D=temp_branchname)
         if verbose:
             print(
                 'Finished. Now you should force push the branch back to the server'
             )
     else:
-        # Go back to the original branch
-        repo.git.checkout(orig_branch_name)
         if verbose:
             print('Finished')
             print('The squashed branch is: {}'.format(temp_branchname))
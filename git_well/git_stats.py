@@ -74,33 +74,46 @@ def commit_stats(repo):
         ...
 
 
-def author_stats(repo):
-    log_info = repo.cmd("git log --format='author: %ae' --numstat")
-    log_info = repo.cmd(
-        "git log --since='1 year ago' --format='author: %ae' --numstat"
-    )
-    print(log_info.stdout)
+def author_stats(repo, since='1 year ago'):
+    """
+    Print per-author commit counts and line changes since a date.
+
+    Commit metadata and ``--numstat`` totals come from the repository's
+    :class:`git_well.commit_cache.CommitCache`, so only commits that were
+    never analyzed before are read from git.
+
+    Example:
+        >>> from git_well.git_stats import *  # NOQA
+        >>> from git_well.repo import Repo
+        >>> repo = Repo.demo()
+        >>> stats = author_stats(repo)
+        >>> assert sum(s['commits'] for s in stats.values()) == len(
+        >>>     list(repo.iter_commits(since='1 year ago')))
+    """
+    from git_well.commit_cache import commit_cache
+    from git_well.tracing import span
+
+    hexshas = repo.git.rev_list(f'--since={since}', 'HEAD').split()
+    cache = commit_cache(repo)
+    with span('read commits', num_commits=len(hexshas)):
+        infos = cache.get_many(hexshas)
+    with span('numstat', num_commits=len(hexshas)):
+        numstats = cache.numstat_files(hexshas)
+
     author_stats = ub.ddict(lambda: ub.ddict(int))
     author_files = ub.ddict(set)
-    author = None
-    for line in log_info.stdout.split('\n'):
-        line_ = line.strip()
-        if line_:
-            if line.startswith('author: '):
-                author = line.split(' ')[1]
-                author_stats[author]['commits'] += 1
-            else:
-                inserts, deletes, fpath = line.split('\t')
-                inserts = int(0 if inserts == '-' else inserts)
-                deletes = int(0 if deletes == '-' else deletes)
-                total = inserts + deletes
-                author_stats[author]['inserts'] += inserts
-                author_stats[author]['deletes'] += deletes
-                author_stats[author]['total'] += total
-                author_files[author].add(fpath)
+    for info in infos:
+        author = info.author_email
+        author_stats[author]['commits'] += 1
+        for fpath, inserts, deletes in numstats[info.hexsha]:
+            author_stats[author]['inserts'] += inserts
+            author_stats[author]['deletes'] += deletes
+            author_stats[author]['total'] += inserts + deletes
+            author_files[author].add(fpath)
 
     author_stats = ub.udict(author_stats).sorted_values(lambda v: v['commits'])
     _rich_print_author_stats(author_stats, author_files)
+    return author_stats
 
 
 __cli__ = GitStatsCLI
@@ -107,21 +107,43 @@ class TrackUpstreamCLI(kwconf.Config):
 
 
 def unique_remotes_with_branch(repo: Any, branch: Any) -> list[dict[str, Any]]:
-    available_remotes = repo.remotes
-    remote_infos = {}
-    for remote in available_remotes:
-        valid_refs = []
-        for ref in remote.refs:
-            if ref.name[len(ref.remote_name) :].lstrip('/') == branch.name:
-                valid_refs.append(ref)
-        if not valid_refs:
+    """
+    Example:
+        >>> from git_well.git_track_upstream import unique_remotes_with_branch
+        >>> from git_well.repo import Repo
+        >>> repo = Repo.demo()
+        >>> repo.cmd('git remote add origin https://example.com/repo.git')
+        >>> repo.cmd('git remote add mirror https://example.com/repo.git')
+        >>> repo.cmd('git remote add fork https://example.com/fork.git')
+        >>> for remote in ['origin', 'mirror', 'fork']:
+        >>>     repo.cmd(f'git update-ref refs/remotes/{remote}/main HEAD')
+        >>> infos = unique_remotes_with_branch(repo, repo.active_branch)
+        >>> sorted(d['name'] for d in infos)
+        ['fork', 'origin']
+    """
+    import git
+
+    from git_well.refs import RefSnapshot
+
+    snapshot = RefSnapshot.from_repo(repo)
+
+    remotes = {remote.name: remote for remote in repo.remotes}
+    remote_infos: dict[str, dict[str, Any]] = {}
+    for ref in snapshot.select('remote', name=branch.name):
+        remote_name = ref.remote
+        if remote_name is None or remote_name not in remotes:
             continue
-        info = {'remote': remote, 'name': remote.name, 'valid_refs': valid_refs}
-        remote_infos[remote.name] = info
-        ref_urls = tuple(
-            sorted(set(ub.flatten(list(remote.urls) for ref in remote.refs)))
+        remote = remotes[remote_name]
+        if remote_name not in remote_infos:
+            remote_infos[remote_name] = {
+                'remote': remote,
+                'name': remote.name,
+                'valid_refs': [],
+                'ref_urls': tuple(sorted(set(remote.urls))),
+            }
+        remote_infos[remote_name]['valid_refs'].append(
+            git.RemoteReference(repo, ref.refname)
         )
-        info['ref_urls'] = ref_urls
 
     groups = ub.group_items(remote_infos.values(), key=lambda x: x['ref_urls'])
     unique_infos = []
@@ -235,25 +235,16 @@ def _tracked_path(
 
 def _git_toplevel(start: os.PathLike | str) -> Path | None:
     """Return the enclosing git worktree root, or None outside git."""
-    info = ub.cmd(['git', 'rev-parse', '--show-toplevel'], cwd=start, verbose=0)
-    if info.returncode:
-        return None
-    toplevel = _cmd_stdout_text(info.stdout).strip()
-    if not toplevel:
-        return None
-    return Path(toplevel)
+    from git_well._utils import git_toplevel
+
+    return git_toplevel(start)
 
 
 def _git_search_dir(path: os.PathLike | str) -> Path:
     """Return an existing directory suitable as a git command cwd."""
-    path = Path(path)
-    if path.exists() and path.is_dir():
-        search_dir = path
-    else:
-        search_dir = path.parent
-    while not search_dir.exists() and search_dir != search_dir.parent:
-        search_dir = search_dir.parent
-    return search_dir
+    from git_well._utils import _existing_dir
+
+    return Path(_existing_dir(path))
 
 
 def _git_origin_url(repo_root: os.PathLike | str) -> str | None:
@@ -643,11 +634,32 @@ def _build_rehash_argv(tracked_path: Path, add_config: dict[str, Any]) -> list[s
     return argv
 
 
-def _ipfs_only_hash_cid(tracked_path: Path, add_config: dict[str, Any] | None = None) -> str:
-    """Recompute a CID using kubo without writing blocks."""
-    argv = _build_rehash_argv(tracked_path, add_config or {})
-    info = _run(argv, verbose=0)
-    return _parse_ipfs_add_root_cid(info.stdout)
+def _ipfs_only_hash_cids(
+    items: list[tuple[Path, dict[str, Any] | None]],
+) -> list[str | Exception]:
+    """
+    Recompute several CIDs concurrently.
+
+    Returns one CID, or the exception that prevented computing it, per item.
+    """
+    from git_well.jobs import Job, run_jobs
+
+    # Without a running daemon every ipfs command takes the repo lock
+    ipfs_dpath = Path(os.environ.get('IPFS_PATH', Path.home() / '.ipfs'))
+    resources = () if (ipfs_dpath / 'api').exists() else ('ipfs:repo',)
+    jobs = [
+        Job(_build_rehash_argv(tracked_path, add_config or {}),
+            resources=resources)
+        for tracked_path, add_config in items
+    ]
+    cids: list[str | Exception] = []
+    for info in run_jobs(jobs):
+        try:
+            info.check_returncode()
+            cids.append(_parse_ipfs_add_root_cid(info.stdout))
+        except Exception as ex:
+            cids.append(ex)
+    return cids
 
 
 def _compute_quickstat(tracked_path: os.PathLike | str) -> dict[str, Any] | None:
@@ -882,13 +894,31 @@ class IPFSStatus(kwconf.Config):
     def main(cls, argv=1, **kwargs):
         argv = kwargs.pop('cmdline', argv)
         config = cls.cli(argv=argv, data=kwargs, strict=True)
-        sidecars = _find_sidecars(config.path, recursive=config.recursive)
-        rows: list[dict[str, Any]] = []
+        from git_well.tracing import span
+
+        with span('scan sidecars'):
+            sidecars = _find_sidecars(config.path, recursive=config.recursive)
+        entries = []
         for sidecar_fpath in sidecars:
             meta = _read_sidecar(sidecar_fpath)
-            root_cid = meta.get('cid')
             tracked_path = _tracked_path(sidecar_fpath, meta)
-            cur_quick = _compute_quickstat(tracked_path)
+            entries.append(
+                (sidecar_fpath, meta, tracked_path,
+                 _compute_quickstat(tracked_path))
+            )
+        full_cids: dict[Path, str | Exception] = {}
+        if config.full:
+            to_hash = [e for e in entries if e[3] is not None]
+            full_cids = dict(zip(
+                [e[0] for e in to_hash],
+                _ipfs_only_hash_cids(
+                    [(e[2], e[1].get('add_config', {})) for e in to_hash]
+                ),
+            ))
+
+        rows: list[dict[str, Any]] = []
+        for sidecar_fpath, meta, tracked_path, cur_quick in entries:
+            root_cid = meta.get('cid')
             base_quick = meta.get(config.baseline_key)
             if cur_quick is None:
                 status = 'MISSING'
@@ -903,12 +933,13 @@ class IPFSStatus(kwconf.Config):
 
             new_cid = None
             if config.full and cur_quick is not None:
-                try:
-                    new_cid = _ipfs_only_hash_cid(tracked_path, meta.get('add_config', {}))
-                    status = 'OK' if new_cid == root_cid else 'CHANGED'
-                except Exception as ex:
-                    new_cid = f'ERROR: {ex}'
+                result = full_cids[sidecar_fpath]
+                if isinstance(result, Exception):
+                    new_cid = f'ERROR: {result}'
                     status = 'FULL_CHECK_ERROR'
+                else:
+                    new_cid = result
+                    status = 'OK' if new_cid == root_cid else 'CHANGED'
 
             if config.write_baseline and cur_quick is not None:
                 meta = dict(meta)
@@ -1133,6 +1164,10 @@ def sync_ipfs_pull(
 
 def main(argv=1, **kwargs):
     """Entry point for ``git-ipfs`` and ``python -m git_well ipfs``."""
+    if argv is True or argv == 1:
+        from git_well._completion import fast_autocomplete
+
+        fast_autocomplete(['ipfs'])
     return IPFSCLI.main(argv=argv, **kwargs)
 
 
@@ -0,0 +1,284 @@
+"""
+Run independent external commands concurrently.
+
+Many git_well commands start a batch of processes that do not depend on each
+other: ``git ls-remote`` for every remote, ``ipfs add --only-hash`` for every
+sidecar, ``git config`` reads for every key. :func:`run_jobs` runs such a
+batch on an asyncio event loop and returns the results in submission order.
+
+Concurrency is bounded twice:
+
+* globally, by :func:`get_max_jobs` (``git-well --jobs N`` or the
+  ``GIT_WELL_JOBS`` environment variable), and
+* per resource. A :class:`Job` names the resources it uses, such as
+  ``ssh:<host>`` (see :func:`ssh_resource`) or ``repo:<git dir>`` for git
+  commands that take repository locks (see :func:`repo_resource`), and at
+  most :data:`RESOURCE_LIMITS` jobs share a resource at a time.
+
+Processes started here are reported to an active
+:class:`git_well.tracing.Tracer`, each on its own lane.
+
+Example:
+    >>> from git_well.jobs import Job, run_jobs
+    >>> jobs = [Job(['git', 'var', 'GIT_EDITOR']), Job(['git', '--version'])]
+    >>> results = run_jobs(jobs, max_jobs=2)
+    >>> assert [r.argv for r in results] == [j.argv for j in jobs]
+    >>> assert results[1].stdout.startswith('git version')
+    >>> results[1].check_returncode()
+    >>> missing = run_jobs([Job(['git-well-does-not-exist'])])[0]
+    >>> assert missing.returncode == 127
+"""
+from __future__ import annotations
+
+import os
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import Any, Sequence, cast
+
+# At most this many jobs share a resource kind at once. Resources with a
+# kind that is not listed here are used by one job at a time.
+RESOURCE_LIMITS: dict[str, int] = {
+    # OpenSSH servers start dropping unauthenticated connections at 10
+    'ssh': 4,
+    # Git writes take lock files (config.lock, index.lock, refs)
+    'repo': 1,
+}
+
+_MAX_JOBS: int | None = None
+
+
+@dataclass(frozen=True)
+class Job:
+    """
+    One external command of a batch.
+
+    Attributes:
+        argv (List[str]): the command, which is not run through a shell
+        cwd (str | None): working directory
+        env (Dict[str, str] | None): the full environment, if not inherited
+        stdin (bytes | None): data written to the standard input
+        resources (Tuple[str, ...]): resources the job holds while it runs,
+            e.g. ``('ssh:github.com',)``
+    """
+
+    argv: Sequence[str]
+    cwd: str | os.PathLike[str] | None = None
+    env: dict[str, str] | None = None
+    stdin: bytes | None = None
+    resources: tuple[str, ...] = field(default=())
+
+
+@dataclass(frozen=True)
+class JobResult:
+    """
+    The outcome of a :class:`Job`.
+
+    A program that cannot be started gets ``returncode=127`` and the error
+    message as ``stderr``, as a shell would report it.
+    """
+
+    argv: list[str]
+    returncode: int
+    stdout: str
+    stderr: str
+
+    def check_returncode(self) -> None:
+        """
+        Raise :class:`subprocess.CalledProcessError` if the job failed.
+        """
+        if self.returncode:
+            raise subprocess.CalledProcessError(
+                self.returncode, self.argv, self.stdout, self.stderr
+            )
+
+
+def get_max_jobs() -> int:
+    """
+    The global limit of concurrent jobs.
+
+    The :func:`explicit_max_jobs` if there is one, otherwise sized for I/O
+    bound work like :class:`concurrent.futures.ThreadPoolExecutor`.
+    """
+    num = explicit_max_jobs()
+    if num is not None:
+        return num
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def explicit_max_jobs() -> int | None:
+    """
+    The global limit of concurrent jobs if the user chose one.
+
+    Set by :func:`set_max_jobs` (``git-well --jobs``), otherwise read from
+    ``GIT_WELL_JOBS``. Commands that only run concurrently on request use
+    this instead of :func:`get_max_jobs`.
+
+    Example:
+        >>> from git_well.jobs import explicit_max_jobs, set_max_jobs
+        >>> set_max_jobs(3)
+        >>> explicit_max_jobs()
+        3
+        >>> set_max_jobs(None)
+    """
+    if _MAX_JOBS is not None:
+        return _MAX_JOBS
+    value = os.environ.get('GIT_WELL_JOBS', '')
+    if value.strip():
+        return max(int(value), 1)
+    return None
+
+
+def set_max_jobs(num: int | None) -> None:
+    """
+    Set the global limit of concurrent jobs, or None to use the default.
+    """
+    global _MAX_JOBS
+    _MAX_JOBS = None if num is None else max(int(num), 1)
+
+
+def ssh_resource(url: str) -> str | None:
+    """
+    The resource of a remote URL that is reached over ssh.
+
+    Example:
+        >>> from git_well.jobs import ssh_resource
+        >>> ssh_resource('git@github.com:user/repo.git')
+        'ssh:github.com'
+        >>> ssh_resource('ssh://me@host:2222/srv/repo')
+        'ssh:host'
+        >>> ssh_resource('https://github.com/user/repo.git') is None
+        True
+        >>> ssh_resource('/local/path') is None
+        True
+    """
+    from git_well._utils import GitURL
+
+    try:
+        info = GitURL(url).info
+    except ValueError:
+        return None
+    if info['protocol'] in {'git', 'scp', 'ssh'} and info['host']:
+        return f'ssh:{info["host"]}'
+    return None
+
+
+def repo_resource(repo: Any) -> str:
+    """
+    The resource of git commands that write to a repository.
+    """
+    git_dir = getattr(repo, 'common_dir', None) or repo.git_dir
+    return f'repo:{os.path.realpath(git_dir)}'
+
+
+def run_jobs(
+    jobs: Sequence[Job], max_jobs: int | None = None
+) -> list[JobResult]:
+    """
+    Run a batch of jobs concurrently and return their results in order.
+
+    Args:
+        jobs (Sequence[Job]): the batch
+        max_jobs (int | None): limit of concurrent jobs, defaults to the
+            global :func:`get_max_jobs`
+
+    Returns:
+        List[JobResult]: one result per job, in the order of ``jobs``
+    """
+    import asyncio
+
+    limit = get_max_jobs() if max_jobs is None else max(max_jobs, 1)
+    jobs = list(jobs)
+    if not jobs:
+        return []
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_run_all(jobs, limit))
+    # Called from inside an event loop: use a private loop in a thread
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+    with ThreadPoolExecutor(1) as pool:
+        future = cast(
+            'Future[list[JobResult]]',
+            pool.submit(asyncio.run, _run_all(jobs, limit)),
+        )
+        return future.result()
+
+
+async def _run_all(jobs: list[Job], limit: int) -> list[JobResult]:
+    import asyncio
+
+    slots = asyncio.Semaphore(limit)
+    resources: dict[str, asyncio.Semaphore] = {}
+    free_lanes = list(range(limit, 0, -1))
+
+    async def run_one(job: Job) -> JobResult:
+        names = sorted(set(job.resources))
+        for name in names:
+            if name not in resources:
+                kind = name.partition(':')[0]
+                num = RESOURCE_LIMITS.get(kind, 1)
+                resources[name] = asyncio.Semaphore(num)
+        # Resources are taken in sorted order, before a global slot, so jobs
+        # waiting on a busy resource do not hold slots other jobs could use.
+        for name in names:
+            await resources[name].acquire()
+        try:
+            async with slots:
+                lane = free_lanes.pop()
+                try:
+                    return await _run_one(job, lane)
+                finally:
+                    free_lanes.append(lane)
+        finally:
+            for name in names:
+                resources[name].release()
+
+    return list(await asyncio.gather(*(run_one(job) for job in jobs)))
+
+
+async def _run_one(job: Job, lane: int) -> JobResult:
+    import asyncio
+
+    from git_well import tracing
+
+    argv = [os.fspath(arg) for arg in job.argv]
+    cwd = None if job.cwd is None else os.fspath(job.cwd)
+    start = time.perf_counter()
+    try:
+        with tracing.untraced_popen():
+            proc = await asyncio.create_subprocess_exec(
+                *argv,
+                cwd=cwd,
+                env=job.env,
+                stdin=(
+                    subprocess.DEVNULL if job.stdin is None
+                    else subprocess.PIPE
+                ),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+    except OSError as ex:
+        return JobResult(argv, 127, '', str(ex))
+    stdout, stderr = await proc.communicate(job.stdin)
+    returncode = proc.returncode
+    assert returncode is not None
+    tracer = tracing.active_tracer()
+    if tracer is not None:
+        tracer.add_process(
+            argv,
+            cwd,
+            start,
+            time.perf_counter(),
+            returncode,
+            stdout_bytes=len(stdout),
+            stderr_bytes=len(stderr),
+            tid=lane,
+        )
+    return JobResult(
+        argv,
+        returncode,
+        stdout.decode('utf-8', errors='replace'),
+        stderr.decode('utf-8', errors='replace'),
+    )
@@ -2,33 +2,408 @@
 # PYTHON_ARGCOMPLETE_OK
 from __future__ import annotations
 
+import functools
+import os
+from dataclasses import dataclass
+from typing import Any, Sequence
+
 import kwconf
 
 
+@dataclass(frozen=True)
+class LazySubcommand:
+    """
+    Static registration of a ``git-well`` subcommand.
+
+    The module named by ``import_path`` is only imported when the command is
+    actually selected, so ``help`` must carry the one-line description that
+    ``git-well --help`` shows without loading the module.
+
+    Example:
+        >>> from git_well.main import LazySubcommand
+        >>> spec = LazySubcommand('url', 'git_well.git_url_components:__cli__',
+        >>>                       'Access components of a git URL.')
+        >>> cli_cls = spec.load()
+        >>> assert cli_cls.__command__ == 'url'
+        >>> assert spec.names == {'url'}
+    """
+
+    command: str
+    import_path: str
+    help: str
+    alias: tuple[str, ...] = ()
+    # If True, the command parses everything that follows its name itself,
+    # e.g. to forward the options of another command.
+    passthrough: bool = False
+
+    @property
+    def names(self) -> set[str]:
+        """
+        All spellings that select this command, including the fuzzy hyphen
+        variants kwconf registers for underscored names.
+        """
+        names = {self.command, *self.alias}
+        return names | {n.replace('_', '-') for n in names}
+
+    def load(self) -> type[kwconf.Config] | type[kwconf.ModalCLI]:
+        """
+        Import and return the real CLI class, a config or a modal CLI.
+        """
+        import importlib
+
+        module_name, _, attr = self.import_path.partition(':')
+        module = importlib.import_module(module_name)
+        cli_cls: type[kwconf.Config] | type[kwconf.ModalCLI] = getattr(
+            module, attr or '__cli__'
+        )
+        return cli_cls
+
+    def placeholder(self) -> type:
+        """
+        Build an option-less stand-in that only carries the help text.
+
+        Placeholders are used to list unselected commands in ``--help`` and
+        defer to the real CLI if they are ever invoked directly.
+        """
+        spec = self
+
+        def main(cls, argv: Any = True, **kwargs: Any) -> Any:
+            return spec.load().main(argv=argv, **kwargs)
+
+        namespace = {
+            '__doc__': self.help,
+            '__command__': self.command,
+            '__alias__': list(self.alias),
+            '__module__': __name__,
+            'main': classmethod(main),
+        }
+        return type(f'Lazy_{self.command}', (kwconf.Config,), namespace)
+
+
+# When adding a new top-level CLI, need to update:
+# ~/code/git_well/pyproject.toml
+# The help text must match the first line of the command's description, which
+# is checked by ``tests/test_cli.py``.
+SUBCOMMANDS: list[LazySubcommand] = [
+    LazySubcommand(
+        'squash_streaks',
+        'git_well.git_squash_streaks:__cli__',
+        'Squashes consecutive commits that meet a specified criteiron.',
+    ),
+    LazySubcommand(
+        'squash',
+        'git_well.git_squash:__cli__',
+        'Squash all commits between two points (usually main and HEAD).',
+    ),
+    LazySubcommand(
+        'branch_upgrade',
+        'git_well.git_branch_upgrade:__cli__',
+        'Upgrade to the latest "dev" branch.',
+    ),
+    LazySubcommand(
+        'sync',
+        'git_well.git_sync:__cli__',
+        'Sync a git repo with a remote server via ssh',
+    ),
+    LazySubcommand(
+        'branch_cleanup',
+        'git_well.git_branch_cleanup:__cli__',
+        'Cleanup branches that have been merged into main.',
+    ),
+    LazySubcommand(
+        'track_upstream',
+        'git_well.git_track_upstream:__cli__',
+        'Set the branch upstream with sensible defaults if possible.',
+    ),
+    LazySubcommand(
+        'rebase_add_continue',
+        'git_well.git_rebase_add_continue:__cli__',
+        'A single step to make rebasing easier.',
+    ),
+    LazySubcommand(
+        'remote_protocol',
+        'git_well.git_remote_protocol:__cli__',
+        'Change the protocol for all remotes that match a specific user / group.',
+        alias=('permit',),
+    ),
+    LazySubcommand(
+        'discover_remote',
+        'git_well.git_discover_remote:__cli__',
+        'Attempt to discover a ssh remote based on an ssh host.',
+    ),
+    LazySubcommand(
+        'autoconf-gpg',
+        'git_well.git_autoconf_gpgsign:__cli__',
+        'Configure commit signing with the GPG key that matches a remote.',
+    ),
+    LazySubcommand(
+        'url',
+        'git_well.git_url_components:__cli__',
+        'Access components of a git URL.',
+    ),
+    LazySubcommand(
+        'archive_source',
+        'git_well.git_archive_source:__cli__',
+        'Archive committed source with full Git history and initialized submodules.',
+    ),
+    LazySubcommand(
+        'ipfs',
+        'git_well.ipfs:__cli__',
+        'Utilities for git-tracked IPFS sidecar files.',
+    ),
+    LazySubcommand(
+        'patchdir',
+        'git_well.patchdir.patchdir_modal:__cli__',
+        'Subcommands for handling patch directories',
+    ),
+    LazySubcommand(
+        'each',
+        'git_well.git_each:__cli__',
+        'Run a git-well subcommand in every repository under a root directory.',
+        passthrough=True,
+    ),
+]
+
+
 class GitWellModalCLI(kwconf.ModalCLI):
-    # When adding a new top-level CLI, need to update:
-    # ~/code/git_well/pyproject.toml
-    from git_well.git_squash_streaks import __cli__ as squash_streaks
-    from git_well.git_squash import __cli__ as squash
-    from git_well.git_branch_upgrade import __cli__ as branch_upgrade
-    from git_well.git_sync import __cli__ as sync
-    from git_well.git_branch_cleanup import __cli__ as branch_cleanup
-    from git_well.git_track_upstream import __cli__ as track_upstream
-    from git_well.git_rebase_add_continue import __cli__ as rebase_add_continue
-    from git_well.git_remote_protocol import __cli__ as remote_protocol
-    from git_well.git_discover_remote import __cli__ as discover_remote
-    from git_well.git_autoconf_gpgsign import __cli__ as autoconf_gpgsign
-    from git_well.git_url_components import __cli__ as url
-    from git_well.git_archive_source import __cli__ as archive_source
-    from git_well.ipfs import __cli__ as ipfs
-    from git_well.patchdir.patchdir_modal import __cli__ as patchdir
+    """
+    Git utilities for branches, history, remotes and source archives.
+    """
+    # The docstring is the ``git-well --help`` description.
+    #
+    # Subcommands are declared in SUBCOMMANDS and only the selected one is
+    # imported. Every other command is registered as a lightweight
+    # placeholder so ``--help`` can still list it.
+    #
+    # The GLOBAL_OPTIONS are given before the command. ``--trace-out <path>``
+    # records every external process and named phase of the run with a
+    # git_well.tracing.Tracer and writes a Chrome trace-event file.
+    # ``--jobs <n>`` limits how many independent external commands
+    # git_well.jobs.run_jobs runs at once. They are removed from argv by
+    # _pop_global_options before parsing, and only registered on the parser
+    # for the help, completion and error messages.
+
+    # Abbreviations of the global options would reach the subcommand
+    __allow_abbrev__ = False
+
+    def __init__(
+        self,
+        description: str = '',
+        sub_clis: list[Any] | None = None,
+        version: str | None = None,
+    ) -> None:
+        super().__init__(
+            description=description, sub_clis=sub_clis, version=version
+        )
+        self._lazy_subcommands = list(SUBCOMMANDS)
+        self._subconfig_metadata += [
+            {'command': spec.command, 'cls': spec.placeholder()}
+            for spec in self._lazy_subcommands
+        ]
+
+    def argparse(  # type: ignore[override]
+        self, parser: Any = None, *args: Any, **kwargs: Any
+    ) -> Any:
+        import argparse
+
+        is_root = parser is None
+        parser = super().argparse(parser, *args, **kwargs)
+        if is_root:
+            for option, option_kw in GLOBAL_OPTIONS.items():
+                parser.add_argument(
+                    option,
+                    dest=f'__global_{option.lstrip("-")}__',
+                    default=argparse.SUPPRESS,
+                    **option_kw,
+                )
+        return parser
+
+    def _find_spec(self, command: str | None) -> LazySubcommand | None:
+        for spec in self._lazy_subcommands:
+            if command in spec.names:
+                return spec
+        return None
+
+    def _materialize(self, command: str) -> None:
+        """
+        Replace the placeholder for ``command`` with the real CLI class.
+        """
+        spec = self._find_spec(command)
+        if spec is None:
+            return
+        for metadata in self._subconfig_metadata:
+            if metadata['command'] == spec.command:
+                metadata.clear()
+                metadata.update({'command': spec.command, 'cls': spec.load()})
+
+    def main(  # type: ignore[override]
+        self,
+        argv: Sequence[str] | bool | None = None,
+        strict: bool = True,
+        autocomplete: Any = 'auto',
+        _noexit: bool = False,
+    ) -> Any:
+        options, argv = _pop_global_options(argv)
+        if '--jobs' in options:
+            from git_well.jobs import set_max_jobs
+
+            try:
+                num_jobs = int(options['--jobs'])
+            except ValueError:
+                raise SystemExit(
+                    'git-well: error: argument --jobs: invalid int value: '
+                    f'{options["--jobs"]!r}'
+                ) from None
+            set_max_jobs(num_jobs)
+        trace_out = options.get('--trace-out', None)
+        command = _selected_command(argv)
+        if command is not None:
+            self._materialize(command)
+        run = functools.partial(
+            super().main,
+            argv=argv,
+            strict=strict,
+            autocomplete=autocomplete,
+            _noexit=_noexit,
+        )
+        spec = self._find_spec(command)
+        if spec is not None and spec.passthrough:
+            if '_ARGCOMPLETE' not in os.environ:
+                # Skip the modal parser, which rejects unknown options
+                import sys
+
+                if argv is None or isinstance(argv, (bool, int)):
+                    words = sys.argv[1:]
+                else:
+                    words = [os.fspath(arg) for arg in argv]
+                # A spec is only found for a command
+                assert command is not None
+                rest = words[words.index(command) + 1 :]
+                run = functools.partial(spec.load().main, argv=rest)
+        if trace_out is None:
+            return run()
+        from git_well.tracing import Tracer
+
+        with Tracer(trace_out):
+            return run()
+
+    run = main
+
+
+# Options of ``git-well`` itself that are given before the command, with
+# their ``add_argument`` keywords
+GLOBAL_OPTIONS: dict[str, dict[str, Any]] = {
+    '--trace-out': {
+        'metavar': 'PATH',
+        'help': 'write a Chrome trace-event file of processes and phases',
+    },
+    '--jobs': {
+        'metavar': 'N',
+        'type': int,
+        'help': 'maximum number of concurrent external commands',
+    },
+}
+
+
+def _pop_global_options(
+    argv: Sequence[str] | bool | None,
+) -> tuple[dict[str, str], Sequence[str] | bool | None]:
+    """
+    Remove the :data:`GLOBAL_OPTIONS` that precede the command.
+
+    Example:
+        >>> from git_well.main import _pop_global_options
+        >>> _pop_global_options(['--trace-out', 't.json', 'url', 'x'])
+        ({'--trace-out': 't.json'}, ['url', 'x'])
+        >>> _pop_global_options(['--jobs=4', '--trace-out=t.json', 'squash'])
+        ({'--jobs': '4', '--trace-out': 't.json'}, ['squash'])
+        >>> _pop_global_options(['url', '--trace-out', 'x'])
+        ({}, ['url', '--trace-out', 'x'])
+        >>> _pop_global_options(False)
+        ({}, False)
+    """
+    import sys
+
+    if isinstance(argv, (bool, int)):
+        return {}, argv
+    if argv is None:
+        if '_ARGCOMPLETE' in os.environ:
+            return {}, argv
+        words = sys.argv[1:]
+    else:
+        words = list(argv)
+    options: dict[str, str] = {}
+    rest: list[str] = []
+    index = 0
+    while index < len(words):
+        arg = words[index]
+        if not arg.startswith('-'):
+            rest.extend(words[index:])
+            break
+        name, eq, value = arg.partition('=')
+        if name in GLOBAL_OPTIONS and eq:
+            options[name] = value
+        elif name in GLOBAL_OPTIONS and index + 1 < len(words):
+            options[name] = words[index + 1]
+            index += 1
+        else:
+            rest.append(arg)
+        index += 1
+    if not options:
+        return {}, argv
+    return options, rest
+
+
+def _selected_command(argv: Sequence[str] | bool | None) -> str | None:
+    """
+    Return the first positional token, which is the subcommand name.
+
+    The top-level parser only has flag options, so the first argument that
+    does not start with a dash is always the command. When argcomplete drives
+    the parser the words come from ``COMP_LINE`` instead of ``sys.argv``.
+
+    Example:
+        >>> from git_well.main import _selected_command
+        >>> assert _selected_command(['--version']) is None
+        >>> assert _selected_command(['url', '--help']) == 'url'
+        >>> assert _selected_command(['--jobs', '4', 'url']) == 'url'
+        >>> assert _selected_command(False) is None
+    """
+    import sys
+
+    if isinstance(argv, (bool, int)):
+        argv = None if argv else []
+    if argv is None:
+        if '_ARGCOMPLETE' in os.environ:
+            import shlex
+
+            comp_line = os.environ.get('COMP_LINE', '')
+            comp_point = int(os.environ.get('COMP_POINT', len(comp_line)))
+            try:
+                argv = shlex.split(comp_line[:comp_point])[1:]
+            except ValueError:
+                argv = comp_line[:comp_point].split()[1:]
+        else:
+            argv = sys.argv[1:]
+    words = iter(argv)
+    for arg in words:
+        if arg in GLOBAL_OPTIONS:
+            # Skip the value of a global option
+            next(words, None)
+        elif not arg.startswith('-'):
+            return arg
+    return None
 
 
 def main() -> None:
     from git_well import __version__
 
     modal = GitWellModalCLI(version=__version__)
-    modal.main()
+    ret = modal.main()
+    # Commands like ``each`` report failures with an exit code. Other return
+    # values (e.g. the path archive_source wrote) are not exit statuses.
+    if isinstance(ret, int) and not isinstance(ret, bool) and ret:
+        raise SystemExit(ret)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,275 @@
+"""
+A single-pass snapshot of every branch, remote branch and tag in a repo.
+
+Walking ``repo.branches`` or ``remote.refs`` with GitPython resolves each ref
+and its commit one at a time. :class:`RefSnapshot` instead reads everything
+the branch tools need from one ``git for-each-ref`` call and stores it in
+parallel columns, which stays small and fast with tens of thousands of refs.
+"""
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:  # pragma: no cover
+    import git
+
+LOCAL = 0
+REMOTE = 1
+TAG = 2
+
+_KIND_NAMES = ('local', 'remote', 'tag')
+
+_PREFIXES = (
+    ('refs/heads/', LOCAL),
+    ('refs/remotes/', REMOTE),
+    ('refs/tags/', TAG),
+)
+
+_FIELDS = [
+    '%(refname)',
+    '%(objectname)',
+    '%(*objectname)',
+    '%(committerdate:unix)',
+    '%(*committerdate:unix)',
+    '%(symref)',
+    '%(upstream)',
+    '%(upstream:track,nobracket)',
+]
+FOR_EACH_REF_FORMAT = '%00'.join(_FIELDS)
+
+
+@dataclass(frozen=True)
+class RefInfo:
+    """
+    One row of a :class:`RefSnapshot`.
+
+    ``name`` is the branch name without the ``refs/...`` or remote prefix,
+    ``hexsha`` is the peeled target (the commit of an annotated tag) and
+    ``committed_time`` is 0 when the target is not a commit. ``ahead`` and
+    ``behind`` are -1 unless the local branch has an upstream.
+    """
+
+    refname: str
+    kind: str
+    remote: str | None
+    name: str
+    hexsha: str
+    committed_time: int
+    symref: str
+    upstream: str
+    ahead: int
+    behind: int
+
+    @property
+    def short_name(self) -> str:
+        """
+        The name ``git branch -a`` shows, e.g. ``origin/main``.
+        """
+        if self.remote is not None:
+            return f'{self.remote}/{self.name}'
+        return self.name
+
+
+class RefSnapshot:
+    """
+    Columnar table of refs read with one ``git for-each-ref`` call.
+
+    Each attribute is one column, indexed by row. String columns are lists,
+    numeric columns are :mod:`array` arrays and remote names are stored as an
+    index into :attr:`remote_names`.
+
+    Example:
+        >>> from git_well.repo import Repo
+        >>> repo = Repo.demo()
+        >>> repo.cmd('git tag -a v1 -m "release"')
+        >>> repo.cmd('git branch dev/1.0.0')
+        >>> snap = repo.ref_snapshot()
+        >>> names = [r.name for r in snap.select('local')]
+        >>> assert 'dev/1.0.0' in names and 'main' in names
+        >>> tag, = snap.select('tag')
+        >>> assert tag.hexsha == repo.head.commit.hexsha
+        >>> assert tag.committed_time == repo.head.commit.committed_date
+    """
+
+    def __init__(self, remote_names: list[str] | None = None) -> None:
+        self.remote_names: list[str] = list(remote_names or [])
+        self.refname: list[str] = []
+        self.name: list[str] = []
+        self.hexsha: list[str] = []
+        self.symref: list[str] = []
+        self.upstream: list[str] = []
+        self.kind = array('b')
+        self.remote_index = array('i')
+        self.committed_time = array('q')
+        self.ahead = array('i')
+        self.behind = array('i')
+
+    def __len__(self) -> int:
+        return len(self.refname)
+
+    def __getitem__(self, index: int) -> RefInfo:
+        remote_index = self.remote_index[index]
+        return RefInfo(
+            refname=self.refname[index],
+            kind=_KIND_NAMES[self.kind[index]],
+            remote=None if remote_index < 0 else self.remote_names[remote_index],
+            name=self.name[index],
+            hexsha=self.hexsha[index],
+            committed_time=self.committed_time[index],
+            symref=self.symref[index],
+            upstream=self.upstream[index],
+            ahead=self.ahead[index],
+            behind=self.behind[index],
+        )
+
+    def __iter__(self) -> Iterator[RefInfo]:
+        return (self[index] for index in range(len(self)))
+
+    def select(
+        self,
+        kind: str | None = None,
+        remote: str | None = None,
+        name: str | None = None,
+        symrefs: bool = False,
+    ) -> list[RefInfo]:
+        """
+        Rows matching all given filters.
+
+        Args:
+            kind (str | None): 'local', 'remote' or 'tag'
+            remote (str | None): only remote branches of this remote
+            name (str | None): exact branch / tag name
+            symrefs (bool): include symbolic refs such as ``origin/HEAD``
+        """
+        kind_code = None if kind is None else _KIND_NAMES.index(kind)
+        if remote is not None:
+            if remote not in self.remote_names:
+                return []
+            remote_code = self.remote_names.index(remote)
+        rows = []
+        for index in range(len(self)):
+            if kind_code is not None and self.kind[index] != kind_code:
+                continue
+            if remote is not None and self.remote_index[index] != remote_code:
+                continue
+            if name is not None and self.name[index] != name:
+                continue
+            if not symrefs and self.symref[index]:
+                continue
+            rows.append(self[index])
+        return rows
+
+    @classmethod
+    def from_repo(cls, repo: git.Repo) -> RefSnapshot:
+        """
+        Read every ref of ``repo``.
+
+        Remote names come from the repo config, which GitPython reads without
+        running git, so remotes containing a slash are split correctly.
+        """
+        remote_names = [remote.name for remote in repo.remotes]
+        text = repo.git.for_each_ref(
+            f'--format={FOR_EACH_REF_FORMAT}',
+            'refs/heads',
+            'refs/remotes',
+            'refs/tags',
+        )
+        return cls.from_text(text, remote_names)
+
+    @classmethod
+    def from_text(
+        cls, text: str, remote_names: list[str] | None = None
+    ) -> RefSnapshot:
+        """
+        Parse ``git for-each-ref --format=FOR_EACH_REF_FORMAT`` output.
+
+        Example:
+            >>> from git_well.refs import RefSnapshot
+            >>> rows = [
+            >>>     ['refs/heads/main', 'a' * 40, '', '10', '', '',
+            >>>      'refs/remotes/my/fork/main', 'ahead 2, behind 1'],
+            >>>     ['refs/remotes/my/fork/main', 'b' * 40, '', '9', '', '', '', ''],
+            >>>     ['refs/remotes/my/fork/HEAD', 'b' * 40, '', '9', '',
+            >>>      'refs/remotes/my/fork/main', '', ''],
+            >>>     ['refs/tags/v1', 'c' * 40, 'b' * 40, '', '9', '', '', ''],
+            >>> ]
+            >>> text = chr(10).join(chr(0).join(r) for r in rows)
+            >>> snap = RefSnapshot.from_text(text, ['my/fork'])
+            >>> main = snap[0]
+            >>> assert (main.ahead, main.behind) == (2, 1)
+            >>> fork, = snap.select('remote')
+            >>> assert (fork.remote, fork.name) == ('my/fork', 'main')
+            >>> assert fork.short_name == 'my/fork/main'
+            >>> assert snap[3].hexsha == 'b' * 40 and snap[3].committed_time == 9
+        """
+        self = cls(remote_names)
+        # Match the longest remote name first, like git does for refspecs.
+        by_length = sorted(
+            enumerate(self.remote_names), key=lambda t: -len(t[1])
+        )
+        for line in text.splitlines():
+            if not line:
+                continue
+            (
+                refname,
+                objectname,
+                peeled_objectname,
+                committed,
+                peeled_committed,
+                symref,
+                upstream,
+                track,
+            ) = line.split('\0')
+            for prefix, kind in _PREFIXES:
+                if refname.startswith(prefix):
+                    name = refname[len(prefix) :]
+                    break
+            else:
+                continue
+            remote_index = -1
+            if kind == REMOTE:
+                for index, remote_name in by_length:
+                    if name.startswith(remote_name + '/'):
+                        remote_index = index
+                        name = name[len(remote_name) + 1 :]
+                        break
+                else:
+                    remote_name, _, name = name.partition('/')
+                    remote_index = len(self.remote_names)
+                    self.remote_names.append(remote_name)
+                    by_length.append((remote_index, remote_name))
+            ahead, behind = _parse_track(track) if upstream else (-1, -1)
+            self.refname.append(refname)
+            self.name.append(name)
+            self.hexsha.append(peeled_objectname or objectname)
+            self.symref.append(symref)
+            self.upstream.append(upstream)
+            self.kind.append(kind)
+            self.remote_index.append(remote_index)
+            self.committed_time.append(int(peeled_committed or committed or 0))
+            self.ahead.append(ahead)
+            self.behind.append(behind)
+        return self
+
+
+def _parse_track(track: str) -> tuple[int, int]:
+    """
+    Parse ``%(upstream:track,nobracket)``.
+
+    Example:
+        >>> from git_well.refs import _parse_track
+        >>> _parse_track('ahead 3, behind 2'), _parse_track(''), _parse_track('gone')
+        ((3, 2), (0, 0), (-1, -1))
+    """
+    if track == 'gone':
+        return -1, -1
+    ahead = behind = 0
+    for part in track.split(','):
+        word, _, count = part.strip().partition(' ')
+        if word == 'ahead':
+            ahead = int(count)
+        elif word == 'behind':
+            behind = int(count)
+    return ahead, behind
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
 import os
-from typing import Any, cast
+from typing import TYPE_CHECKING, Any, cast
 
 import git
 import ubelt as ub
 
+if TYPE_CHECKING:  # pragma: no cover
+    from git_well.objects import GitObjectReader
+    from git_well.refs import RefSnapshot
+
 
 class Repo(git.Repo):
     """
@@ -49,6 +53,43 @@ class Repo(git.Repo):
         # If .git is a file, that means it is a submodule
         return git_file.is_file()
 
+    @property
+    def objects(self) -> GitObjectReader:
+        """
+        Pipelined object access through one persistent ``git cat-file``.
+
+        The process is started lazily and stopped by :func:`close`.
+
+        Example:
+            >>> from git_well.repo import Repo
+            >>> self = Repo.demo()
+            >>> assert self.objects.exists('HEAD', 'commit')
+            >>> assert self.objects is self.objects
+            >>> self.close()
+        """
+        from git_well.objects import GitObjectReader
+
+        reader: GitObjectReader | None = getattr(self, '_objects', None)
+        if reader is None or reader.closed:
+            reader = GitObjectReader(self.git_dir)
+            self._objects = reader
+        return reader
+
+    def ref_snapshot(self) -> RefSnapshot:
+        """
+        Read every local branch, remote branch and tag with one
+        ``git for-each-ref`` call. See :class:`git_well.refs.RefSnapshot`.
+        """
+        from git_well.refs import RefSnapshot
+
+        return RefSnapshot.from_repo(self)
+
+    def close(self) -> None:
+        reader = getattr(self, '_objects', None)
+        if reader is not None:
+            reader.close()
+        super().close()
+
     @property
     def config_fpath(self) -> ub.Path:
         return ub.Path(self.git_dir) / 'config'
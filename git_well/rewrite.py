@@ -0,0 +1,712 @@
+"""
+Rewrite commit history without touching the working tree or the index.
+
+Squashing only changes how commits are linked: every commit that survives
+keeps its tree. So instead of resetting and cherry-picking, the squashed
+commit is written on the tree of the newest commit of the streak, and each
+commit above it is re-created on its own tree with remapped parents. All
+squashes of a run are applied in one topological pass, written through one
+``git fast-import`` (or ``git commit-tree`` per commit), and branches are
+only moved once the new history exists.
+"""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import ubelt as ub
+
+if TYPE_CHECKING:  # pragma: no cover
+    import git
+
+    from git_well.objects import CommitInfo
+
+PLAN_VERSION = 1
+
+
+def squash_message(messages: list[str]) -> str:
+    """
+    Message of a commit that replaces commits with ``messages``.
+
+    Example:
+        >>> from git_well.rewrite import squash_message
+        >>> squash_message(['wip\\n', 'wip\\n', 'fix\\n'])
+        'wip\\n\\nfix - Squashed 3 commits'
+        >>> squash_message(['wip\\n', 'wip\\n'])
+        'wip - Squashed 2 commits'
+    """
+    unique_messages = ub.unique(messages)
+    summary = '\n'.join(unique_messages)
+    if summary == 'wip\n':
+        summary = summary.strip('\n')
+    # TODO: need more options for messages
+    return '{} - Squashed {} commits'.format(summary.strip(), len(messages))
+
+
+@dataclass(frozen=True)
+class Squash:
+    """
+    One range of commits to replace by a single commit.
+
+    Attributes:
+        start (str): oldest commit of the range
+        stop (str): newest commit of the range, its tree is the tree of the
+            squashed commit
+        message (str | None): message of the squashed commit, defaults to
+            :func:`squash_message` of the squashed commits
+        start_inclusive (bool): if False, ``start`` itself is kept and only
+            the commits after it are squashed
+    """
+
+    start: str
+    stop: str
+    message: str | None = None
+    start_inclusive: bool = True
+
+
+def _split_email_ident(ident: str) -> tuple[str, str]:
+    name, _, email = ident.rpartition(' <')
+    return name, email.rstrip('>')
+
+
+def _raw_date(info: CommitInfo) -> str:
+    return f'{info.author_time} {info.author_tz}'
+
+
+class CommitTreeWriter:
+    """
+    Create commit objects from existing trees with ``git commit-tree``.
+
+    Copies keep the original author and message and get a fresh committer,
+    the same as ``git cherry-pick``. This runs one process per commit; see
+    :class:`FastImportWriter` for large rewrites.
+
+    Args:
+        repo (git.Repo): the repository to write to
+    """
+
+    def __init__(self, repo: git.Repo) -> None:
+        self.repo = repo
+
+    def commit(
+        self,
+        tree: str,
+        parents: list[str],
+        message: str,
+        author: str | None = None,
+        author_date: str | None = None,
+    ) -> str:
+        """
+        Write one commit and return its id.
+
+        Args:
+            tree (str): id of the tree
+            parents (List[str]): ids of the parents
+            message (str): the full commit message
+            author (str | None): ``Name <email>``, defaults to the configured
+                user
+            author_date (str | None): ``<unix-time> <tz>``, defaults to now
+        """
+        env = dict(os.environ)
+        if author is not None:
+            name, email = _split_email_ident(author)
+            env['GIT_AUTHOR_NAME'] = name
+            env['GIT_AUTHOR_EMAIL'] = email
+        if author_date is not None:
+            env['GIT_AUTHOR_DATE'] = author_date
+        command = ['git', 'commit-tree', tree]
+        for parent in parents:
+            command += ['-p', parent]
+        proc = subprocess.run(
+            command,
+            input=message.encode('utf-8'),
+            capture_output=True,
+            cwd=self.repo.git_dir,
+            env=env,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(
+                'git commit-tree failed: '
+                + proc.stderr.decode('utf-8', 'replace')
+            )
+        return proc.stdout.decode('ascii').strip()
+
+    def copy(self, info: CommitInfo, parents: list[str]) -> str:
+        """
+        Re-create ``info`` with the same tree and author on new parents.
+        """
+        return self.commit(
+            info.tree,
+            parents,
+            info.message,
+            author=info.author,
+            author_date=_raw_date(info),
+        )
+
+    def close(self) -> None:
+        pass
+
+    def resolve(self, token: str) -> str:
+        """
+        The commit id of a value returned by :meth:`commit`.
+        """
+        return token
+
+
+class FastImportWriter:
+    """
+    Create commit objects by streaming them into one ``git fast-import``.
+
+    :meth:`commit` returns a mark such as ``:3`` that later commits can use
+    as a parent. The real ids are known after :meth:`close` and are looked
+    up with :meth:`resolve`. The commits are attached to a scratch ref while
+    the import runs, which is deleted again on close.
+
+    Args:
+        repo (git.Repo): the repository to write to
+        ref (str): the scratch ref
+    """
+
+    def __init__(
+        self, repo: git.Repo, ref: str = 'refs/git-well/rewrite'
+    ) -> None:
+        self.repo = repo
+        self.ref = ref
+        self._proc: subprocess.Popen[bytes] | None = None
+        self._tempdir: tempfile.TemporaryDirectory[str] | None = None
+        self._num_marks = 0
+        self._marks: dict[str, str] = {}
+        self._author_ident: str | None = None
+        self._committer_line: bytes | None = None
+
+    def _start(self) -> subprocess.Popen[bytes]:
+        if self._proc is None:
+            self._committer_line = b'committer %s\n' % self._var(
+                'GIT_COMMITTER_IDENT'
+            ).encode('utf-8')
+            self._author_ident = self._var('GIT_AUTHOR_IDENT').rsplit(' ', 2)[0]
+            self._tempdir = tempfile.TemporaryDirectory()
+            marks_fpath = os.path.join(self._tempdir.name, 'marks')
+            self._proc = subprocess.Popen(
+                [
+                    'git',
+                    'fast-import',
+                    '--quiet',
+                    '--force',
+                    '--done',
+                    f'--export-marks={marks_fpath}',
+                ],
+                stdin=subprocess.PIPE,
+                cwd=self.repo.git_dir,
+            )
+        return self._proc
+
+    def _var(self, name: str) -> str:
+        return self.repo.git.var(name).strip()
+
+    def commit(
+        self,
+        tree: str,
+        parents: list[str],
+        message: str,
+        author: str | None = None,
+        author_date: str | None = None,
+    ) -> str:
+        """
+        Queue one commit and return its mark.
+
+        Arguments are the same as :meth:`CommitTreeWriter.commit`. Parents
+        may be commit ids or marks returned earlier.
+        """
+        proc = self._start()
+        assert proc.stdin is not None
+        committer_line = self._committer_line
+        assert committer_line is not None
+        if author is None:
+            author = self._author_ident
+        if author_date is None:
+            author_date = f'{int(time.time())} +0000'
+        self._num_marks += 1
+        mark = f':{self._num_marks}'
+        data = message.encode('utf-8')
+        lines = [
+            f'commit {self.ref}\n'.encode('utf-8'),
+            f'mark {mark}\n'.encode('utf-8'),
+            f'author {author} {author_date}\n'.encode('utf-8'),
+            committer_line,
+            b'data %d\n' % len(data),
+            data,
+            b'\n',
+        ]
+        for index, parent in enumerate(parents):
+            verb = 'from' if index == 0 else 'merge'
+            lines.append(f'{verb} {parent}\n'.encode('utf-8'))
+        # Replace the whole tree of the first parent with the original tree.
+        lines.append(f'M 040000 {tree} ""\n\n'.encode('utf-8'))
+        proc.stdin.write(b''.join(lines))
+        return mark
+
+    def copy(self, info: CommitInfo, parents: list[str]) -> str:
+        """
+        Re-create ``info`` with the same tree and author on new parents.
+        """
+        return self.commit(
+            info.tree,
+            parents,
+            info.message,
+            author=info.author,
+            author_date=_raw_date(info),
+        )
+
+    def close(self) -> None:
+        """
+        Finish the import, read the marks and remove the scratch ref.
+        """
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        assert proc.stdin is not None and self._tempdir is not None
+        try:
+            proc.stdin.write(b'done\n')
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = proc.wait()
+        try:
+            if returncode != 0:
+                raise RuntimeError(
+                    f'git fast-import failed with exit code {returncode}'
+                )
+            marks_fpath = os.path.join(self._tempdir.name, 'marks')
+            with open(marks_fpath) as file:
+                for line in file:
+                    mark, hexsha = line.split()
+                    self._marks[mark] = hexsha
+        finally:
+            self._tempdir.cleanup()
+            self.repo.git.update_ref('-d', self.ref, with_exceptions=False)
+
+    def resolve(self, token: str) -> str:
+        """
+        The commit id of a value returned by :meth:`commit`.
+        """
+        if token.startswith(':'):
+            return self._marks[token]
+        return token
+
+
+@dataclass(frozen=True)
+class PlannedSquash:
+    """
+    A :class:`Squash` resolved against the object database.
+
+    Attributes:
+        start (str): id of the oldest commit of the range
+        stop (str): id of the newest commit of the range
+        base (str): id of the parent of the squashed commit
+        members (Tuple[str, ...]): ids of the replaced commits, newest first
+        message (str): message of the squashed commit
+        tree (str): tree of the squashed commit, the tree of ``stop``
+    """
+
+    start: str
+    stop: str
+    base: str
+    members: tuple[str, ...]
+    message: str
+    tree: str
+
+
+def plan_squashes(
+    repo: git.Repo, squashes: list[Squash]
+) -> list[PlannedSquash]:
+    """
+    Resolve and validate ``squashes`` without writing anything.
+
+    Raises:
+        ValueError: if two squashes overlap
+        AssertionError: if a range is empty or starts at a merge
+    """
+    from git_well.objects import object_reader
+
+    objects = object_reader(repo)
+    ends = objects.read_commits(
+        rev for squash in squashes for rev in (squash.start, squash.stop)
+    )
+    plan = []
+    seen: set[str] = set()
+    for squash, start_info, stop_info in zip(squashes, ends[0::2], ends[1::2]):
+        if len(start_info.parents) > 1:
+            raise AssertionError('cannot squash from a merge commit')
+        if squash.start_inclusive:
+            if not start_info.parents:
+                raise NotImplementedError(
+                    'inclusive squashing from a root commit is not supported'
+                )
+            base = start_info.parents[0]
+        else:
+            base = start_info.hexsha
+        lines = repo.git.rev_list(
+            '--topo-order', '--parents', f'{base}..{stop_info.hexsha}'
+        ).splitlines()
+        members = tuple(line.split()[0] for line in lines)
+        # base is an ancestor of stop iff it is a parent of some member
+        if not any(base in line.split()[1:] for line in lines):
+            raise AssertionError(
+                f'start={squash.start} is not an ancestor of stop={squash.stop}'
+            )
+        if not seen.isdisjoint(members):
+            raise ValueError(f'squash {squash} overlaps another squash')
+        seen.update(members)
+        message = squash.message
+        if message is None:
+            infos = objects.read_commits(members)
+            message = squash_message([info.message for info in infos])
+        plan.append(
+            PlannedSquash(
+                start=start_info.hexsha,
+                stop=stop_info.hexsha,
+                base=base,
+                members=members,
+                message=message,
+                tree=stop_info.tree,
+            )
+        )
+    if not seen.isdisjoint(item.base for item in plan):
+        raise ValueError('the base of a squash is inside another squash')
+    return plan
+
+
+class StalePlanError(Exception):
+    """
+    The repository changed since a :class:`RewritePlan` was written.
+    """
+
+
+@dataclass(frozen=True)
+class RewritePlan:
+    """
+    A reviewed list of squashes for one branch, stored as JSON.
+
+    The plan records the head it was computed for and, per squash, the ids,
+    commit count, message and tree of the result. :meth:`resolve` checks all
+    of that against the repository before the plan is applied, so an
+    approved plan is never applied to a different history.
+
+    Example:
+        >>> import ubelt as ub
+        >>> from git_well.rewrite import *  # NOQA
+        >>> from git_well.repo import Repo
+        >>> repo = Repo.demo()
+        >>> head = repo.head.commit.hexsha
+        >>> planned = plan_squashes(repo, [Squash('HEAD~3', 'HEAD~1')])
+        >>> plan = RewritePlan(head, 'main', tuple(planned))
+        >>> fpath = ub.Path.appdir('git_well/tests/plan').ensuredir() / 'plan.json'
+        >>> plan.dump(fpath)
+        >>> assert RewritePlan.load(fpath).resolve(repo) == planned
+        >>> repo.cmd('git commit --allow-empty -m new')
+        >>> try:
+        >>>     RewritePlan.load(fpath).resolve(repo)
+        >>> except StalePlanError:
+        >>>     print('stale')
+        stale
+    """
+
+    head: str
+    branch: str | None
+    squashes: tuple[PlannedSquash, ...]
+
+    def to_dict(self) -> dict:
+        """
+        The JSON representation of the plan.
+        """
+        return {
+            'version': PLAN_VERSION,
+            'head': self.head,
+            'branch': self.branch,
+            'squashes': [
+                {
+                    'start': item.start,
+                    'stop': item.stop,
+                    'base': item.base,
+                    'num_commits': len(item.members),
+                    'message': item.message,
+                    'tree': item.tree,
+                }
+                for item in self.squashes
+            ],
+        }
+
+    def dump(self, fpath: str | os.PathLike[str]) -> None:
+        """
+        Write the plan as JSON.
+        """
+        text = json.dumps(self.to_dict(), indent=4)
+        with open(fpath, 'w', newline='\n') as file:
+            file.write(text + '\n')
+
+    @classmethod
+    def load(cls, fpath: str | os.PathLike[str]) -> RewritePlan:
+        """
+        Read a plan written by :meth:`dump`.
+
+        The squashed commit ids are not known until :meth:`resolve` is
+        called, so the loaded squashes only carry placeholder members.
+        """
+        with open(fpath) as file:
+            data = json.load(file)
+        if data.get('version') != PLAN_VERSION:
+            raise ValueError(
+                f'unsupported plan version {data.get("version")!r} in {fpath}'
+            )
+        squashes = tuple(
+            PlannedSquash(
+                start=item['start'],
+                stop=item['stop'],
+                base=item['base'],
+                members=('',) * item['num_commits'],
+                message=item['message'],
+                tree=item['tree'],
+            )
+            for item in data['squashes']
+        )
+        return cls(data['head'], data['branch'], squashes)
+
+    def resolve(self, repo: git.Repo) -> list[PlannedSquash]:
+        """
+        Re-resolve the squashes and check the plan still applies.
+
+        This is cheap compared to the analysis that produced the plan: one
+        ``git rev-list`` per squash and no chain or streak search.
+
+        Raises:
+            StalePlanError: if the branch moved or any squash resolves to a
+                different range, message or tree
+        """
+        if self.branch is not None:
+            current = repo.git.rev_parse(f'refs/heads/{self.branch}').strip()
+        else:
+            current = repo.git.rev_parse('HEAD').strip()
+        if current != self.head:
+            raise StalePlanError(
+                f'the plan was made for head {self.head} but '
+                f'{self.branch or "HEAD"} is at {current}'
+            )
+        squashes = [
+            Squash(
+                item.start,
+                item.stop,
+                item.message,
+                start_inclusive=item.base != item.start,
+            )
+            for item in self.squashes
+        ]
+        try:
+            planned = plan_squashes(repo, squashes)
+        except (AssertionError, ValueError, KeyError) as ex:
+            raise StalePlanError(f'the plan no longer applies: {ex}') from ex
+        for expected, got in zip(self.squashes, planned):
+            if (
+                (expected.base, expected.tree) != (got.base, got.tree)
+                or len(expected.members) != len(got.members)
+            ):
+                raise StalePlanError(
+                    f'squash {expected.start}..{expected.stop} resolves to '
+                    f'{len(got.members)} commits on tree {got.tree}, the plan '
+                    f'expects {len(expected.members)} commits on tree '
+                    f'{expected.tree}'
+                )
+        return planned
+
+
+def rewrite_squashes(
+    repo: git.Repo,
+    squashes: list[Squash] | list[PlannedSquash],
+    head: str = 'HEAD',
+    writer: CommitTreeWriter | FastImportWriter | None = None,
+) -> str:
+    """
+    Apply all ``squashes`` to the history of ``head`` in one pass.
+
+    The commits between the oldest squash and ``head`` are visited once in
+    topological order. The newest commit of each squash is replaced by the
+    squashed commit, the other commits of the squash are dropped and every
+    later commit whose parents changed is re-created on its own tree with
+    the same number of parents, so merges above a squash are kept. That is
+    one object write per rewritten commit. By default everything is written
+    through a single ``git fast-import``.
+
+    No ref, index or working tree is modified; the caller decides which
+    branch should point at the returned commit. Because every surviving
+    commit keeps its tree, the new ``head`` has the same tree as the old one.
+
+    Args:
+        repo (git.Repo): the repository
+        squashes (List[Squash] | List[PlannedSquash]): non-overlapping
+            ranges in the history of ``head``, in any order, optionally
+            already resolved by :func:`plan_squashes`
+        head (str): the tip whose history is rewritten
+        writer (CommitTreeWriter | FastImportWriter | None): the object
+            writer to use, defaults to a :class:`FastImportWriter`
+
+    Returns:
+        str: the id of the rewritten ``head``
+
+    Raises:
+        ValueError: if a commit that is kept has a parent inside a squash
+
+    Example:
+        >>> from git_well.rewrite import Squash, rewrite_squashes
+        >>> from git_well.repo import Repo
+        >>> repo = Repo.demo()
+        >>> for idx in range(3):
+        >>>     repo.cmd(f'git commit --allow-empty -m "wip {idx}"')
+        >>> old_head = repo.head.commit
+        >>> squashes = [Squash('HEAD~4', 'HEAD~3'), Squash('HEAD~1', 'HEAD')]
+        >>> new_head = rewrite_squashes(repo, squashes)
+        >>> assert repo.head.commit == old_head  # nothing was moved
+        >>> new = repo.commit(new_head)
+        >>> assert new.tree == old_head.tree
+        >>> assert new.message.endswith('Squashed 2 commits')
+        >>> num_old = len(list(old_head.iter_parents()))
+        >>> assert len(list(new.iter_parents())) == num_old - 2
+    """
+    from git_well.objects import object_reader
+
+    objects = object_reader(repo)
+    if writer is None:
+        writer = FastImportWriter(repo)
+    head_sha = objects.read_commit(head).hexsha
+
+    plan = [item for item in squashes if isinstance(item, PlannedSquash)]
+    if len(plan) != len(squashes):
+        if plan:
+            raise TypeError('Cannot mix Squash and PlannedSquash items')
+        requested = [item for item in squashes if isinstance(item, Squash)]
+        plan = plan_squashes(repo, requested)
+    if not plan:
+        return head_sha
+    replaced = {item.stop: item for item in plan}
+    dropped = {sha for item in plan for sha in item.members[1:]}
+
+    # Everything that can change lies above the common ancestor of the bases
+    bases = sorted({item.base for item in plan})
+    if len(bases) == 1:
+        boundary = bases[0]
+    else:
+        boundary = repo.git.merge_base('--octopus', *bases).strip()
+    order = repo.git.rev_list(
+        '--topo-order', '--reverse', head_sha, f'^{boundary}'
+    ).split()
+    missing = set(replaced) - set(order)
+    if missing:
+        raise Exception(
+            'stop={} is not an ancestor of head={}'.format(
+                sorted(missing)[0], head_sha
+            )
+        )
+
+    # Visit oldest first so each commit can refer to its rewritten parents
+    mapping: dict[str, str] = {}
+    try:
+        for chunk in ub.chunks(order, chunksize=1000):
+            for info in objects.read_commits(chunk):
+                if info.hexsha in dropped:
+                    continue
+                item = replaced.get(info.hexsha)
+                if item is not None:
+                    mapping[info.hexsha] = writer.commit(
+                        item.tree,
+                        [mapping.get(item.base, item.base)],
+                        item.message,
+                        author_date=_raw_date(info),
+                    )
+                    continue
+                if not dropped.isdisjoint(info.parents):
+                    raise ValueError(
+                        f'commit {info.hexsha} is not squashed, but its '
+                        'parent is inside a squash'
+                    )
+                parents = [mapping.get(p, p) for p in info.parents]
+                if parents != list(info.parents):
+                    mapping[info.hexsha] = writer.copy(info, parents)
+    finally:
+        writer.close()
+    return writer.resolve(mapping.get(head_sha, head_sha))
+
+
+def squash_between(
+    repo: git.Repo,
+    start: str,
+    stop: str,
+    head: str = 'HEAD',
+    message: str | None = None,
+    start_inclusive: bool = True,
+    writer: CommitTreeWriter | FastImportWriter | None = None,
+) -> str:
+    """
+    Squash ``start..stop`` and return the rewritten ``head``.
+
+    This is :func:`rewrite_squashes` for a single range.
+
+    Args:
+        repo (git.Repo): the repository
+        start (str): oldest commit of the squash
+        stop (str): newest commit of the squash, an ancestor of ``head``
+        head (str): the tip whose history is rewritten
+        message (str | None): message of the squashed commit, defaults to
+            :func:`squash_message` of the squashed commits
+        start_inclusive (bool): if False, ``start`` itself is kept and only
+            the commits after it are squashed
+        writer (CommitTreeWriter | FastImportWriter | None): the object
+            writer to use
+
+    Returns:
+        str: the id of the rewritten ``head``
+
+    Example:
+        >>> from git_well.rewrite import CommitTreeWriter, squash_between
+        >>> from git_well.repo import Repo
+        >>> repo = Repo.demo()
+        >>> old_head = repo.head.commit
+        >>> writer = CommitTreeWriter(repo)
+        >>> new_head = squash_between(repo, 'HEAD~3', 'HEAD~1', writer=writer)
+        >>> assert repo.head.commit == old_head  # nothing was moved
+        >>> new = repo.commit(new_head)
+        >>> assert new.tree == old_head.tree
+        >>> assert new.message == old_head.message
+        >>> assert new.parents[0].message.endswith('Squashed 3 commits')
+        >>> assert new.parents[0].parents[0] == repo.commit('HEAD~4')
+    """
+    squash = Squash(start, stop, message, start_inclusive)
+    return rewrite_squashes(repo, [squash], head=head, writer=writer)
+
+
+def temporary_branch_name(branch_name: str, suffix: str) -> str:
+    """
+    Name of the branch a non-inplace rewrite of ``branch_name`` is put on.
+    """
+    if branch_name.endswith(suffix):
+        raise Exception('Already in temp branch {}'.format(branch_name))
+    return branch_name + suffix
+
+
+def move_ref(
+    repo: git.Repo, ref: str, new: str, old: str | None = None
+) -> None:
+    """
+    Point ``ref`` at ``new``, failing if it no longer points at ``old``.
+
+    The working tree and index are left alone, which is only correct for a
+    checked out branch when ``new`` has the same tree as its old commit. This
+    holds for every rewrite in this module.
+    """
+    args = [ref, new]
+    if old is not None:
+        args.append(old)
+    repo.git.update_ref('-m', 'git-well: rewrite history', *args)
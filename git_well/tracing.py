@@ -0,0 +1,354 @@
+"""
+Account for every external command and time named phases.
+
+git_well starts processes through several routes (``ub.cmd``,
+:meth:`git_well.repo.Repo.cmd`, GitPython's ``repo.git.*``,
+:func:`subprocess.run` and long lived ``git cat-file`` / ``git
+fast-import`` pipes). While a :class:`Tracer` is active, all of them are
+created through :class:`TracedPopen`, which records the argv, working
+directory, wall time, exit code and, when the output is captured, the number
+of bytes written to stdout and stderr.
+
+Python code marks its phases with :func:`span`, which costs nothing when no
+tracer is active. The result is written in the Chrome trace-event format and
+can be opened with ``chrome://tracing`` or https://ui.perfetto.dev.
+
+CommandLine:
+    git-well --trace-out trace.json squash_streaks --dry
+
+Example:
+    >>> import subprocess
+    >>> from git_well import tracing
+    >>> with tracing.Tracer() as tracer:
+    >>>     with tracing.span('phase', detail=1):
+    >>>         _ = subprocess.run(['git', '--version'], capture_output=True)
+    >>> procs = [e for e in tracer.events if e['cat'] == 'subprocess']
+    >>> assert procs[0]['args']['argv'] == ['git', '--version']
+    >>> assert procs[0]['args']['returncode'] == 0
+    >>> assert procs[0]['args']['stdout_bytes'] > 0
+    >>> phase = [e for e in tracer.events if e['cat'] == 'phase'][0]
+    >>> assert phase['name'] == 'phase' and phase['args'] == {'detail': 1}
+    >>> # Spans are no-ops and Popen is restored outside of the tracer
+    >>> assert subprocess.Popen is not tracing.TracedPopen
+    >>> with tracing.span('ignored'):
+    >>>     pass
+    >>> assert tracing.active_tracer() is None
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import json
+import os
+import subprocess
+import threading
+import time
+from collections.abc import Generator
+from typing import Any
+
+_ORIG_POPEN = subprocess.Popen
+
+# The tracer that new processes and spans report to, if any
+_ACTIVE: Tracer | None = None
+
+# Set by runners that report their processes with :meth:`Tracer.add_process`
+_UNTRACED_POPEN = contextvars.ContextVar('untraced_popen', default=False)
+
+
+class TracedPopen(_ORIG_POPEN):  # type: ignore[misc,valid-type]
+    """
+    A :class:`subprocess.Popen` that reports itself to the active tracer.
+
+    The process event is emitted the first time the exit code is observed
+    by ``wait`` or ``poll``; ``communicate`` adds the captured output sizes.
+    """
+
+    def __init__(self, args: Any, *posargs: Any, **kwargs: Any) -> None:
+        self._trace_event: dict[str, Any] | None = None
+        self._trace_tracer = None if _UNTRACED_POPEN.get() else _ACTIVE
+        self._trace_start = time.perf_counter()
+        super().__init__(args, *posargs, **kwargs)
+        if isinstance(args, (str, bytes, os.PathLike)):
+            argv = [os.fsdecode(args)]
+        else:
+            argv = [os.fsdecode(a) for a in args]
+        cwd = kwargs.get('cwd', None)
+        self._trace_argv = argv
+        self._trace_cwd = _fsdecode_cwd(cwd)
+        self._trace_tid = threading.get_ident()
+
+    def _trace_finish(self) -> None:
+        tracer = self._trace_tracer
+        if tracer is None or self._trace_event is not None:
+            return
+        if self.returncode is None:
+            return
+        self._trace_event = tracer.add_process(
+            self._trace_argv,
+            self._trace_cwd,
+            self._trace_start,
+            time.perf_counter(),
+            self.returncode,
+            tid=self._trace_tid,
+        )
+
+    def wait(self, timeout: float | None = None) -> int:
+        returncode = super().wait(timeout=timeout)
+        self._trace_finish()
+        return returncode
+
+    def poll(self) -> int | None:
+        returncode = super().poll()
+        self._trace_finish()
+        return returncode
+
+    def communicate(self, *args: Any, **kwargs: Any) -> tuple[Any, Any]:
+        stdout, stderr = super().communicate(*args, **kwargs)
+        self._trace_finish()
+        if self._trace_event is not None:
+            event_args = self._trace_event['args']
+            if stdout is not None:
+                event_args['stdout_bytes'] = _num_bytes(stdout)
+            if stderr is not None:
+                event_args['stderr_bytes'] = _num_bytes(stderr)
+        return stdout, stderr
+
+
+class Tracer:
+    """
+    Collects process and phase events of one run.
+
+    Entering the tracer installs :class:`TracedPopen` in :mod:`subprocess`
+    and in GitPython, leaving it restores the originals. Only one tracer can
+    be active at a time.
+
+    Args:
+        fpath (PathLike | None): if specified, the trace is written here
+            when the tracer exits.
+    """
+
+    def __init__(self, fpath: str | os.PathLike[str] | None = None) -> None:
+        self.fpath = fpath
+        self.events: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._patched: list[tuple[Any, str, Any]] = []
+
+    def __enter__(self) -> Tracer:
+        global _ACTIVE
+        if _ACTIVE is not None:
+            raise RuntimeError('Another tracer is already active')
+        # GitPython binds Popen at import time, and probes the git version
+        # while importing, which should not be part of the trace.
+        import git.cmd
+
+        _ACTIVE = self
+        self._origin = time.perf_counter()
+        self._patch(subprocess, 'Popen')
+        self._patch(git.cmd, 'Popen')
+        if getattr(git.cmd, 'safer_popen', None) is _ORIG_POPEN:
+            # On POSIX the process factory GitPython calls is Popen itself
+            self._patch(git.cmd, 'safer_popen')
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        global _ACTIVE
+        for module, attr, orig in reversed(self._patched):
+            setattr(module, attr, orig)
+        self._patched.clear()
+        _ACTIVE = None
+        if self.fpath is not None:
+            self.dump(self.fpath)
+
+    def _patch(self, module: Any, attr: str) -> None:
+        self._patched.append((module, attr, getattr(module, attr)))
+        setattr(module, attr, TracedPopen)
+
+    def add_complete(
+        self,
+        name: str,
+        cat: str,
+        start: float,
+        stop: float,
+        tid: int | None = None,
+        args: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Record a complete (``ph='X'``) event from two perf_counter times.
+        """
+        event = {
+            'name': name,
+            'cat': cat,
+            'ph': 'X',
+            'ts': (start - self._origin) * 1e6,
+            'dur': (stop - start) * 1e6,
+            'pid': os.getpid(),
+            'tid': threading.get_ident() if tid is None else tid,
+            'args': args or {},
+        }
+        with self._lock:
+            self.events.append(event)
+        return event
+
+    def add_process(
+        self,
+        argv: list[str],
+        cwd: str | None,
+        start: float,
+        stop: float,
+        returncode: int | None,
+        stdout_bytes: int | None = None,
+        stderr_bytes: int | None = None,
+        tid: int | None = None,
+    ) -> dict[str, Any]:
+        """
+        Record a finished external process.
+
+        A ``cwd`` of None means the current working directory.
+        """
+        if cwd is None:
+            cwd = _fsdecode_cwd(None)
+        label_argv = argv
+        if len(argv) == 1:
+            # A shell command line
+            label_argv = argv[0].split()
+        return self.add_complete(
+            _process_label(label_argv),
+            'subprocess',
+            start,
+            stop,
+            tid=tid,
+            args={
+                'argv': argv,
+                'cwd': cwd,
+                'returncode': returncode,
+                'stdout_bytes': stdout_bytes,
+                'stderr_bytes': stderr_bytes,
+            },
+        )
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Number of processes and their total wall time per program.
+
+        Example:
+            >>> tracer = Tracer()
+            >>> _ = tracer.add_complete('git log', 'subprocess', 0, 0.5)
+            >>> _ = tracer.add_complete('git log', 'subprocess', 1, 1.25)
+            >>> _ = tracer.add_complete('load', 'phase', 0, 2)
+            >>> tracer.summary()
+            {'git log': {'count': 2, 'seconds': 0.75}}
+        """
+        totals: dict[str, dict[str, float]] = {}
+        for event in self.events:
+            if event['cat'] != 'subprocess':
+                continue
+            row = totals.setdefault(event['name'], {'count': 0, 'seconds': 0})
+            row['count'] += 1
+            row['seconds'] += event['dur'] / 1e6
+        return totals
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            events = list(self.events)
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'summary': self.summary()},
+        }
+
+    def dump(self, fpath: str | os.PathLike[str]) -> None:
+        """
+        Write the trace-event JSON document.
+        """
+        with open(fpath, 'w') as file:
+            json.dump(self.to_dict(), file)
+
+
+def active_tracer() -> Tracer | None:
+    """
+    Return the active tracer, if any.
+    """
+    return _ACTIVE
+
+
+@contextlib.contextmanager
+def untraced_popen() -> Generator[None, None, None]:
+    """
+    Do not report processes created in this context through Popen.
+
+    For runners that observe their processes by other means (e.g. asyncio)
+    and report them with :meth:`Tracer.add_process` themselves.
+    """
+    token = _UNTRACED_POPEN.set(True)
+    try:
+        yield
+    finally:
+        _UNTRACED_POPEN.reset(token)
+
+
+@contextlib.contextmanager
+def span(name: str, **args: Any) -> Generator[None, None, None]:
+    """
+    Record the wall time of a named phase of work.
+
+    Args:
+        name (str): the phase name, e.g. ``'clone'`` or ``'find_streaks'``
+        **args: extra values shown with the event
+    """
+    tracer = _ACTIVE
+    if tracer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stop = time.perf_counter()
+        tracer.add_complete(name, 'phase', start, stop, args=args)
+
+
+def _process_label(argv: list[str]) -> str:
+    """
+    Name a process by its program and, for git, its subcommand.
+
+    Example:
+        >>> _process_label(['/usr/bin/git', '-C', 'x', 'rev-parse', 'HEAD'])
+        'git rev-parse'
+        >>> _process_label(['git', '-c', 'a=b', 'cat-file', '--batch'])
+        'git cat-file'
+        >>> _process_label(['ipfs', 'add', '-r', '.'])
+        'ipfs add'
+        >>> _process_label(['ssh', 'host', 'ls'])
+        'ssh'
+    """
+    if not argv:
+        return '?'
+    prog = os.path.basename(argv[0])
+    if prog == 'git':
+        rest = iter(argv[1:])
+        for arg in rest:
+            if arg in {'-C', '-c', '--git-dir', '--work-tree'}:
+                next(rest, None)
+            elif not arg.startswith('-'):
+                return f'{prog} {arg}'
+        return prog
+    if prog == 'ipfs' and len(argv) > 1:
+        return f'{prog} {argv[1]}'
+    return prog
+
+
+def _fsdecode_cwd(cwd: Any) -> str | None:
+    if cwd is not None:
+        return os.fsdecode(cwd)
+    try:
+        return os.getcwd()
+    except OSError:
+        # The working directory was removed, which should not break tracing
+        return None
+
+
+def _num_bytes(data: str | bytes) -> int:
+    if isinstance(data, bytes):
+        return len(data)
+    return len(data.encode('utf-8', errors='replace'))
@@ -282,3 +282,740 @@ def test_discover_remote_relpath_error_is_not_unbound(
             host='example.com',
             test_remote=False,
         )
+
+
+def test_object_reader_pipelines_large_batches(tmp_path):
+    from git_well.objects import GitObjectReader
+
+    repo = _init_repo(tmp_path / 'repo')
+    # Large enough that the responses overflow the pipe buffers if the
+    # requests were written without a concurrent reader.
+    big_text = 'x' * 200_000
+    _commit_file(repo, 'big.txt', big_text, 'big')
+    _commit_file(repo, 'dir name/a.txt', 'a', 'spaces')
+    git_dir = repo / '.git'
+    with GitObjectReader(git_dir) as objects:
+        results = objects.read_many(['HEAD:big.txt'] * 50 + ['HEAD:nope'])
+        assert results[-1] is None
+        assert all(r[1] == big_text.encode() for r in results[:-1])
+        assert objects.read_blob('HEAD:dir name/a.txt') == b'a'
+        assert objects.read_blob('HEAD:dir name') is None
+        assert not objects.exists('HEAD:big.txt', 'tree')
+        commit = objects.read_commit('HEAD')
+        assert commit.message == 'spaces\n'
+        assert commit.author_name == 'Test User'
+        names = {e.name: e.type for e in objects.read_tree('HEAD')}
+        assert names == {'big.txt': 'blob', 'dir name': 'tree'}
+        with pytest.raises(KeyError):
+            objects.read_commit('HEAD:big.txt')
+    assert objects.closed
+    with pytest.raises(ValueError):
+        objects.info('HEAD')
+
+
+def test_object_reader_avoids_batch_command(tmp_path):
+    """
+    ``cat-file --batch-command`` needs git 2.36, older distro gits lack it.
+    """
+    from git_well import tracing
+    from git_well.objects import GitObjectReader
+
+    repo = _init_repo(tmp_path / 'repo')
+    _commit_file(repo, 'a.txt', 'a', 'init')
+    with tracing.Tracer() as tracer:
+        with GitObjectReader(repo / '.git') as objects:
+            assert objects.exists('HEAD', 'commit')
+            assert objects.read_blob('HEAD:a.txt') == b'a'
+            assert objects.info_many([]) == []
+    argvs = [event['args']['argv'] for event in tracer.events
+             if event['cat'] == 'subprocess']
+    modes = sorted(argv[-1] for argv in argvs if 'cat-file' in argv)
+    assert modes == ['--batch', '--batch-check']
+
+
+def test_find_chain_matches_gitpython_walk(tmp_path):
+    import git
+
+    from git_well.git_squash_streaks import find_chain
+
+    repo_dpath = _init_repo(tmp_path / 'repo')
+    _commit_file(repo_dpath, 'a.txt', '0', 'root')
+    for idx in range(1, 6):
+        _commit_file(repo_dpath, 'a.txt', str(idx), f'wip {idx}')
+    _git(repo_dpath, 'tag', '-a', 'v1', '-m', 'v1', 'HEAD~3')
+    repo = git.Repo(repo_dpath)
+    chain = find_chain(repo.head.commit)
+    assert [c.message for c in chain] == ['wip 5\n', 'wip 4\n', 'wip 3\n']
+    assert chain[0].parents[0].hexsha == chain[1].hexsha
+    assert chain[0].author.name == 'Test User'
+    expected = repo.commit('HEAD')
+    for attr in ['authored_date', 'author_tz_offset', 'committed_date',
+                 'committer_tz_offset', 'author', 'committer', 'tree']:
+        assert getattr(chain[0], attr) == getattr(expected, attr), attr
+    with pytest.warns(UserWarning, match='initial commit'):
+        chain = find_chain(repo.head.commit, preserve_tags=False)
+    assert len(chain) == 5
+    chain = find_chain(repo.head.commit, authors={'Someone Else'})
+    assert chain == []
+
+
+def test_git_toplevel_matches_rev_parse(tmp_path, monkeypatch):
+    from git_well._utils import clear_git_toplevel_cache, git_toplevel
+
+    def rev_parse(dpath):
+        info = _git(dpath, 'rev-parse', '--show-toplevel', check=False)
+        return Path(info.stdout.strip()) if info.returncode == 0 else None
+
+    repo = _init_repo(tmp_path / 'repo')
+    _commit_file(repo, 'a.txt', 'a', 'init')
+    (repo / 'sub' / 'dir').mkdir(parents=True)
+    worktree = tmp_path / 'worktree'
+    _git(repo, 'worktree', 'add', '-q', str(worktree))
+    bare = tmp_path / 'bare.git'
+    _git(tmp_path, 'clone', '-q', '--bare', str(repo), str(bare))
+    outside = tmp_path / 'outside'
+    outside.mkdir()
+
+    monkeypatch.setenv('GIT_CEILING_DIRECTORIES', str(tmp_path))
+    clear_git_toplevel_cache()
+    for dpath in [repo, repo / 'sub' / 'dir', repo / '.git', worktree,
+                  bare, outside]:
+        assert git_toplevel(dpath) == rev_parse(dpath), dpath
+
+    # The ceiling itself is never searched, so a repo there is invisible to
+    # its subdirectories.
+    monkeypatch.setenv('GIT_CEILING_DIRECTORIES', str(repo))
+    assert git_toplevel(repo / 'sub') is None
+    assert git_toplevel(repo / 'sub') == rev_parse(repo / 'sub')
+    assert git_toplevel(repo) == repo.resolve()
+
+    monkeypatch.delenv('GIT_CEILING_DIRECTORIES')
+    monkeypatch.setenv('GIT_DIR', str(repo / '.git'))
+    monkeypatch.setenv('GIT_WORK_TREE', str(worktree))
+    assert git_toplevel(outside) == worktree.resolve() == rev_parse(outside)
+
+
+def test_branch_upgrade_sees_remote_dev_branches(tmp_path):
+    from git_well.git_branch_upgrade import UpdateDevBranch, dev_branches
+    from git_well.repo import Repo
+
+    upstream = _init_repo(tmp_path / 'upstream')
+    _commit_file(upstream, 'a.txt', 'a', 'init')
+    _git(upstream, 'branch', 'dev/1.0.0')
+    _git(upstream, 'branch', 'dev/2.0.0')
+    _git(tmp_path, 'clone', '-q', str(upstream), 'clone')
+    clone = tmp_path / 'clone'
+    # A remote name containing a slash must not be mistaken for a branch.
+    _git(clone, 'remote', 'add', 'my/fork', str(upstream))
+    _git(clone, 'fetch', '-q', 'my/fork')
+
+    repo = Repo.coerce(clone)
+    infos = dev_branches(repo)
+    remote_infos = [d for d in infos if d['remote'] is not None]
+    assert {(d['remote'].name, d['branch_name']) for d in remote_infos} == {
+        ('origin', 'dev/1.0.0'), ('origin', 'dev/2.0.0'),
+        ('my/fork', 'dev/1.0.0'), ('my/fork', 'dev/2.0.0'),
+    }
+    assert all(d['full_name'].endswith(d['branch_name']) for d in remote_infos)
+
+    _git(clone, 'remote', 'remove', 'my/fork')
+    UpdateDevBranch.main(argv=False, repo_dpath=str(clone))
+    assert repo.active_branch.name == 'dev/2.0.0'
+
+
+def test_commit_graph_matches_gitpython_with_merges(tmp_path):
+    import git
+
+    from git_well.commit_graph import CommitGraph
+
+    repo_dpath = _init_repo(tmp_path / 'repo')
+    _commit_file(repo_dpath, 'a.txt', '0', 'root')
+    _git(repo_dpath, 'checkout', '-q', '-b', 'side')
+    _commit_file(repo_dpath, 'b.txt', '1', 'side work\n\nwith a body')
+    _git(repo_dpath, 'checkout', '-q', 'main')
+    _commit_file(repo_dpath, 'a.txt', '2', 'main work')
+    _git(repo_dpath, 'merge', '-q', '--no-edit', 'side')
+    _commit_file(repo_dpath, 'a.txt', '3', 'main work')
+
+    repo = git.Repo(repo_dpath)
+    graph = CommitGraph.load(repo)
+    commits = list(repo.iter_commits('HEAD', topo_order=True))
+    assert [graph.hexsha(i) for i in range(len(graph))] == [
+        c.hexsha for c in commits
+    ]
+    for index, commit in enumerate(commits):
+        assert [graph.hexsha(p) for p in graph.parents(index)] == [
+            p.hexsha for p in commit.parents
+        ]
+        assert graph.message(index) == commit.message
+        assert graph.author_times[index] == commit.authored_date
+        assert graph.day_buckets()[index] == (
+            commit.authored_datetime.date().toordinal() - 719163
+        )
+    # Identical messages share one id
+    assert len(graph.messages) == len(commits) - 1
+    assert graph.authors == ['Test User']
+
+    # Cutting at the merge keeps it, with both parents outside the graph
+    graph = CommitGraph.load(repo, oldest_commit='HEAD~1')
+    assert len(graph) == 2
+    assert list(graph.parents(1)) == [-1, -1]
+
+
+def test_pseudo_chain_is_iterative_and_steps_over_bubbles():
+    import sys
+
+    from git_well.commit_graph import CommitGraph, find_bridges, pseudo_chain
+
+    # Far deeper than the recursion limit: alternate linear runs and bubbles
+    parents = []
+    expected = []
+    depth = sys.getrecursionlimit() * 2
+    for _ in range(depth):
+        top = len(parents)
+        # top -> {top + 1, top + 2} -> top + 3 -> next
+        parents += [[top + 1, top + 2], [top + 3], [top + 3], [top + 4]]
+        expected += [top, top + 3]
+    parents.append([])
+    expected.append(len(parents) - 1)
+    graph = CommitGraph._from_parents(parents)
+    assert pseudo_chain(graph) == expected
+    assert sum(find_bridges(graph)) == depth
+
+
+def test_find_streaks_is_quiet_unless_verbose(tmp_path, capsys):
+    import git
+
+    from git_well.git_squash_streaks import find_chain, find_streaks
+
+    repo_dpath = _init_repo(tmp_path / 'repo')
+    _commit_file(repo_dpath, 'a.txt', '0', 'root')
+    for idx, message in enumerate(['wip', 'wip', 'release', 'wip', 'wip']):
+        _commit_file(repo_dpath, 'a.txt', str(idx + 1), message)
+    repo = git.Repo(repo_dpath)
+    with pytest.warns(UserWarning):
+        chain = find_chain(repo.head.commit, preserve_tags=False)
+    capsys.readouterr()
+
+    streaks = find_streaks(chain, timedelta='sameday')
+    assert capsys.readouterr().out == ''
+    assert [len(s) for s in streaks] == [2, 2]
+    assert streaks[0].child is None
+    assert streaks[1].child == chain[2]
+    assert streaks[1].before_start.message == 'root\n'
+
+    find_streaks(chain, timedelta='sameday', verbose=True)
+    assert capsys.readouterr().out.count('CHECK') == len(chain)
+
+
+def test_squash_streaks_does_not_touch_worktree(tmp_path, monkeypatch):
+    from git_well.git_squash_streaks import squash_streaks
+
+    repo = _init_repo(tmp_path / 'repo')
+    _commit_file(repo, 'a.txt', '0', 'root')
+    for idx, message in enumerate(['wip', 'wip', 'release', 'wip', 'wip']):
+        _commit_file(repo, 'a.txt', str(idx + 1), message)
+    (repo / 'a.txt').write_text('uncommitted')
+    orig_head = _git(repo, 'rev-parse', 'HEAD').stdout.strip()
+    orig_tree = _git(repo, 'rev-parse', 'HEAD^{tree}').stdout.strip()
+    _chdir_repo(monkeypatch, repo)
+
+    kwargs = dict(authors={'Test User'}, preserve_tags=False, verbose=False)
+    with pytest.warns(UserWarning):
+        squash_streaks(inplace=False, **kwargs)
+    assert _git(repo, 'rev-parse', 'main').stdout.strip() == orig_head
+    log = _git(repo, 'log', '--format=%s', 'main-squash-temp').stdout.split('\n')
+    assert log[:4] == [
+        'wip - Squashed 2 commits',
+        'release',
+        'wip - Squashed 2 commits',
+        'root',
+    ]
+
+    with pytest.warns(UserWarning):
+        squash_streaks(inplace=True, **kwargs)
+    assert _git(repo, 'branch', '--show-current').stdout.strip() == 'main'
+    assert _git(repo, 'rev-list', '--count', 'HEAD').stdout.strip() == '4'
+    assert _git(repo, 'rev-parse', 'HEAD^{tree}').stdout.strip() == orig_tree
+    assert (repo / 'a.txt').read_text() == 'uncommitted'
+    assert _git(repo, 'diff', '--cached', '--name-only').stdout == ''
+
+
+def test_squash_streaks_dry_run_writes_nothing(tmp_path, monkeypatch):
+    from git_well.git_squash_streaks import squash_streaks
+
+    repo = _init_repo(tmp_path / 'repo')
+    _commit_file(repo, 'a.txt', '0', 'root')
+    for idx, message in enumerate(['wip', 'wip', 'release', 'wip']):
+        _commit_file(repo, 'a.txt', str(idx + 1), message)
+    orig_refs = _git(repo, 'for-each-ref').stdout
+    _chdir_repo(monkeypatch, repo)
+
+    kwargs = dict(authors={'Test User'}, preserve_tags=False, verbose=False)
+    with pytest.warns(UserWarning):
+        squash_streaks(dry=True, **kwargs)
+    assert _git(repo, 'for-each-ref').stdout == orig_refs
+    assert not (repo / '.git' / 'git-well').exists()
+
+
+def test_rewrite_squashes_single_pass_matches_commit_tree(tmp_path):
+    import git
+
+    from git_well.git_squash_streaks import find_chain, find_streaks
+    from git_well.rewrite import (
+        CommitTreeWriter,
+        Squash,
+        plan_squashes,
+        rewrite_squashes,
+    )
+
+    repo_dpath = _init_repo(tmp_path / 'repo')
+    _commit_file(repo_dpath, 'a.txt', 'root', 'root')
+    _commit_file(repo_dpath, 'a.txt', 'base', 'base')
+    for idx in range(12):
+        message = 'release' if idx % 3 == 2 else 'wip'
+        _commit_file(repo_dpath, 'a.txt', str(idx), message)
+    repo = git.Repo(repo_dpath)
+    with pytest.warns(UserWarning):
+        chain = find_chain(repo.head.commit, preserve_tags=False)
+    streaks = find_streaks(chain, timedelta='alltime')
+    assert len(streaks) == 4
+
+    # A merge above the streaks keeps its second parent
+    _git(repo_dpath, 'checkout', '-q', '-b', 'side', 'HEAD~13')
+    _commit_file(repo_dpath, 'b.txt', 'side', 'side')
+    _git(repo_dpath, 'checkout', '-q', 'main')
+    _git(repo_dpath, 'merge', '-q', '--no-edit', 'side')
+    head = repo.head.commit
+
+    squashes = [Squash(s.start.hexsha, s.stop.hexsha) for s in streaks]
+    plan = plan_squashes(repo, squashes)
+    assert [len(item.members) for item in plan] == [2, 2, 2, 2]
+    fast = repo.commit(rewrite_squashes(repo, plan))
+    slow = repo.commit(
+        rewrite_squashes(repo, squashes, writer=CommitTreeWriter(repo))
+    )
+    assert repo.head.commit == head
+    assert fast.tree == slow.tree == head.tree
+    assert len(fast.parents) == 2 and fast.parents[1] == head.parents[1]
+
+    def summary(commit):
+        walk = commit.repo.iter_commits(commit, first_parent=True)
+        return [(c.tree.hexsha, c.message, c.author_tz_offset) for c in walk]
+
+    assert summary(fast) == summary(slow)
+    assert len(summary(fast)) == len(summary(head)) - 4
+    assert not _git(repo_dpath, 'for-each-ref', 'refs/git-well').stdout
+
+
+def test_squash_streaks_pseudo_chain_keeps_merges(tmp_path, monkeypatch):
+    from git_well.git_squash_streaks import squash_streaks
+
+    repo = _init_repo(tmp_path / 'repo')
+    _commit_file(repo, 'a.txt', 'root', 'root')
+    _commit_file(repo, 'a.txt', 'base', 'base')
+    _commit_file(repo, 'a.txt', 'w1', 'wip')
+    _commit_file(repo, 'a.txt', 'w2', 'wip')
+    _git(repo, 'checkout', '-q', '-b', 'side')
+    _commit_file(repo, 'b.txt', 'side', 'side')
+    _git(repo, 'checkout', '-q', 'main')
+    _commit_file(repo, 'c.txt', 'feat', 'feat')
+    _git(repo, 'merge', '-q', '--no-edit', 'side')
+    _commit_file(repo, 'a.txt', 't1', 'tweak')
+    _commit_file(repo, 'a.txt', 't2', 'tweak')
+    orig_tree = _git(repo, 'rev-parse', 'HEAD^{tree}').stdout.strip()
+    _chdir_repo(monkeypatch, repo)
+
+    squash_streaks(
+        authors={'Test User'},
+        inplace=True,
+        verbose=False,
+        pseudo_chain=True,
+    )
+    log = _git(repo, 'log', '--format=%s', '--first-parent').stdout.split('\n')
+    assert log[:5] == [
+        'tweak - Squashed 2 commits',
+        "Merge branch 'side'",
+        'feat',
+        'wip - Squashed 2 commits',
+        'base',
+    ]
+    side_base = _git(repo, 'rev-parse', 'HEAD~1^2^').stdout.strip()
+    assert side_base == _git(repo, 'rev-parse', 'HEAD~3').stdout.strip()
+    assert _git(repo, 'rev-parse', 'HEAD^{tree}').stdout.strip() == orig_tree
+
+
+def test_squash_streaks_plan_out_and_apply(tmp_path, monkeypatch):
+    import json
+
+    from git_well.git_squash_streaks import squash_streaks
+    from git_well.rewrite import StalePlanError
+
+    repo = _init_repo(tmp_path / 'repo')
+    _commit_file(repo, 'a.txt', '0', 'root')
+    for idx, message in enumerate(['base', 'wip', 'wip', 'wip', 'release']):
+        _commit_file(repo, 'a.txt', str(idx + 1), message)
+    orig_head = _git(repo, 'rev-parse', 'HEAD').stdout.strip()
+    _chdir_repo(monkeypatch, repo)
+    plan_fpath = tmp_path / 'plan.json'
+
+    kwargs = dict(authors={'Test User'}, verbose=False, inplace=True)
+    with pytest.warns(UserWarning):
+        squash_streaks(dry=True, plan_out=plan_fpath, **kwargs)
+    plan = json.loads(plan_fpath.read_text())
+    assert plan['head'] == orig_head and plan['branch'] == 'main'
+    (item,) = plan['squashes']
+    assert item['num_commits'] == 3
+    assert item['message'] == 'wip - Squashed 3 commits'
+    assert item['tree'] == _git(repo, 'rev-parse', 'HEAD~1^{tree}').stdout.strip()
+    assert _git(repo, 'rev-parse', 'HEAD').stdout.strip() == orig_head
+
+    squash_streaks(dry=False, apply_plan=plan_fpath, **kwargs)
+    log = _git(repo, 'log', '--format=%s').stdout.split('\n')
+    assert log[:4] == ['release', 'wip - Squashed 3 commits', 'base', 'root']
+
+    # The branch moved, so the same plan must not be applied again
+    with pytest.raises(StalePlanError):
+        squash_streaks(dry=False, apply_plan=plan_fpath, **kwargs)
+
+
+def test_squash_streaks_watermark_limits_rescans(tmp_path, monkeypatch, capsys):
+    from git_well.git_squash_streaks import squash_streaks
+
+    repo = _init_repo(tmp_path / 'repo')
+    _commit_file(repo, 'a.txt', '0', 'root')
+    messages = ['base', 'feat', 'wip', 'wip', 'release']
+    for idx, message in enumerate(messages):
+        _commit_file(repo, 'a.txt', str(idx + 1), message)
+    _chdir_repo(monkeypatch, repo)
+    kwargs = dict(authors={'Test User'}, inplace=True, dry=False)
+
+    with pytest.warns(UserWarning):
+        squash_streaks(**kwargs)
+    ref = 'refs/git-well/squash-watermark/main'
+    head = _git(repo, 'rev-parse', 'HEAD').stdout.strip()
+    assert _git(repo, 'rev-parse', ref).stdout.strip() == head
+
+    # Only the watermark commit and the commits after it are analyzed, and
+    # the new commits still join the streak ending at the watermark.
+    _commit_file(repo, 'a.txt', '6', 'release')
+    _commit_file(repo, 'a.txt', '7', 'release')
+    capsys.readouterr()
+    squash_streaks(**kwargs)
+    assert 'Found chain of length 3' in capsys.readouterr().out
+    log = _git(repo, 'log', '--format=%s').stdout.split('\n')
+    assert log[:5] == [
+        'release - Squashed 3 commits',
+        'wip - Squashed 2 commits',
+        'feat',
+        'base',
+        'root',
+    ]
+    head = _git(repo, 'rev-parse', 'HEAD').stdout.strip()
+    assert _git(repo, 'rev-parse', ref).stdout.strip() == head
+
+    capsys.readouterr()
+    with pytest.warns(UserWarning):
+        squash_streaks(watermark=False, **kwargs)
+    assert 'Found chain of length 4' in capsys.readouterr().out
+
+
+def test_squash_streaks_watermark_without_inplace(tmp_path, monkeypatch,
+                                                 capsys):
+    from git_well import git_squash_streaks
+    from git_well.git_squash_streaks import squash_streaks
+
+    repo = _init_repo(tmp_path / 'repo')
+    _commit_file(repo, 'a.txt', '0', 'root')
+    for idx, message in enumerate(['base', 'feat', 'wip', 'wip']):
+        _commit_file(repo, 'a.txt', str(idx + 1), message)
+    _chdir_repo(monkeypatch, repo)
+    kwargs = dict(authors={'Test User'}, dry=False)
+
+    with pytest.warns(UserWarning):
+        squash_streaks(**kwargs)
+    # The watermark is for the branch that is squashed, not the temp branch
+    temp_head = _git(repo, 'rev-parse', 'main-squash-temp').stdout.strip()
+    ref = 'refs/git-well/squash-watermark/main'
+    assert _git(repo, 'rev-parse', ref).stdout.strip() == temp_head
+    temp_ref = 'refs/git-well/squash-watermark/main-squash-temp'
+    assert _git(repo, 'rev-parse', '-q', '--verify', temp_ref,
+                check=False).returncode != 0
+
+    # It is used once the squashed history is accepted
+    _git(repo, 'reset', '-q', '--hard', 'main-squash-temp')
+    _git(repo, 'branch', '-q', '-D', 'main-squash-temp')
+    _commit_file(repo, 'a.txt', '5', 'release')
+    capsys.readouterr()
+    squash_streaks(**kwargs)
+    assert 'Found chain of length 2' in capsys.readouterr().out
+
+    # A failure to record the watermark does not claim the branch was kept
+    def broken(*args, **kw):
+        raise RuntimeError('no watermark')
+
+    monkeypatch.setattr(git_squash_streaks, '_write_watermark', broken)
+    _commit_file(repo, 'a.txt', '6', 'release')
+    capsys.readouterr()
+    squash_streaks(inplace=True, **kwargs)
+    out = capsys.readouterr().out
+    assert 'was not modified' not in out
+    assert 'watermark could not be recorded' in out
+    log = _git(repo, 'log', '--format=%s', '-1').stdout.strip()
+    assert log == 'release - Squashed 2 commits'
+
+
+def test_commit_cache_is_persistent_and_incremental(tmp_path):
+    import git
+
+    from git_well.commit_cache import CommitCache
+
+    repo_dpath = _init_repo(tmp_path / 'repo')
+    _commit_file(repo_dpath, 'a.txt', 'one\ntwo\n', 'first')
+    _commit_file(repo_dpath, 'a.txt', 'one\n', 'second')
+    (repo_dpath / 'bin.dat').write_bytes(b'\0\1\2')
+    _git(repo_dpath, 'add', 'bin.dat')
+    _git(repo_dpath, 'commit', '-m', 'binary')
+    repo = git.Repo(repo_dpath)
+
+    with CommitCache(repo) as cache:
+        assert cache.update(['HEAD']) == 3
+    fpath = repo_dpath / '.git' / 'git-well' / 'commits.sqlite3'
+    assert fpath.exists()
+
+    _commit_file(repo_dpath, 'b.txt', 'x\n', 'fourth')
+    with CommitCache(repo) as cache:
+        assert len(cache) == 3
+        assert cache.update(['HEAD', 'main']) == 1
+        head = repo.head.commit
+        (info,) = cache.get_many([head.hexsha])
+        assert info.parents == (head.parents[0].hexsha,)
+        assert info.author_email == 'test@example.com'
+        shas = [c.hexsha for c in repo.iter_commits()]
+        totals = cache.numstat_totals(shas)
+        assert [totals[sha] for sha in shas] == [
+            (1, 0, 1),
+            (0, 0, 1),
+            (0, 1, 1),
+            (2, 0, 1),
+        ]
+        assert cache.numstat_files([shas[1]]) == {shas[1]: [('bin.dat', 0, 0)]}
+
+
+def test_shared_commit_cache_does_not_keep_repo_alive(tmp_path):
+    import gc
+    import sqlite3
+    import weakref
+
+    import git
+
+    from git_well.commit_cache import commit_cache
+    from git_well.git_squash_streaks import find_chain, find_streaks
+    from git_well.objects import object_reader
+
+    repo_dpath = _init_repo(tmp_path / 'repo')
+    _commit_file(repo_dpath, 'a.txt', '0', 'root')
+    for idx in range(1, 4):
+        _commit_file(repo_dpath, 'a.txt', str(idx), 'wip')
+    repo = git.Repo(repo_dpath)
+    with pytest.warns(UserWarning, match='initial commit'):
+        chain = find_chain(repo.head.commit)
+    find_streaks(chain, authors={'Test User'})
+    cache = commit_cache(repo)
+    assert commit_cache(repo) is cache and len(cache) == 3
+    reader = weakref.ref(object_reader(repo))
+    repo_ref = weakref.ref(repo)
+    del repo, chain
+    gc.collect()
+    assert repo_ref() is None
+    assert reader() is None
+    # The database connection was closed with the repo
+    with pytest.raises(sqlite3.ProgrammingError):
+        len(cache)
+    with pytest.raises(ReferenceError):
+        cache.repo
+
+
+def test_make_synthetic_git_repo_history_shape(tmp_path):
+    from git_well.demo import make_synthetic_git_repo
+
+    dpath = make_synthetic_git_repo(
+        tmp_path / 'repo',
+        num_commits=300,
+        num_authors=3,
+        merge_fraction=0.2,
+        num_branches=2,
+        num_tags=4,
+        num_submodules=1,
+        seed=7,
+    )
+    first_parent = _git(dpath, 'rev-list', '--first-parent', '--count', 'main')
+    assert int(first_parent.stdout) >= 300
+    assert int(_git(dpath, 'rev-list', '--merges', '--count', 'main').stdout)
+    authors = _git(dpath, 'log', '--format=%ae', 'main').stdout.split()
+    assert len(set(authors)) == 3
+    messages = _git(dpath, 'log', '--format=%s', 'main').stdout.splitlines()
+    assert 'wip' in messages
+    tags = _git(dpath, 'tag').stdout.split()
+    assert tags == ['v0', 'v1', 'v2', 'v3']
+    branches = _git(dpath, 'branch', '--format=%(refname:short)').stdout
+    assert branches.split() == ['feature/0', 'feature/1', 'main']
+    assert _git(dpath, 'status', '--porcelain').stdout == ''
+    assert (dpath / 'sub0' / '.git').exists()
+    assert _git(dpath, 'for-each-ref', 'refs/git-well').stdout == ''
+
+    other = make_synthetic_git_repo(tmp_path / 'other', num_commits=50, seed=1)
+    again = make_synthetic_git_repo(tmp_path / 'again', num_commits=50, seed=1)
+    assert (
+        _git(other, 'rev-parse', 'main').stdout
+        == _git(again, 'rev-parse', 'main').stdout
+    )
+
+
+def test_trace_out_records_processes_and_phases(tmp_path):
+    import json
+
+    from git_well.main import GitWellModalCLI
+
+    repo = _init_repo(tmp_path / 'repo')
+    _commit_file(repo, 'a.txt', 'a\n', 'first')
+    trace_fpath = tmp_path / 'trace.json'
+    GitWellModalCLI().main(
+        argv=[
+            '--trace-out',
+            str(trace_fpath),
+            'archive_source',
+            str(repo),
+            '--output',
+            str(tmp_path / 'out.tar.gz'),
+            '--verbose',
+            '0',
+        ],
+        _noexit=True,
+    )
+    events = json.loads(trace_fpath.read_text())['traceEvents']
+    phases = {e['name'] for e in events if e['cat'] == 'phase'}
+    assert {'collect submodules', 'clone', 'compress'} <= phases
+    procs = [e for e in events if e['cat'] == 'subprocess']
+    assert any(e['name'] == 'git clone' for e in procs)
+    for event in procs:
+        assert event['ph'] == 'X' and event['dur'] >= 0
+        assert event['args']['returncode'] is not None
+        assert event['args']['argv'][0].endswith('git')
+
+    import subprocess
+
+    from git_well.tracing import TracedPopen
+
+    assert subprocess.Popen is not TracedPopen
+
+
+def test_run_jobs_orders_results_and_limits_resources(tmp_path):
+    from git_well.jobs import Job, run_jobs
+
+    log_fpath = tmp_path / 'log.txt'
+    script = (
+        'echo start $1 >> "$2"; sleep 0.05; echo stop $1 >> "$2"; echo $1'
+    )
+    jobs = [
+        Job(['sh', '-c', script, 'sh', str(idx), str(log_fpath)],
+            resources=('repo:x',))
+        for idx in range(4)
+    ]
+    results = run_jobs(jobs, max_jobs=4)
+    assert [r.stdout.strip() for r in results] == ['0', '1', '2', '3']
+    # Jobs sharing a repo resource never overlap
+    events = log_fpath.read_text().split('\n')[:-1]
+    assert all(
+        a.startswith('start') and b.startswith('stop') and a[6:] == b[5:]
+        for a, b in zip(events[0::2], events[1::2])
+    )
+
+
+def test_ipfs_status_full_rehashes_sidecars_concurrently(
+    tmp_path, monkeypatch
+):
+    from git_well import ipfs as ipfs_mod
+
+    bin_dpath = tmp_path / 'bin'
+    bin_dpath.mkdir()
+    fake_ipfs = bin_dpath / 'ipfs'
+    # Prints the file name as the CID of ``ipfs add --only-hash <path>``
+    fake_ipfs.write_text('#!/bin/sh\necho "added $(basename "$3") $3"\n')
+    fake_ipfs.chmod(0o755)
+    monkeypatch.setenv('PATH', f'{bin_dpath}{os.pathsep}{os.environ["PATH"]}')
+    monkeypatch.setenv('IPFS_PATH', str(tmp_path / 'ipfs-repo'))
+
+    data = tmp_path / 'data'
+    data.mkdir()
+    for name, cid in [('a.bin', 'a.bin'), ('b.bin', 'stale')]:
+        (data / name).write_text(name)
+        (data / f'{name}.ipfs').write_text(
+            f'type: ipfs-sidecar\ncid: {cid}\nrel_path: {name}\n'
+        )
+    tables = []
+    monkeypatch.setattr(ipfs_mod, '_print_status_table', tables.append)
+    ipfs_mod.IPFSStatus.main(argv=False, path=str(data), full=True)
+    (rows,) = tables
+    assert [(row['status'], row['cid_recomputed']) for row in rows] == [
+        ('OK', 'a.bin'),
+        ('CHANGED', 'b.bin'),
+    ]
+
+
+def test_each_runs_subcommand_in_every_repo(tmp_path):
+    import json
+
+    from git_well.main import GitWellModalCLI
+
+    root = tmp_path / 'code'
+    (root / 'nested').mkdir(parents=True)
+    for name in ['one', 'nested/two']:
+        repo = _init_repo(root / name)
+        _git(repo, 'remote', 'add', 'origin', 'https://github.com/Foo/bar.git')
+    # Not a valid repository, which must not stop the others
+    (root / 'broken' / '.git').mkdir(parents=True)
+    out_fpath = tmp_path / 'results.json'
+    ret = GitWellModalCLI().main(
+        argv=[
+            'each',
+            '--root',
+            str(root),
+            '--jobs',
+            '2',
+            '--json',
+            str(out_fpath),
+            'remote_protocol',
+            'Foo',
+            'git',
+        ],
+        _noexit=True,
+    )
+    assert ret == 1
+    records = json.loads(out_fpath.read_text())
+    statuses = {
+        Path(r['repo']).relative_to(root).as_posix(): r['status']
+        for r in records
+    }
+    assert statuses == {'broken': 'error', 'nested/two': 'ok', 'one': 'ok'}
+    for name in ['one', 'nested/two']:
+        info = _git(root / name, 'remote', 'get-url', 'origin')
+        assert info.stdout.strip() == 'git@github.com:Foo/bar.git'
+
+
+def test_each_exit_status_from_command_line(tmp_path):
+    import subprocess
+    import sys
+
+    root = tmp_path / 'code'
+    root.mkdir()
+    _init_repo(root / 'one')
+    argv = [sys.executable, '-m', 'git_well', 'each', '--root', str(root),
+            '--jobs', '1']
+    command = ['remote_protocol', 'Foo', 'git']
+    ok = subprocess.run(argv + command, capture_output=True, text=True)
+    assert ok.returncode == 0, ok.stderr
+    (root / 'broken' / '.git').mkdir(parents=True)
+    failed = subprocess.run(argv + command, capture_output=True, text=True)
+    assert failed.returncode == 1
+    assert "'error': 1" in failed.stdout
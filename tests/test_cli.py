@@ -32,6 +32,149 @@ def test_cli_main_help():
             ...
 
 
+def test_main_help_is_user_facing(capsys):
+    """
+    The modal docstring is the ``git-well --help`` description, so it must
+    not carry developer notes.
+    """
+    from git_well.main import GitWellModalCLI
+
+    try:
+        GitWellModalCLI().run(argv=['--help'])
+    except SystemExit:
+        ...
+    text = capsys.readouterr().out
+    assert 'Git utilities' in text
+    for note in [':data:', ':func:', ':class:', 'placeholder']:
+        assert note not in text
+    # Global options are taken out of argv early, but are still documented
+    assert '--trace-out PATH' in text
+    assert '--jobs N' in text
+
+
+def test_main_global_options_are_validated(capsys):
+    import pytest
+
+    from git_well.main import GitWellModalCLI
+
+    with pytest.raises(SystemExit, match='invalid int value'):
+        GitWellModalCLI().run(argv=['--jobs', 'many', 'url', 'x'])
+    # Abbreviations are not silently forwarded to the subcommand
+    assert GitWellModalCLI().run(argv=['--trace', 'x', 'url'], _noexit=True)
+
+
+def test_lazy_subcommand_registry_matches_modules():
+    """
+    The static registry must agree with the real CLI classes, since it is the
+    only source of help text when the modules are not imported.
+    """
+    from git_well.main import SUBCOMMANDS
+
+    for spec in SUBCOMMANDS:
+        cli_cls = spec.load()
+        assert cli_cls.__command__ == spec.command
+        assert list(getattr(cli_cls, '__alias__', [])) == list(spec.alias)
+        description = cli_cls.__doc__.strip().split('\n')[0]
+        assert description == spec.help
+
+
+def test_main_help_does_not_import_subcommands():
+    """
+    Listing and dispatching commands should only import the selected module.
+    """
+    import subprocess
+    import sys
+
+    code = (
+        'import sys\n'
+        'from git_well.main import GitWellModalCLI\n'
+        'modal = GitWellModalCLI()\n'
+        'try:\n'
+        '    modal.run(argv=ARGV)\n'
+        'except SystemExit:\n'
+        '    pass\n'
+        'print(sorted(m for m in sys.modules if m.startswith("git_well.")))\n'
+    )
+    for argv, expected in [
+        (['--help'], ['git_well.main']),
+        (['url', '--help'], ['git_well.git_url_components', 'git_well.main']),
+    ]:
+        proc = subprocess.run(
+            [sys.executable, '-c', code.replace('ARGV', repr(argv))],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        loaded = proc.stdout.strip().split('\n')[-1]
+        assert loaded == repr(expected)
+
+
+def test_completion_spec_tolerates_unlistable_choices():
+    import argparse
+
+    from git_well._completion import _parser_node
+
+    class Anything:
+        def __contains__(self, item):
+            return True
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', choices=Anything(), metavar='NAME')
+    parser.add_argument('mode', choices=['a', 'b'])
+    node = _parser_node(parser)
+    assert node['positional_choices'] == ['a', 'b']
+
+
+def test_fast_autocomplete_uses_cached_spec(tmp_path):
+    """
+    Completion should be answered from the cached spec without importing
+    subcommand modules once the spec exists.
+    """
+    import os
+    import subprocess
+    import sys
+
+    env = dict(os.environ)
+    env.update(
+        {
+            'XDG_CACHE_HOME': str(tmp_path / 'cache'),
+            'LOCALAPPDATA': str(tmp_path / 'cache'),
+            '_ARGCOMPLETE': '1',
+            '_ARGCOMPLETE_STDOUT_FILENAME': str(tmp_path / 'out.txt'),
+        }
+    )
+    code = (
+        'import sys\n'
+        'from git_well._completion import fast_autocomplete\n'
+        'assert fast_autocomplete(exit=False)\n'
+        'print(sorted(m for m in sys.modules if m.startswith("git_well.")))\n'
+    )
+
+    def run(comp_line):
+        env['COMP_LINE'] = comp_line
+        env['COMP_POINT'] = str(len(comp_line))
+        proc = subprocess.run(
+            [sys.executable, '-c', code],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        items = (tmp_path / 'out.txt').read_text().split('\013')
+        return items, proc.stdout.strip().split('\n')[-1]
+
+    # The first request builds the spec, which imports everything.
+    items, _ = run('git-well ur')
+    assert items == ['url ']
+
+    items, loaded = run('git-well permit --protocol ')
+    assert items == ['git', 'https', 'ssh']
+    assert loaded == repr(['git_well._completion'])
+
+    items, _ = run('git-well ipfs pin ')
+    assert items == ['add ']
+
+
 def test_archive_source_help_mentions_git_archive(capsys):
     """
     The help should explain how this command relates to git-archive and the
@@ -168,6 +311,29 @@ def test_archive_source_cli_options():
     )
     assert str(config.format) == 'zip'
     assert config.output == 'foo.any'
+    assert config.jobs is None
+
+    config = ArchiveSourceCLI.cli(argv=['--jobs', '8'], strict=True)
+    assert int(config.jobs) == 8
+    assert config.clone_mode == 'share'
+
+    config = ArchiveSourceCLI.cli(argv=['--clone-mode', 'copy'], strict=True)
+    assert config.clone_mode == 'copy'
+    assert config.history_format == 'git-dir'
+
+    config = ArchiveSourceCLI.cli(
+        argv=['--history-format', 'bundle'], strict=True
+    )
+    assert config.history_format == 'bundle'
+    assert config.compression_level is None
+    assert config.compression_threads is None
+
+    config = ArchiveSourceCLI.cli(
+        argv=['--compression-level', '1', '--compression-threads', '4'],
+        strict=True,
+    )
+    assert int(config.compression_level) == 1
+    assert int(config.compression_threads) == 4
 
     config = ArchiveSourceCLI.cli(
         argv=[
@@ -815,3 +981,323 @@ def test_archive_source_no_submodules(tmp_path):
     assert 'Content pruning: yes' in manifest_text
     assert 'path: external/lib' in manifest_text
     assert 'reason: omitted by --no-submodules' in manifest_text
+
+
+def test_archive_source_depth_zero_streams_without_stage(tmp_path, monkeypatch):
+    """
+    Source-only archives are written from git archive streams directly, with
+    the same members as the staged export and no temporary stage directory.
+    """
+    import collections
+    import tarfile
+    import tempfile
+    import zipfile
+
+    from git_well.git_archive_source import archive_source
+
+    sub_src = _make_submodule_repo(tmp_path, 'sub_src')
+    (sub_src / 'run.sh').write_text('#!/bin/sh\n')
+    (sub_src / 'run.sh').chmod(0o755)
+    (sub_src / 'link.txt').symlink_to('tracked.txt')
+    _commit_all(sub_src, 'add script and link')
+    super_repo = _make_repo_with_submodules(
+        tmp_path, {'external/lib': sub_src}
+    )
+
+    def _no_stage(*args, **kwargs):
+        raise AssertionError('depth 0 archives should not use a stage')
+
+    monkeypatch.setattr(tempfile, 'mkdtemp', _no_stage)
+
+    archive = archive_source(
+        repo_dpath=super_repo,
+        output=tmp_path / 'streamed.tar.gz',
+        depth=0,
+        verbose=0,
+    )
+    with tarfile.open(archive, 'r:gz') as tar:
+        members = {m.name.split('/', 1)[-1]: m for m in tar.getmembers()}
+        counts = collections.Counter(m.name for m in tar.getmembers())
+        script = tar.extractfile(
+            next(m for m in tar.getmembers() if m.name.endswith('run.sh'))
+        ).read()
+    assert max(counts.values()) == 1
+    assert script == b'#!/bin/sh\n'
+    assert members['external/lib/run.sh'].mode & 0o111
+    assert members['external/lib/link.txt'].issym()
+    assert members['external/lib'].isdir()
+    assert 'root.txt' in members
+    assert 'GIT_WELL_ARCHIVE_INFO.txt' in members
+    assert 'history: source-only (depth 0)' in _tar_manifest_text(archive)
+
+    archive = archive_source(
+        repo_dpath=super_repo,
+        output=tmp_path / 'streamed.zip',
+        depth=0,
+        verbose=0,
+    )
+    with zipfile.ZipFile(archive) as zfile:
+        infos = {i.filename.split('/', 1)[-1]: i for i in zfile.infolist()}
+        assert zfile.read(infos['external/lib/tracked.txt']) == b'submodule\n'
+    assert infos['external/lib/run.sh'].external_attr >> 16 & 0o111
+    assert infos['external/lib/'].is_dir()
+    assert 'GIT_WELL_ARCHIVE_INFO.txt' in infos
+
+
+def test_archive_source_parallel_submodules_respect_nesting(tmp_path, capsys):
+    import ubelt as ub
+
+    from git_well.git_archive_source import archive_source
+
+    inner_src = _make_submodule_repo(
+        tmp_path, 'inner_src', filename='inner.txt', content='inner\n'
+    )
+    parent_src = _make_repo_with_submodules(
+        tmp_path, {'nested/inner': inner_src}
+    )
+    parent_src = parent_src.rename(tmp_path / 'parent_src')
+    other_srcs = {
+        f'external/lib{idx}': _make_submodule_repo(tmp_path, f'lib{idx}_src')
+        for idx in range(3)
+    }
+    super_repo = _make_repo_with_submodules(
+        tmp_path, {'external/parent': parent_src, **other_srcs}
+    )
+    ub.cmd(
+        [
+            'git',
+            '-c',
+            'protocol.file.allow=always',
+            'submodule',
+            'update',
+            '--init',
+            '--recursive',
+        ],
+        cwd=super_repo,
+        check=True,
+    )
+
+    archive = archive_source(
+        repo_dpath=super_repo,
+        output=tmp_path / 'parallel.tar.gz',
+        depth='full',
+        submodule_depth='{"external/lib2": 0}',
+        jobs=4,
+        verbose=1,
+    )
+
+    root = _extract_tar_root(archive, tmp_path / 'extracted')
+    inner = root / 'external/parent/nested/inner'
+    assert (inner / 'inner.txt').read_text() == 'inner\n'
+    assert (inner / '.git').exists()
+    for idx in range(3):
+        assert (root / f'external/lib{idx}/tracked.txt').exists()
+    assert (root / 'external/lib1/.git').exists()
+    assert not (root / 'external/lib2/.git').exists()
+
+    out = capsys.readouterr().out
+    assert (
+        '[source-archive] [external/parent/nested/inner] exporting submodule '
+        'external/parent/nested/inner'
+    ) in out
+
+
+def test_archive_source_submodules_sequential_by_default(
+    tmp_path, capsys, monkeypatch
+):
+    """
+    Concurrent submodule exports are opt-in with --jobs or a global limit.
+    """
+    from git_well.git_archive_source import archive_source
+    from git_well.jobs import set_max_jobs
+
+    srcs = {
+        f'external/lib{idx}': _make_submodule_repo(tmp_path, f'lib{idx}_src')
+        for idx in range(2)
+    }
+    super_repo = _make_repo_with_submodules(tmp_path, srcs)
+    monkeypatch.delenv('GIT_WELL_JOBS', raising=False)
+    set_max_jobs(None)
+    tagged = '[source-archive] [external/lib0] '
+
+    archive_source(repo_dpath=super_repo, output=tmp_path / 'a.tar.gz',
+                   depth='full', verbose=1)
+    out = capsys.readouterr().out
+    assert 'exporting submodule external/lib0' in out
+    assert tagged not in out
+
+    monkeypatch.setenv('GIT_WELL_JOBS', '2')
+    archive_source(repo_dpath=super_repo, output=tmp_path / 'b.tar.gz',
+                   depth='full', verbose=1)
+    assert tagged in capsys.readouterr().out
+
+
+def test_archive_source_clone_modes_are_self_contained(tmp_path):
+    """
+    Shared clones must not keep borrowing objects from the source repository
+    and every mode should leave one pack with only the archived history.
+    """
+    import shutil
+
+    import ubelt as ub
+
+    from git_well.git_archive_source import archive_source
+
+    repo = tmp_path / 'demo_modes'
+    _init_demo_repo(repo)
+    for idx in range(3):
+        (repo / 'tracked.txt').write_text(f'version {idx}\n')
+        _commit_all(repo, f'commit {idx}')
+    ub.cmd(['git', 'checkout', '-q', '-b', 'unrelated'], cwd=repo, check=True)
+    (repo / 'other.txt').write_text('other\n')
+    _commit_all(repo, 'unrelated work')
+    unrelated = _stdout_text(
+        ub.cmd(['git', 'rev-parse', 'HEAD'], cwd=repo, check=True)
+    ).strip()
+    ub.cmd(['git', 'checkout', '-q', '-'], cwd=repo, check=True)
+
+    archives = {
+        (mode, depth): archive_source(
+            repo_dpath=repo,
+            output=tmp_path / f'{mode}-{depth}.tar.gz',
+            depth=depth,
+            clone_mode=mode,
+            verbose=0,
+        )
+        for mode, depth in [('share', 'full'), ('copy', 'full'), ('share', 2)]
+    }
+    shutil.rmtree(repo)
+    for (mode, depth), archive in archives.items():
+        root = _extract_tar_root(archive, tmp_path / f'extract-{mode}-{depth}')
+        objects = root / '.git' / 'objects'
+        assert not (objects / 'info' / 'alternates').exists()
+        assert len(list((objects / 'pack').glob('*.pack'))) == 1
+        ub.cmd(['git', 'fsck', '--full'], cwd=root, check=True)
+        log = ub.cmd(['git', 'log', '--format=%s'], cwd=root, check=True)
+        assert len(_stdout_text(log).splitlines()) == (
+            2 if depth == 2 else 3
+        )
+        missing = ub.cmd(['git', 'cat-file', '-e', unrelated], cwd=root)
+        assert missing['ret'] != 0
+
+
+def test_archive_source_history_bundles_restore(tmp_path):
+    import pytest
+    import ubelt as ub
+
+    from git_well.git_archive_source import archive_source
+
+    full_src = _make_submodule_repo(tmp_path, 'full_src')
+    plain_src = _make_submodule_repo(tmp_path, 'plain_src')
+    super_repo = _make_repo_with_submodules(
+        tmp_path, {'external/full': full_src, 'external/plain': plain_src}
+    )
+
+    archive = archive_source(
+        repo_dpath=super_repo,
+        output=tmp_path / 'bundled.tar.gz',
+        submodule_depth='{external/plain: 0}',
+        history_format='bundle',
+        verbose=0,
+    )
+    names = _tar_names(archive)
+    assert not any('/.git/' in name for name in names)
+    bundles = sorted(
+        name.split('/', 1)[1]
+        for name in names
+        if name.endswith('/GIT_WELL_HISTORY.bundle')
+    )
+    assert bundles == [
+        'GIT_WELL_HISTORY.bundle',
+        'external/full/GIT_WELL_HISTORY.bundle',
+    ]
+    manifest_text = _tar_manifest_text(archive)
+    assert 'History format: git bundle' in manifest_text
+    assert 'bundle: external/full/GIT_WELL_HISTORY.bundle' in manifest_text
+
+    root = _extract_tar_root(archive, tmp_path / 'extracted')
+    restore = [
+        line.strip()
+        for line in manifest_text.split('Restoring history:')[1].splitlines()
+        if line.startswith('    git ')
+    ]
+    for dpath in [root, root / 'external/full']:
+        for line in restore:
+            ub.cmd(line, cwd=dpath, shell=True, check=True)
+        ub.cmd(['git', 'fsck', '--full'], cwd=dpath, check=True)
+    log = ub.cmd(['git', 'log', '--format=%s', '-1'], cwd=root, check=True)
+    assert _stdout_text(log).strip() == 'add submodules'
+    status = ub.cmd(
+        ['git', 'status', '--short', '--untracked-files=no'],
+        cwd=root,
+        check=True,
+    )
+    assert _stdout_text(status).strip() == ''
+
+    with pytest.raises(ValueError, match='shallow history'):
+        archive_source(
+            repo_dpath=super_repo,
+            output=tmp_path / 'shallow.tar.gz',
+            depth=3,
+            history_format='bundle',
+            verbose=0,
+        )
+
+
+def test_archive_source_threaded_compression_formats(tmp_path):
+    import io
+    import shutil
+    import subprocess
+    import tarfile
+
+    import pytest
+
+    from git_well.git_archive_source import archive_source
+
+    sub_src = _make_submodule_repo(tmp_path, 'sub_src')
+    super_repo = _make_repo_with_submodules(
+        tmp_path, {'external/lib': sub_src}
+    )
+    expected = {'root.txt', 'external/lib/tracked.txt', '.gitmodules'}
+    for depth in [0, 'full']:
+        for fmt, mode in [('tar.gz', 'r:gz'), ('tar.xz', 'r:xz')]:
+            archive = archive_source(
+                repo_dpath=super_repo,
+                output=tmp_path / f'out-{depth}.{fmt}',
+                depth=depth,
+                compression_level=1,
+                compression_threads=3,
+                verbose=0,
+            )
+            with tarfile.open(archive, mode) as tar:
+                names = {name.split('/', 1)[-1] for name in tar.getnames()}
+            assert expected <= names
+
+    import importlib.util
+
+    has_zstandard = importlib.util.find_spec('zstandard') is not None
+    if not has_zstandard and shutil.which('zstd') is None:
+        pytest.skip('needs zstandard or zstd for tar.zst')
+    archive = archive_source(
+        repo_dpath=super_repo,
+        output=tmp_path / 'out.tzst',
+        depth=0,
+        compression_threads=2,
+        verbose=0,
+    )
+    assert archive.name.endswith('.tzst')
+    if shutil.which('zstd') is None:
+        import zstandard
+
+        data = zstandard.ZstdDecompressor().stream_reader(
+            archive.open('rb')
+        ).read()
+    else:
+        data = subprocess.run(
+            ['zstd', '-d', '-c', str(archive)],
+            check=True,
+            capture_output=True,
+        ).stdout
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r:') as tar:
+        names = {name.split('/', 1)[-1] for name in tar.getnames()}
+    assert expected <= names